@@ -0,0 +1,153 @@
+-- ============================================================================
+-- Миграция: 20251126_005_features_v1_mat.sql
+-- Задача: TradLab L1 - Материализация фич lab.features_v1
+-- Автор: arturklimovich-art
+-- Дата: 2025-11-26
+-- Описание: Таблица lab.features_v1_mat с инкрементальным пересчётом
+--           (вместо чтения из view lab.features_v1)
+-- ============================================================================
+--
+-- View lab.features_v1 считает SMA50 / ATR14 / AVG_VOLUME_20 оконными
+-- функциями по всей market.ohlcv: условия WHERE symbol / ts_4h не проходят
+-- через окна, поэтому каждое чтение (в том числе запрос последнего бара
+-- live-бота) пересчитывает всю историю.
+--
+-- lab.features_v1_mat хранит те же колонки физически с ключом (symbol, ts_4h).
+-- lab.refresh_features_v1_mat() пересчитывает только бары с p_since, прогревая
+-- окна предыдущими 49 (4H) / 13 (1H) барами, и делает upsert. Коллектор
+-- вызывает её после каждого сохранения. View остаётся эталонным определением.
+
+-- ============================================================================
+-- 1. ТАБЛИЦА: lab.features_v1_mat - Материализованные фичи
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS lab.features_v1_mat (
+  symbol        TEXT NOT NULL,
+  ts_4h         TIMESTAMPTZ NOT NULL,
+  open_4h       DOUBLE PRECISION,
+  high_4h       DOUBLE PRECISION,
+  low_4h        DOUBLE PRECISION,
+  close_4h      DOUBLE PRECISION,
+  volume_4h     DOUBLE PRECISION,
+  close_1h      DOUBLE PRECISION,
+  atr_14_1h     DOUBLE PRECISION,
+  sma_50_4h     DOUBLE PRECISION,
+  avg_volume_20 DOUBLE PRECISION,
+  PRIMARY KEY (symbol, ts_4h)
+);
+
+COMMENT ON TABLE lab.features_v1_mat IS 'Материализованные lab.features_v1 (инкрементальный пересчёт: lab.refresh_features_v1_mat)';
+
+-- Покрывающий индекс: запрос последнего бара (ORDER BY ts_4h DESC LIMIT 1) — index-only
+CREATE INDEX IF NOT EXISTS idx_features_v1_mat_latest
+  ON lab.features_v1_mat (symbol, ts_4h DESC)
+  INCLUDE (open_4h, high_4h, low_4h, close_4h, volume_4h,
+           close_1h, atr_14_1h, sma_50_4h, avg_volume_20);
+
+-- ============================================================================
+-- 2. ФУНКЦИЯ: lab.refresh_features_v1_mat - Инкрементальный пересчёт
+-- ============================================================================
+-- p_since = NULL: продолжить с последнего материализованного бара (он тоже
+-- пересчитывается — мог быть сохранён по незакрытой свече).
+-- Возвращает число записанных строк.
+CREATE OR REPLACE FUNCTION lab.refresh_features_v1_mat(
+  p_symbol TEXT,
+  p_since  TIMESTAMPTZ DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+  v_since   TIMESTAMPTZ;
+  v_warm_4h TIMESTAMPTZ;
+  v_warm_1h TIMESTAMPTZ;
+  v_rows    INTEGER;
+BEGIN
+  v_since := COALESCE(
+    p_since,
+    (SELECT max(ts_4h) FROM lab.features_v1_mat WHERE symbol = p_symbol),
+    '-infinity'::TIMESTAMPTZ
+  );
+
+  -- Прогрев окон: SMA50 нужны 49 предыдущих 4H-баров, ATR14 — 13 предыдущих 1H-баров
+  SELECT min(ts) INTO v_warm_4h FROM (
+    SELECT ts FROM market.ohlcv
+    WHERE symbol = p_symbol AND tf = '4h' AND ts < v_since
+    ORDER BY ts DESC LIMIT 49
+  ) w;
+
+  SELECT min(ts) INTO v_warm_1h FROM (
+    SELECT ts FROM market.ohlcv
+    WHERE symbol = p_symbol AND tf = '1h' AND ts < v_since
+    ORDER BY ts DESC LIMIT 13
+  ) w;
+
+  v_warm_4h := COALESCE(v_warm_4h, v_since);
+  v_warm_1h := COALESCE(v_warm_1h, v_since);
+
+  INSERT INTO lab.features_v1_mat (
+    symbol, ts_4h, open_4h, high_4h, low_4h, close_4h, volume_4h,
+    close_1h, atr_14_1h, sma_50_4h, avg_volume_20
+  )
+  WITH
+  win_4h AS (
+    SELECT
+      ts,
+      AVG(close) OVER (ORDER BY ts ROWS BETWEEN 49 PRECEDING AND CURRENT ROW) AS sma_50,
+      AVG(volume) OVER (ORDER BY ts ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS avg_volume_20
+    FROM market.ohlcv
+    WHERE symbol = p_symbol AND tf = '4h' AND ts >= v_warm_4h
+  ),
+  win_1h AS (
+    SELECT
+      ts,
+      AVG(high - low) OVER (ORDER BY ts ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS atr_14
+    FROM market.ohlcv
+    WHERE symbol = p_symbol AND tf = '1h' AND ts >= v_warm_1h
+  )
+  SELECT
+    o4h.symbol,
+    o4h.ts,
+    o4h.open,
+    o4h.high,
+    o4h.low,
+    o4h.close,
+    o4h.volume,
+    o1h.close,
+    w1.atr_14,
+    w4.sma_50,
+    w4.avg_volume_20
+  FROM market.ohlcv o4h
+  LEFT JOIN market.ohlcv o1h
+    ON o1h.symbol = o4h.symbol
+    AND o1h.tf = '1h'
+    AND o1h.ts = o4h.ts
+  LEFT JOIN win_4h w4 ON w4.ts = o4h.ts
+  LEFT JOIN win_1h w1 ON w1.ts = o4h.ts
+  WHERE o4h.symbol = p_symbol
+    AND o4h.tf = '4h'
+    AND o4h.ts >= v_since
+  ON CONFLICT (symbol, ts_4h) DO UPDATE SET
+    open_4h       = EXCLUDED.open_4h,
+    high_4h       = EXCLUDED.high_4h,
+    low_4h        = EXCLUDED.low_4h,
+    close_4h      = EXCLUDED.close_4h,
+    volume_4h     = EXCLUDED.volume_4h,
+    close_1h      = EXCLUDED.close_1h,
+    atr_14_1h     = EXCLUDED.atr_14_1h,
+    sma_50_4h     = EXCLUDED.sma_50_4h,
+    avg_volume_20 = EXCLUDED.avg_volume_20;
+
+  GET DIAGNOSTICS v_rows = ROW_COUNT;
+  RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION lab.refresh_features_v1_mat(TEXT, TIMESTAMPTZ) IS
+  'Инкрементальный пересчёт lab.features_v1_mat для баров с ts_4h >= p_since';
+
+-- ============================================================================
+-- 3. НАЧАЛЬНОЕ ЗАПОЛНЕНИЕ: вся история по каждому символу
+-- ============================================================================
+SELECT lab.refresh_features_v1_mat(s.symbol, '-infinity'::TIMESTAMPTZ)
+FROM (SELECT DISTINCT symbol FROM market.ohlcv WHERE tf = '4h') s;
+
+-- ============================================================================
+-- ЗАВЕРШЕНИЕ МИГРАЦИИ
+-- ============================================================================
@@ -0,0 +1,80 @@
+-- ============================================================================
+-- Миграция: 20251126_006_result_cache.sql
+-- Задача: TradLab L1 - Кэш результатов бэктестов
+-- Автор: arturklimovich-art
+-- Дата: 2025-11-26
+-- Описание: Кэш метрик бэктестов lab.result_cache + инвалидация при изменении
+--           market.ohlcv внутри окна записи
+-- ============================================================================
+--
+-- Ключ (cache_key) = sha256 от: класса стратегии, params, символа, start/end,
+-- капитала/комиссии/проскальзывания и fingerprint фич
+-- (число строк, max(ts_4h), хэш содержимого) — см. tradlab.engine.result_cache.
+--
+-- Fingerprint сам по себе исключает попадание в устаревшую запись; триггеры
+-- ниже дополнительно удаляют записи, окно которых затронуто INSERT / UPDATE /
+-- DELETE в market.ohlcv, чтобы таблица не копила мёртвые строки. Окно
+-- расширяется на прогрев SMA50 по 4H (49 баров ≈ 8.2 дня): фичи на start_ts
+-- зависят от этих баров.
+
+-- ============================================================================
+-- 1. ТАБЛИЦА: lab.result_cache - Кэш метрик бэктестов
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS lab.result_cache (
+  cache_key    TEXT PRIMARY KEY,
+  strategy_id  TEXT NOT NULL,
+  symbol       TEXT NOT NULL,
+  start_ts     TIMESTAMPTZ,          -- NULL = без нижней границы
+  end_ts       TIMESTAMPTZ,          -- NULL = без верхней границы
+  params       JSONB NOT NULL,
+  fingerprint  TEXT NOT NULL,
+  results      JSONB NOT NULL,
+  created_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE lab.result_cache IS 'Кэш метрик бэктестов (ключ: стратегия + params + период + fingerprint фич)';
+
+CREATE INDEX IF NOT EXISTS idx_result_cache_symbol_window
+  ON lab.result_cache (symbol, start_ts, end_ts);
+
+-- ============================================================================
+-- 2. ИНВАЛИДАЦИЯ: триггеры на market.ohlcv
+-- ============================================================================
+CREATE OR REPLACE FUNCTION lab.invalidate_result_cache() RETURNS TRIGGER AS $$
+BEGIN
+  DELETE FROM lab.result_cache c
+  USING (
+    SELECT symbol, min(ts) AS min_ts, max(ts) AS max_ts
+    FROM changed_rows
+    GROUP BY symbol
+  ) ch
+  WHERE c.symbol = ch.symbol
+    AND (c.end_ts IS NULL OR ch.min_ts <= c.end_ts)
+    AND (c.start_ts IS NULL OR ch.max_ts >= c.start_ts - INTERVAL '9 days');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора с transition tables (по одному на событие:
+-- PostgreSQL не допускает transition tables у триггеров на несколько событий)
+DROP TRIGGER IF EXISTS trg_ohlcv_insert_invalidate_cache ON market.ohlcv;
+CREATE TRIGGER trg_ohlcv_insert_invalidate_cache
+  AFTER INSERT ON market.ohlcv
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION lab.invalidate_result_cache();
+
+DROP TRIGGER IF EXISTS trg_ohlcv_update_invalidate_cache ON market.ohlcv;
+CREATE TRIGGER trg_ohlcv_update_invalidate_cache
+  AFTER UPDATE ON market.ohlcv
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION lab.invalidate_result_cache();
+
+DROP TRIGGER IF EXISTS trg_ohlcv_delete_invalidate_cache ON market.ohlcv;
+CREATE TRIGGER trg_ohlcv_delete_invalidate_cache
+  AFTER DELETE ON market.ohlcv
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION lab.invalidate_result_cache();
+
+-- ============================================================================
+-- ЗАВЕРШЕНИЕ МИГРАЦИИ
+-- ============================================================================
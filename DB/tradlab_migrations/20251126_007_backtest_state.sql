@@ -0,0 +1,45 @@
+-- ============================================================================
+-- Миграция: 20251126_007_backtest_state.sql
+-- Задача: TradLab L1 - Инкрементальные бэктесты
+-- Автор: arturklimovich-art
+-- Дата: 2025-11-26
+-- Описание: Состояние бэктеста lab.backtest_state для продолжения прогона
+--           (инкрементальный бэктест)
+-- ============================================================================
+--
+-- BacktesterV1.run(..., save_state=True) сохраняет состояние симуляции на
+-- последнем обработанном баре, до закрытия в конце периода (EOD): баланс,
+-- открытую позицию, equity curve и агрегаты закрытых сделок. Строка пишется
+-- в той же транзакции, что lab.trades / lab.results.
+--
+-- BacktesterV1.resume(run_id) загружает только бары с ts_4h > last_ts,
+-- продолжает симуляцию, удаляет прежнюю EOD-сделку прогона и обновляет
+-- lab.results и эту строку — O(новых баров) вместо O(истории).
+
+-- ============================================================================
+-- 1. ТАБЛИЦА: lab.backtest_state - Состояние бэктеста на последнем баре
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS lab.backtest_state (
+  run_id          TEXT PRIMARY KEY,
+  strategy_id     TEXT NOT NULL,
+  strategy_class  TEXT NOT NULL,          -- module.QualName стратегии
+  symbol          TEXT NOT NULL,
+  params          JSONB NOT NULL,
+  start_ts        TIMESTAMPTZ NOT NULL,   -- первый бар прогона
+  last_ts         TIMESTAMPTZ NOT NULL,   -- последний обработанный бар
+  balance         DOUBLE PRECISION NOT NULL,
+  open_position   JSONB,                  -- NULL = позиции нет
+  equity          BYTEA NOT NULL,         -- equity curve, float64 little-endian
+  trade_stats     JSONB NOT NULL,         -- агрегаты закрытых сделок
+  config          JSONB NOT NULL,         -- капитал, комиссия, проскальзывание, режим
+  updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE lab.backtest_state IS 'Состояние бэктеста на последнем баре (для BacktesterV1.resume)';
+
+CREATE INDEX IF NOT EXISTS idx_backtest_state_symbol_last_ts
+  ON lab.backtest_state (symbol, last_ts);
+
+-- ============================================================================
+-- ЗАВЕРШЕНИЕ МИГРАЦИИ
+-- ============================================================================
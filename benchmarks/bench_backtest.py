@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+TradLab Backtest Benchmark
+
+Runs STR-100 through BacktesterV1 on synthetic 4h features (no Postgres needed)
+and reports bars/sec, peak RSS and per-stage wall time as JSON.
+Usage: python benchmarks/bench_backtest.py [--bars 10000 100000 1000000] [--modes vectorized loop]
+       python benchmarks/bench_backtest.py --compare benchmarks/results/backtest_<commit>.json
+
+Stages: generate (synthetic features), signals (generate_signals_batch), simulate
+(bar loop without signals), metrics, persist (COPY/upsert payloads are built, the DB
+write is stubbed) and batch_metrics (MetricsCalculator.batch_metrics over --paths
+perturbed copies of the equity curve). Every case runs in a fresh process so peak
+RSS is per case. The report is tagged with the git commit; pass the report of an
+earlier commit to --compare to see regressions.
+
+STR-100 loses slowly on random-walk prices, so the benchmark account is large and
+risks 0.05% per trade: otherwise it is drained (and sizing fails) long before 1M
+bars. Throughput does not depend on position size.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Add src to path for imports
+sys.path.insert(0, str(ROOT / "src"))
+
+import numpy as np
+import pandas as pd
+
+from tradlab.demo_data import generate_demo_features
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.metrics import MetricsCalculator
+from tradlab.engine.persistence import ResultWriter, trades_to_csv
+from tradlab.engine.strategies.str_100_chainflow_eth import STR100ChainFlowETH
+
+
+DEFAULT_BARS = (10_000, 100_000, 1_000_000)
+STAGES = ("generate", "signals", "simulate", "metrics", "persist", "batch_metrics")
+INITIAL_CAPITAL = 1_000_000.0
+STRATEGY_PARAMS = {**STR100ChainFlowETH.PARAMS, "risk_per_trade": 0.0005}
+
+
+class DryRunWriter(ResultWriter):
+    """ResultWriter that builds the COPY/upsert payloads but never connects to the DB."""
+
+    def flush(self) -> int:
+        written = len(self._results)
+        trades_to_csv(self._trades)
+        self._trades, self._results, self._states, self._resumed = [], [], [], []
+        return written
+
+
+class StageTimer:
+    """Wall time accumulated per stage."""
+
+    def __init__(self):
+        self.times = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - started
+
+    def wrap(self, obj, method: str, name: str):
+        """Time every call of obj.method under stage name."""
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+
+        setattr(obj, method, timed)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(bars: int, mode: str = "vectorized", paths: int = 8, seed: int = 42) -> dict:
+    """One benchmark case: generate features, run the backtest, batch metrics."""
+    timer = StageTimer()
+    with timer.stage("generate"):
+        features = generate_demo_features(bars, seed=seed)
+
+    strategy = STR100ChainFlowETH(params=dict(STRATEGY_PARAMS))
+    backtester = BacktesterV1(
+        db_url=None,
+        strategy=strategy,
+        initial_capital=INITIAL_CAPITAL,
+        mode=mode,
+        result_writer=DryRunWriter(None, buffer_runs=1)
+    )
+    timer.wrap(strategy, "generate_signals_batch", "signals")
+    timer.wrap(backtester, "_run_vectorized" if mode == "vectorized" else "_run_loop", "run")
+    timer.wrap(backtester, "_calculate_metrics", "metrics")
+    timer.wrap(backtester, "_save_to_db", "persist")
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = backtester.run(features_df=features, run_id=f"BENCH_{mode}_{bars}", persist=True)
+    elapsed = time.perf_counter() - started
+
+    equity = np.asarray(backtester.equity_curve, dtype=np.float64)
+    matrix = equity * np.random.default_rng(seed).normal(1.0, 0.001, (paths, len(equity)))
+    with timer.stage("batch_metrics"):
+        MetricsCalculator.batch_metrics(matrix)
+
+    stages = dict(timer.times)
+    stages["simulate"] = stages.pop("run") - stages.get("signals", 0.0)
+    return {
+        "bars": bars,
+        "mode": mode,
+        "trades": len(backtester.trades),
+        "pnl_total": float(results["pnl_total"]),
+        "seconds": elapsed,
+        "bars_per_sec": bars / elapsed,
+        "batch_metrics_cells_per_sec": matrix.size / stages["batch_metrics"],
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {name: stages.get(name, 0.0) for name in STAGES},
+    }
+
+
+def run_isolated(bars: int, mode: str, paths: int, seed: int) -> dict:
+    """run_case() in a fresh process (peak RSS is not inflated by earlier cases)."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_case, bars, mode, paths, seed).result()
+
+
+def git_commit() -> str:
+    """Short hash of HEAD (None outside a git checkout)."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def build_report(cases: list) -> dict:
+    """Benchmark report with environment and commit metadata."""
+    return {
+        "benchmark": "backtest",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cases": cases,
+    }
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """Per-case bars/sec ratio and peak RSS delta against a baseline report."""
+    previous = {(c["bars"], c["mode"]): c for c in baseline["cases"]}
+    rows = []
+    for case in report["cases"]:
+        old = previous.get((case["bars"], case["mode"]))
+        if old is None:
+            continue
+        rows.append({
+            "bars": case["bars"],
+            "mode": case["mode"],
+            "speedup": case["bars_per_sec"] / old["bars_per_sec"],
+            "rss_delta_mb": case["peak_rss_mb"] - old["peak_rss_mb"],
+        })
+    return rows
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark BacktesterV1 on synthetic features"
+    )
+    parser.add_argument(
+        "--bars",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_BARS),
+        help="Bar counts to benchmark (default: 10000 100000 1000000)"
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=BacktesterV1.MODES,
+        default=["vectorized"],
+        help="Backtester modes (default: vectorized; loop is slow on 1M bars)"
+    )
+    parser.add_argument(
+        "--paths",
+        type=int,
+        default=8,
+        help="Equity curves in the batch_metrics stage (default: 8)"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Report path (default: benchmarks/results/backtest_<commit>.json)"
+    )
+    parser.add_argument("--compare", type=Path, help="Baseline report to compare against")
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point."""
+    args = parse_args()
+
+    cases = []
+    for mode in args.modes:
+        for bars in args.bars:
+            case = run_isolated(bars, mode, args.paths, args.seed)
+            cases.append(case)
+            stages = ", ".join(f"{name} {case['stages'][name]:.2f}s" for name in STAGES)
+            print(f"{mode:>10} {bars:>9} bars: {case['bars_per_sec']:>12,.0f} bars/s, "
+                  f"peak RSS {case['peak_rss_mb']:.0f} MiB, {case['trades']} trades ({stages})")
+
+    report = build_report(cases)
+    output = args.output or ROOT / "benchmarks" / "results" / f"backtest_{report['git_commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nReport: {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print(f"\nAgainst {baseline.get('git_commit')}:")
+        for row in compare(report, baseline):
+            print(f"{row['mode']:>10} {row['bars']:>9} bars: x{row['speedup']:.2f} bars/s, "
+                  f"RSS {row['rss_delta_mb']:+.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ import psycopg2
 from dotenv import load_dotenv
 
 from tradlab.live.binance_connector import BinanceConnector
+from tradlab.engine.metrics import OnlineMetrics
 from tradlab.engine.strategies.str_100_chainflow_eth import STR100ChainFlowETH
 
 # Настройка логирования
@@ -97,6 +98,12 @@ class LiveTradingBot:
         self.current_position = None
         self.running = True
         
+        # Текущие метрики (обновляются на каждом новом баре и закрытии сделки)
+        self.metrics = OnlineMetrics(initial_equity=self.initial_capital)
+        self._last_metrics_bar = None
+        # max_dd — накопленный максимум и не убывает: алерт шлём один раз
+        self._max_dd_alert_sent = False
+        
         logger.info("=" * 70)
         logger.info("LIVE TRADING BOT ИНИЦИАЛИЗИРОВАН")
         logger.info("=" * 70)
@@ -127,13 +134,25 @@ class LiveTradingBot:
         Returns:
             Pandas Series с фичами или None
         """
+        df = self.get_latest_features_frame()
+        if df is None:
+            return None
+        return df.iloc[0]
+    
+    def get_latest_features_frame(self) -> Optional[pd.DataFrame]:
+        """
+        Получить последнюю свечу из lab.features_v1_mat как DataFrame из одной строки
+        
+        Returns:
+            DataFrame с фичами или None
+        """
         try:
-            # Получить последнюю свечу из lab.features_v1
+            # Получить последнюю свечу из lab.features_v1_mat (index-only по покрывающему индексу)
             query = f"""
             SELECT 
                 symbol, ts_4h, open_4h, high_4h, low_4h, close_4h, volume_4h,
                 close_1h, atr_14_1h, sma_50_4h, avg_volume_20
-            FROM lab.features_v1
+            FROM lab.features_v1_mat
             WHERE symbol = '{self.symbol}'
             ORDER BY ts_4h DESC
             LIMIT 1
@@ -142,11 +161,11 @@ class LiveTradingBot:
             df = pd.read_sql(query, self.db_conn)
             
             if df.empty:
-                logger.warning("⚠️ Нет данных в lab.features_v1")
+                logger.warning("⚠️ Нет данных в lab.features_v1_mat")
                 return None
             
             logger.info(f"✅ Загружены фичи: ts={df.iloc[0]['ts_4h']}, close={df.iloc[0]['close_4h']:.2f}")
-            return df.iloc[0]
+            return df
         
         except Exception as e:
             logger.error(f"❌ Ошибка получения фичей: {e}")
@@ -160,15 +179,20 @@ class LiveTradingBot:
             Словарь с сигналом или None
         """
         # Получить фичи
-        features = self.get_latest_features()
-        if features is None:
+        features_df = self.get_latest_features_frame()
+        if features_df is None:
             return None
+        features = features_df.iloc[0]
         
         # Получить текущий баланс
         balance = self.exchange.get_account_balance('USDT')
         
-        # Генерация сигнала
-        signal = self.strategy.generate_signal(features, balance)
+        # Генерация сигнала (пакетный путь, если стратегия его поддерживает)
+        batch = self.strategy.generate_signals_batch(features_df)
+        if batch is not None:
+            signal = self.strategy.signal_from_batch(batch, 0, features["ts_4h"], balance)
+        else:
+            signal = self.strategy.generate_signal(features, balance)
         
         if signal:
             logger.info(f"🔔 СИГНАЛ: {signal.side} @ {signal.entry_price:.2f}")
@@ -203,10 +227,14 @@ class LiveTradingBot:
             )
             
             if order:
+                # Цена исполнения из ответа биржи (иначе — цена сигнала)
+                entry_price = self.exchange.fill_price(order) or signal.entry_price
                 self.current_position = {
                     'side': signal.side,
-                    'entry_price': signal.entry_price,
+                    'entry_price': entry_price,
                     'quantity': quantity,
+                    # Комиссия входа, как commission_entry в BacktesterV1
+                    'commission_entry': quantity * entry_price * self.strategy_params['commission_rate'],
                     'stop_loss': signal.stop_loss,
                     'take_profit_1': signal.take_profit_1,
                     'take_profit_2': signal.take_profit_2,
@@ -368,14 +396,60 @@ class LiveTradingBot:
             if order:
                 logger.info(f"✅ Позиция закрыта ({reason}): {side} {quantity} {self.symbol}")
                 
+                # Цена исполнения из ответа биржи; без неё — текущая цена
+                exit_price = self.exchange.fill_price(order) or self.exchange.get_current_price(self.symbol)
+                
+                # Доля комиссии входа, приходящаяся на закрываемое количество
+                position_qty = self.current_position['quantity']
+                commission_entry = self.current_position.get('commission_entry', 0.0)
+                entry_share = commission_entry * min(quantity / position_qty, 1.0) if position_qty else 0.0
+                
+                if exit_price:
+                    # PnL за вычетом комиссий входа и выхода, как pnl сделки в BacktesterV1
+                    entry = self.current_position['entry_price']
+                    direction = 1 if self.current_position['side'] == 'LONG' else -1
+                    commission_exit = quantity * exit_price * self.strategy_params['commission_rate']
+                    self.metrics.update_trade(
+                        direction * quantity * (exit_price - entry) - entry_share - commission_exit
+                    )
+                
                 if partial >= 1.0:
                     self.current_position = None
                 else:
                     self.current_position['quantity'] *= (1.0 - partial)
+                    self.current_position['commission_entry'] = commission_entry - entry_share
         
         except Exception as e:
             logger.error(f"❌ Ошибка закрытия позиции: {e}")
     
+    def update_metrics(self, balance: float, price: Optional[float]):
+        """
+        Точка equity на каждом новом баре таймфрейма (как в бэктесте) и лог метрик
+        
+        Args:
+            balance: Баланс счёта (USDT)
+            price: Текущая цена (для нереализованного PnL открытой позиции)
+        """
+        bar = pd.Timestamp.now(tz='UTC').floor(self.timeframe)
+        if bar == self._last_metrics_bar:
+            return
+        self._last_metrics_bar = bar
+        
+        equity = balance
+        if self.current_position and price:
+            direction = 1 if self.current_position['side'] == 'LONG' else -1
+            equity += direction * self.current_position['quantity'] * (price - self.current_position['entry_price'])
+        self.metrics.update_equity(equity)
+        
+        m = self.metrics.snapshot()
+        logger.info(
+            f"📊 Sharpe: {m['sharpe']:.2f} | Sortino: {m['sortino']:.2f} | MaxDD: {m['max_dd']:.2f}% | "
+            f"Win Rate: {m['win_rate']:.1f}% | PF: {m['profit_factor']:.2f} | Сделок: {m['closed_trades']}"
+        )
+        if self.metrics.max_dd > 20.0 and not self._max_dd_alert_sent:
+            self._max_dd_alert_sent = True
+            self._send_alert(f"RISK_GATE_MAX_DD: {m['max_dd']:.2f}%")
+    
     def run(self, check_interval: int = 300):
         """
         Запустить бота
@@ -408,6 +482,7 @@ class LiveTradingBot:
                 position_status = f"ПОЗИЦИЯ: {self.current_position['side']}" if self.current_position else "НЕТ ПОЗИЦИИ"
                 
                 logger.info(f"💰 Баланс: ${balance:,.2f} | Цена ETH: ${price:,.2f} | {position_status}")
+                self.update_metrics(balance, price)
                 logger.info(f"⏳ Следующая проверка через {check_interval} сек...")
                 
                 # Ожидание
@@ -3,7 +3,18 @@
 TradLab Data Loader
 
 Loads OHLCV data from Binance using OHLCVCollector.
-Usage: python scripts/tradlab/load_data.py --symbol ETH/USDT --start 2024-01-01
+Usage: python scripts/tradlab/load_data.py --symbol ETH/USDT --start 2024-01-01 [--full]
+       python scripts/tradlab/load_data.py --symbol ETH/USDT,BTC/USDT --concurrency 4
+       python scripts/tradlab/load_data.py --symbol ETH/USDT --timeframes 1h --resample 4h,1d
+
+By default only candles after the last stored one (max(ts) in market.ohlcv) are
+fetched; --start is the lower bound for an empty table. --full re-downloads from
+--start. Progress is checkpointed in lab.jobs, so an interrupted run resumes.
+More than one (symbol, timeframe) pair with --concurrency > 1 switches to
+AsyncOHLCVCollector, which loads the pairs concurrently under one shared request
+rate limit (--concurrency 1 keeps the sequential OHLCVCollector).
+--resample builds the listed timeframes from stored 1h candles instead of
+downloading them (only completed UTC-aligned buckets are written).
 """
 import argparse
 import os
@@ -17,6 +28,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
 from dotenv import load_dotenv
 
+from tradlab.collector.async_collector import AsyncOHLCVCollector
 from tradlab.collector.ohlcv_collector_v0 import OHLCVCollector
 
 
@@ -34,7 +46,7 @@ def parse_args():
         "--symbol",
         type=str,
         default="ETH/USDT",
-        help="Trading pair (default: ETH/USDT)"
+        help="Trading pair or comma-separated pairs (default: ETH/USDT)"
     )
     parser.add_argument(
         "--timeframes",
@@ -48,6 +60,23 @@ def parse_args():
         default="2024-01-01",
         help="Start date YYYY-MM-DD (default: 2024-01-01)"
     )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Backfill from --start instead of continuing after the last stored candle"
+    )
+    parser.add_argument(
+        "--resample",
+        type=str,
+        default="",
+        help="Comma-separated timeframes built from stored 1h candles, e.g. 4h,1d (default: none)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=AsyncOHLCVCollector.DEFAULT_CONCURRENCY,
+        help="Concurrent (symbol, timeframe) downloads; 1 loads pairs one by one (default: 4)"
+    )
     return parser.parse_args()
 
 
@@ -65,8 +94,10 @@ def main():
         print("   Please set DATABASE_URL in .env.tradlab file")
         sys.exit(1)
 
-    # Parse timeframes
+    # Parse symbols and timeframes
+    symbols = [s.strip() for s in args.symbol.split(",")]
     timeframes = [tf.strip() for tf in args.timeframes.split(",")]
+    resample = [tf.strip() for tf in args.resample.split(",") if tf.strip()]
 
     # Parse start date
     try:
@@ -81,20 +112,47 @@ def main():
     print("=" * 60)
     print("TradLab Data Loader")
     print("=" * 60)
-    print(f"Symbol: {args.symbol}")
+    print(f"Symbols: {symbols}")
     print(f"Timeframes: {timeframes}")
+    if resample:
+        print(f"Resampled from {OHLCVCollector.RESAMPLE_BASE}: {resample}")
     print(f"Start date: {start_date.strftime('%Y-%m-%d')}")
+    print(f"Mode: {'full backfill' if args.full else 'incremental'}")
+    # Pairs (symbol, timeframe) are downloaded concurrently, including timeframes of one symbol
+    concurrent = len(symbols) * len(timeframes) > 1 and args.concurrency > 1
+    if concurrent:
+        print(f"Concurrency: {args.concurrency}")
     print(f"Database: {mask_db_url(db_url)}")
     print("=" * 60)
 
     # Create collector and load data
     try:
-        collector = OHLCVCollector(db_url)
-        collector.collect(
-            symbol=args.symbol,
-            timeframes=timeframes,
-            start_date=start_date
-        )
+        if not concurrent:
+            collector = OHLCVCollector(db_url)
+            for symbol in symbols:
+                collector.collect(
+                    symbol=symbol,
+                    timeframes=timeframes,
+                    start_date=start_date,
+                    incremental=not args.full,
+                    resample=resample
+                )
+        else:
+            collector = AsyncOHLCVCollector(db_url, concurrency=args.concurrency)
+            summary = collector.collect_many(
+                symbols,
+                timeframes=timeframes,
+                start_date=start_date,
+                incremental=not args.full,
+                resample=resample
+            )
+            failed = [
+                f"{symbol} {tf}"
+                for symbol, items in summary.items()
+                for tf, item in items.items() if item["status"] == "error"
+            ]
+            if failed:
+                raise RuntimeError(f"failed pairs: {', '.join(failed)}")
         print("\n✅ Data loading completed successfully!")
     except Exception as e:
         print(f"\n❌ ERROR: {e}")
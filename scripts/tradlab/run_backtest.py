@@ -3,7 +3,14 @@
 TradLab Backtest Runner
 
 Runs STR-100 backtest using BacktesterV1.
-Usage: python scripts/tradlab/run_backtest.py --start 2024-01-01 --end 2024-12-31
+Usage: python scripts/tradlab/run_backtest.py --start 2024-01-01 --end 2024-12-31 [--force] [--save-state]
+       python scripts/tradlab/run_backtest.py --resume RUN_ID [--end 2025-01-31]
+
+Results are cached in lab.result_cache; --force re-runs and refreshes the entry.
+--save-state stores the end-of-run state in lab.backtest_state; --resume RUN_ID
+continues that run over bars added since, without replaying the history.
+--chunk-size N streams features in chunks of N bars (bounded memory for long histories).
+--symbols ETHUSDT,BTCUSDT,... runs one portfolio backtest over the basket with a shared balance.
 """
 import argparse
 import os
@@ -17,6 +24,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 from dotenv import load_dotenv
 
 from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.portfolio import PortfolioBacktester
+from tradlab.engine.result_cache import ResultCache
 from tradlab.engine.strategies.str_100_chainflow_eth import STR100ChainFlowETH
 
 
@@ -39,14 +48,12 @@ def parse_args():
     parser.add_argument(
         "--start",
         type=str,
-        required=True,
-        help="Start date YYYY-MM-DD"
+        help="Start date YYYY-MM-DD (required unless --resume)"
     )
     parser.add_argument(
         "--end",
         type=str,
-        required=True,
-        help="End date YYYY-MM-DD"
+        help="End date YYYY-MM-DD (required unless --resume; with --resume: default latest bar)"
     )
     parser.add_argument(
         "--capital",
@@ -54,7 +61,43 @@ def parse_args():
         default=None,
         help="Initial capital (default: from .env.tradlab or 10000)"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore cached results in lab.result_cache and re-run"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write lab.result_cache"
+    )
+    parser.add_argument(
+        "--save-state",
+        action="store_true",
+        help="Store end-of-run state in lab.backtest_state for --resume"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Stream features from the DB in chunks of N bars (no result cache)"
+    )
+    parser.add_argument(
+        "--symbols",
+        type=str,
+        default=None,
+        help="Comma-separated basket for a portfolio backtest with shared capital (overrides --symbol)"
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        metavar="RUN_ID",
+        help="Continue a run saved with --save-state over new bars only"
+    )
+    args = parser.parse_args()
+    if not args.resume and not (args.start and args.end):
+        parser.error("--start and --end are required unless --resume is given")
+    return args
 
 
 def display_results(results: dict):
@@ -109,6 +152,14 @@ def display_results(results: dict):
     if avg_hold_hours > 0:
         print(f"⏱️  Avg Hold Time: {avg_hold_hours:.1f}h")
 
+    if results.get("per_symbol"):
+        print("\n" + "-" * 40)
+        print("PER SYMBOL")
+        print("-" * 40)
+        for symbol, stats in results["per_symbol"].items():
+            print(f"  {symbol:<10} PnL: ${stats['pnl_total']:>10,.2f}  "
+                  f"Trades: {stats['total_trades']:>4}  Win Rate: {stats['win_rate']:.1f}%")
+
     print("\n" + "-" * 40)
     print("RISK GATE STATUS")
     print("-" * 40)
@@ -135,9 +186,34 @@ def display_results(results: dict):
 
     print("\n" + "=" * 60)
     print(f"Run ID: {results['run_id']}")
+    if results.get("cache_hit"):
+        print("(cached result from lab.result_cache, use --force to re-run)")
     print("=" * 60)
 
 
+def resume_backtest(db_url: str, run_id: str, end_date):
+    """Continue a saved run over bars added after its last processed bar."""
+    print("=" * 60)
+    print("TradLab Backtest Runner (resume)")
+    print("=" * 60)
+    print(f"Run ID: {run_id}")
+    print(f"Database: {mask_db_url(db_url)}")
+    print("=" * 60)
+
+    try:
+        backtester = BacktesterV1.from_state(db_url, run_id)
+        results = backtester.resume(run_id, end_date=end_date)
+        if results is None:
+            print("\nNo new bars since the last update.")
+            return
+        display_results(results)
+    except Exception as e:
+        print(f"\nâŒ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
 def main():
     """Main entry point."""
     # Parse arguments first to allow --help
@@ -152,6 +228,10 @@ def main():
         print("   Please set DATABASE_URL in .env.tradlab file")
         sys.exit(1)
 
+    if args.resume:
+        resume_backtest(db_url, args.resume, args.end)
+        return
+
     # Get capital from args or environment
     if args.capital is not None:
         initial_capital = args.capital
@@ -165,7 +245,7 @@ def main():
     print("=" * 60)
     print("TradLab Backtest Runner")
     print("=" * 60)
-    print(f"Symbol: {args.symbol}")
+    print(f"Symbol: {args.symbols or args.symbol}")
     print(f"Period: {args.start} to {args.end}")
     print(f"Initial Capital: ${initial_capital:,.2f}")
     print(f"Commission Rate: {commission_rate * 100:.4f}%")
@@ -177,20 +257,44 @@ def main():
     try:
         strategy = STR100ChainFlowETH()
 
+        if args.symbols:
+            backtester = PortfolioBacktester(
+                db_url=db_url,
+                strategy=strategy,
+                symbols=[s.strip() for s in args.symbols.split(",") if s.strip()],
+                initial_capital=initial_capital,
+                commission_rate=commission_rate,
+                slippage_bps=slippage_bps
+            )
+            display_results(backtester.run(start_date=args.start, end_date=args.end))
+            return
+
         backtester = BacktesterV1(
             db_url=db_url,
             strategy=strategy,
             initial_capital=initial_capital,
             commission_rate=commission_rate,
-            slippage_bps=slippage_bps
+            slippage_bps=slippage_bps,
+            result_cache=None if args.no_cache else ResultCache(db_url)
         )
 
         # Run backtest
-        results = backtester.run(
-            symbol=args.symbol,
-            start_date=args.start,
-            end_date=args.end
-        )
+        if args.chunk_size:
+            results = backtester.run_stream(
+                symbol=args.symbol,
+                start_date=args.start,
+                end_date=args.end,
+                chunk_size=args.chunk_size,
+                save_state=args.save_state
+            )
+        else:
+            results = backtester.run(
+                symbol=args.symbol,
+                start_date=args.start,
+                end_date=args.end,
+                force=args.force,
+                save_state=args.save_state
+            )
 
         # Display results
         display_results(results)
@@ -9,11 +9,9 @@ from pathlib import Path
 # Добавить src в PYTHONPATH
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
 
-import psycopg2
 import pandas as pd
 from datetime import datetime
-from itertools import product
-from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.optimizer import GridSweep, SuccessiveHalving, expand_grid, rank_points
 from tradlab.engine.strategies.str_100_chainflow_eth import STR100ChainFlowETH
 
 # ============================================================
@@ -87,6 +85,21 @@ BACKTEST_CONFIG = {
     'slippage_bps': 5,
 }
 
+# Число процессов для sweep (None = все ядра)
+MAX_WORKERS = None
+
+# Поиск: 'grid' — полный перебор PARAM_GRID, 'halving' — successive halving
+# (HALVING_CONFIGS точек на 1/9 периода, лучшая треть — на 1/3, затем полный период)
+SEARCH = 'grid'
+HALVING_CONFIGS = 81
+
+# Досрочная остановка прогонов с просадкой > 20% (Risk Gate) + PRUNE_MARGIN п.п.
+# (status = 'pruned', метрики по пройденной части, в кэш не пишутся).
+# По умолчанию выключена — все прогоны до конца; включение: PRUNE_MARGIN = 5.0
+PRUNE_MARGIN = None
+
+RESULT_COLUMNS = ['sharpe', 'pnl_total', 'pnl_pct', 'max_dd', 'win_rate', 'total_trades', 'profit_factor', 'status']
+
 
 def get_db_url(db_config: dict) -> str:
     """Формирует строку подключения к БД из словаря конфигурации."""
@@ -94,9 +107,31 @@ def get_db_url(db_config: dict) -> str:
 
 DB_URL = get_db_url(DB_CONFIG)
 
-def run_optimization_for_period(period_key: str, period_config: dict):
+def create_sweep() -> GridSweep:
+    """Sweep-движок с конфигурацией этого скрипта"""
+    extra = {}
+    sweep_cls = GridSweep
+    if SEARCH == 'halving':
+        sweep_cls = SuccessiveHalving
+        extra = {'n_configs': HALVING_CONFIGS, 'seed': 42}
+    return sweep_cls(
+        db_url=DB_URL,
+        strategy_cls=STR100ChainFlowETH,
+        param_grid=PARAM_GRID,
+        fixed_params=FIXED_PARAMS,
+        strategy_id="STR-100",
+        symbol='ETHUSDT',
+        max_workers=MAX_WORKERS,
+        use_cache=True,
+        prune_margin=PRUNE_MARGIN,
+        **extra,
+        **BACKTEST_CONFIG
+    )
+
+
+def report_period(period_key: str, period_config: dict, df: pd.DataFrame):
     """
-    Запуск оптимизации для одного периода
+    Отчёт и сохранение результатов оптимизации одного периода
     """
     print("\n" + "=" * 80)
     print(f"ПЕРИОД: {period_config['name']}")
@@ -105,70 +140,18 @@ def run_optimization_for_period(period_key: str, period_config: dict):
     print(f"Описание: {period_config['description']}")
     print("=" * 80)
     
-    # Генерация комбинаций
-    param_names = list(PARAM_GRID.keys())
-    param_values = list(PARAM_GRID.values())
-    combinations = list(product(*param_values))
-    total = len(combinations)
-    
-    print(f"\nВсего комбинаций: {total}")
-    
-    results = []
-    
-    for idx, params in enumerate(combinations, 1):
-        param_dict = dict(zip(param_names, params))
-        
-        if idx % 10 == 1 or idx == total:
-            print(f"[{idx}/{total}] {param_dict}")
-        
-        # Создать стратегию 
-        # Объединить параметры в один словарь
-        all_params = {**param_dict, **FIXED_PARAMS}
-        strategy = STR100ChainFlowETH(strategy_id="STR-100", params=all_params)
-        
-        # Запустить бэктест
-        # Используем commission_rate/slippage_bps из all_params, если BacktesterV1 может их принять
-        # В BacktesterV1 они передаются через **BACKTEST_CONFIG
-        backtester = BacktesterV1(
-            db_url=DB_URL,  # Передаем DB_URL, который требует BacktesterV1
-            strategy=strategy,
-            **BACKTEST_CONFIG
-        )
-        
-        try:
-            result = backtester.run(
-                symbol='ETHUSDT',
-                start_date=period_config['start'],
-                end_date=period_config['end']
-            )
-            
-            pnl_total = result.get('pnl_total', 0)
-            
-            results.append({
-                **param_dict,
-                'sharpe': result.get('sharpe', 0),
-                'pnl_total': pnl_total,
-                'pnl_pct': (pnl_total / BACKTEST_CONFIG['initial_capital']) * 100, 
-                'max_dd': result.get('max_dd', 0),
-                'win_rate': result.get('win_rate', 0),
-                'total_trades': result.get('total_trades', 0),
-                'profit_factor': result.get('profit_factor', 0)
-            })
-            
-        except Exception as e:
-            print(f"    ❌ Ошибка: {e}")
-            continue
+    total = len(expand_grid(PARAM_GRID)) if SEARCH == 'grid' else len(df)
     
     # Сохранить результаты
-    if results:
-        df = pd.DataFrame(results)
-        df = df.sort_values('sharpe', ascending=False)
+    if not df.empty:
+        df = df[list(PARAM_GRID.keys()) + RESULT_COLUMNS]
+        df = rank_points(df, 'sharpe')
         
         filename = f"optimization_{period_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         df.to_csv(filename, index=False)
         
         print(f"\n✅ Результаты сохранены: {filename}")
-        print(f"Успешных бэктестов: {len(results)}/{total}")
+        print(f"Успешных бэктестов: {len(df)}/{total}")
         
         # ТОП-3
         print(f"\n🏆 ТОП-3 для {period_config['name']}:\n")
@@ -245,17 +228,19 @@ def main():
     print("МУЛЬТИПЕРИОДНАЯ ОПТИМИЗАЦИЯ STR-100")
     print("=" * 80)
     # Вычисляем общее количество комбинаций
-    total_combinations = len(list(product(*PARAM_GRID.values())))
+    total_combinations = len(expand_grid(PARAM_GRID))
     print(f"Периодов для тестирования: {len(TEST_PERIODS)}")
     print(f"Комбинаций параметров: {total_combinations}")
     print("=" * 80)
     
-    results_dict = {}
+    # Все периоды одним sweep: фичи грузятся один раз на период,
+    # прогоны распределяются по процессам
+    sweep = create_sweep()
+    tables = sweep.run(TEST_PERIODS)
     
-    # Запустить оптимизацию для каждого периода
+    results_dict = {}
     for period_key, period_config in TEST_PERIODS.items():
-        df = run_optimization_for_period(period_key, period_config)
-        results_dict[period_key] = df
+        results_dict[period_key] = report_period(period_key, period_config, tables[period_key])
     
     # Сравнить результаты
     compare_periods(results_dict)
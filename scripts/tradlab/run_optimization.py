@@ -8,9 +8,8 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
-from src.tradlab.engine.backtester_v1 import BacktesterV1
+from src.tradlab.engine.optimizer import GridSweep, expand_grid, rank_points
 from src.tradlab.engine.strategies.str_100_chainflow_eth import STR100ChainFlowETH
-import itertools
 import pandas as pd
 from datetime import datetime
 
@@ -45,24 +44,31 @@ END_DATE = "2024-12-31"
 SYMBOL = "ETHUSDT"
 INITIAL_CAPITAL = 10000.0
 
-def run_backtest(params: dict):
-    """Запуск одного бэктеста с заданными параметрами"""
-    strategy = STR100ChainFlowETH(params=params)
-    bt = BacktesterV1(
+# Число процессов для sweep (None = все ядра)
+MAX_WORKERS = None
+
+# Досрочная остановка прогонов с просадкой > 20% (Risk Gate) + PRUNE_MARGIN п.п.
+# (status = "pruned", метрики по пройденной части, в кэш не пишутся).
+# По умолчанию выключена — все прогоны до конца; включение: PRUNE_MARGIN = 5.0
+PRUNE_MARGIN = None
+
+RESULT_COLUMNS = ["sharpe", "pnl_total", "pnl_pct", "max_dd", "win_rate", "total_trades", "status"]
+
+def create_sweep() -> GridSweep:
+    """Sweep-движок с конфигурацией этого скрипта"""
+    return GridSweep(
         db_url=DB_URL,
-        strategy=strategy,
-        initial_capital=INITIAL_CAPITAL,
-        commission_rate=params.get("commission_rate", 0.0004),
-        slippage_bps=params.get("slippage_bps", 5.0)
-    )
-    
-    metrics = bt.run(
+        strategy_cls=STR100ChainFlowETH,
+        param_grid=PARAM_GRID,
+        fixed_params=FIXED_PARAMS,
         symbol=SYMBOL,
-        start_date=START_DATE,
-        end_date=END_DATE
+        initial_capital=INITIAL_CAPITAL,
+        commission_rate=FIXED_PARAMS.get("commission_rate", 0.0004),
+        slippage_bps=FIXED_PARAMS.get("slippage_bps", 5.0),
+        max_workers=MAX_WORKERS,
+        use_cache=True,
+        prune_margin=PRUNE_MARGIN
     )
-    
-    return metrics
 
 def main():
     print("=" * 60)
@@ -75,58 +81,19 @@ def main():
     for key, values in PARAM_GRID.items():
         print(f"  {key}: {values}")
     
-    # Генерация комбинаций
     keys = list(PARAM_GRID.keys())
-    values = list(PARAM_GRID.values())
-    combinations = list(itertools.product(*values))
-    total = len(combinations)
+    total = len(expand_grid(PARAM_GRID))
     
     print(f"\nTotal combinations: {total}")
     print("=" * 60)
     
-    results = []
+    def progress(done, total):
+        if done % 10 == 0 or done == total:
+            print(f"[{done}/{total}] completed")
     
-    for i, combo in enumerate(combinations, 1):
-        params = FIXED_PARAMS.copy()
-        for key, value in zip(keys, combo):
-            params[key] = value
-        
-        print(f"\n[{i}/{total}] Testing: long={params['master_long_threshold']}, "
-              f"short={params['master_short_threshold']}, "
-              f"lookback={params['lookback_z']}, sl_min={params['k_sl_min']}")
-        
-        try:
-            metrics = run_backtest(params)
-            
-            if metrics is None:
-                print(f"  -> ERROR: run_backtest returned None")
-                continue
-            
-            # Преобразуем pnl_total в процент
-            pnl_pct = (metrics.get("pnl_total", 0) / INITIAL_CAPITAL) * 100
-            
-            result = {
-                **{k: params[k] for k in keys},
-                "sharpe": metrics.get("sharpe", 0),
-                "pnl_total": metrics.get("pnl_total", 0),
-                "pnl_pct": pnl_pct,
-                "max_dd": metrics.get("max_dd", 0),
-                "win_rate": metrics.get("win_rate", 0),
-                "total_trades": metrics.get("total_trades", 0)
-            }
-            results.append(result)
-            
-            print(f"  -> Sharpe: {result['sharpe']:.2f}, "
-                  f"PnL: {result['pnl_pct']:.2f}%, "
-                  f"DD: {result['max_dd']:.2f}%, "
-                  f"WR: {result['win_rate']:.1f}%, "
-                  f"Trades: {result['total_trades']}")
-            
-        except Exception as e:
-            print(f"  -> ERROR: {str(e)[:100]}")
-            import traceback
-            traceback.print_exc()
-            continue
+    sweep = create_sweep()
+    df = sweep.run({"main": {"start": START_DATE, "end": END_DATE}}, progress=progress)["main"]
+    results = df[keys + RESULT_COLUMNS].to_dict("records") if not df.empty else []
     
     # Проверка что есть результаты
     if not results:
@@ -148,7 +115,7 @@ def main():
     print(f"Successful backtests: {len(results)}/{total}")
     
     # Топ-5 по Sharpe
-    df_sorted = df.sort_values("sharpe", ascending=False)
+    df_sorted = rank_points(df, "sharpe")
     print("\nTop 5 by Sharpe Ratio:")
     print(df_sorted.head(5).to_string(index=False))
     
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+TradLab Robustness Analysis
+
+Bootstrap / shuffle resampling of a stored run's trades (lab.trades) and
+percentiles of Sharpe, Sortino, MaxDD, Calmar, Win Rate and Profit Factor.
+Usage: python scripts/tradlab/run_robustness.py RUN_ID [--samples 10000] [--method bootstrap|shuffle]
+
+Percentiles are stored in lab.results.meta["robustness"] of that run (unless --dry-run).
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from dotenv import load_dotenv
+
+from tradlab.engine.robustness import METHODS, METRICS, analyze_run
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Bootstrap confidence intervals for a stored backtest run"
+    )
+    parser.add_argument("run_id", help="run_id in lab.results / lab.trades")
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=10_000,
+        help="Number of resampled trade sequences (default: 10000)"
+    )
+    parser.add_argument(
+        "--method",
+        choices=METHODS,
+        default="bootstrap",
+        help="bootstrap = resample with replacement, shuffle = permute order (default: bootstrap)"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print percentiles without writing lab.results.meta"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point."""
+    args = parse_args()
+
+    load_dotenv(dotenv_path=Path(__file__).parent.parent.parent / ".env.tradlab")
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        print("ERROR: DATABASE_URL not found in environment")
+        print("   Please set DATABASE_URL in .env.tradlab file")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    summary = analyze_run(
+        db_url, args.run_id,
+        n_samples=args.samples, method=args.method, seed=args.seed,
+        persist=not args.dry_run
+    )
+    elapsed = time.perf_counter() - started
+
+    print("=" * 60)
+    print(f"ROBUSTNESS: {args.run_id}")
+    print("=" * 60)
+    print(f"Method: {summary['method']}, samples: {summary['n_samples']}, "
+          f"trades: {summary['n_trades']} ({elapsed:.2f}s)")
+    columns = list(next(iter(summary["percentiles"].values())))
+    print(f"\n{'metric':<15}{'observed':>10}" + "".join(f"{c:>10}" for c in columns))
+    for name in METRICS:
+        row = summary["percentiles"][name]
+        print(f"{name:<15}{summary['observed'][name]:>10.2f}" + "".join(f"{row[c]:>10.2f}" for c in columns))
+    if summary["dropped"]:
+        dropped = ", ".join(f"{name} {count}" for name, count in summary["dropped"].items())
+        print(f"\nSamples with undefined metrics (excluded from percentiles): {dropped}")
+    if not args.dry_run:
+        print("\nStored in lab.results.meta['robustness']")
+
+
+if __name__ == "__main__":
+    main()
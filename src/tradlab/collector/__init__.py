@@ -1,3 +1,9 @@
+from .bulk_loader import LoadResult, OHLCVBulkLoader
+from .resampler import OHLCVResampler, resample_ohlcv
 from .ohlcv_collector_v0 import OHLCVCollector
+from .async_collector import AsyncOHLCVCollector
 
-__all__ = ["OHLCVCollector"]
+__all__ = [
+    "OHLCVCollector", "AsyncOHLCVCollector", "OHLCVBulkLoader", "LoadResult",
+    "OHLCVResampler", "resample_ohlcv",
+]
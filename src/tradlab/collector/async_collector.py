@@ -0,0 +1,306 @@
+"""
+Асинхронный OHLCV Collector - параллельная загрузка многих пар и таймфреймов
+
+Пары (symbol, timeframe) обрабатываются воркерами asyncio с ограниченной
+конкурентностью; все запросы к бирже проходят через один общий RateLimiter.
+Загрузка и запись в БД идут конвейером: пока часть пишется в market.ohlcv
+(в пуле потоков), следующая уже загружается. Checkpoint задачи символа в
+lab.jobs общий для всех его таймфреймов и обновляется под asyncio.Lock задачи,
+чтобы более старый снимок progress не перезаписал более новый.
+
+Биржа - синхронный ccxt-клиент (вызовы уходят в пул потоков) или объект
+с async fetch_ohlcv (ccxt.async_support, локальная фейковая биржа в тестах).
+"""
+import asyncio
+import functools
+import inspect
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import pandas as pd
+
+from .bulk_loader import OHLCVBulkLoader
+from .ohlcv_collector_v0 import OHLCVCollector
+
+
+class RateLimiter:
+    """
+    Общий бюджет запросов: не больше rate запросов в секунду на все задачи.
+
+    Каждый acquire() резервирует следующий свободный слот с шагом 1 / rate
+    и ждёт его наступления.
+    """
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Запросов в секунду
+        """
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ожидание слота для одного запроса."""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncOHLCVCollector(OHLCVCollector):
+    """
+    Collector для параллельной загрузки OHLCV по многим символам и таймфреймам.
+
+    Логика загрузки как у OHLCVCollector.collect(): инкрементально от
+    max(ts), только закрытые свечи, части по CHECKPOINT_PAGES страниц с
+    checkpoint в lab.jobs (одна задача на символ).
+
+    Пример:
+        collector = AsyncOHLCVCollector(db_url, concurrency=8)
+        collector.collect_many(["ETH/USDT", "BTC/USDT"], ["1h", "4h"])
+
+    Attributes:
+        concurrency: Число одновременно обрабатываемых пар (symbol, timeframe)
+        limiter: Общий RateLimiter запросов к бирже
+    """
+
+    DEFAULT_CONCURRENCY = 4
+
+    def __init__(
+        self,
+        db_url: str,
+        exchange: Any = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        requests_per_second: Optional[float] = None
+    ):
+        """
+        Args:
+            db_url: PostgreSQL connection string
+            exchange: Биржа с fetch_ohlcv(symbol, timeframe, since, limit)
+                (синхронным или async); None - ccxt.binance как у OHLCVCollector
+            concurrency: Число одновременно обрабатываемых пар
+            requests_per_second: Общий лимит запросов (None - 1 / RATE_LIMIT_DELAY)
+        """
+        super().__init__(db_url)
+        if exchange is not None:
+            self.exchange = exchange
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second or 1.0 / self.RATE_LIMIT_DELAY
+        self.limiter: Optional[RateLimiter] = None
+
+    def collect_many(
+        self,
+        symbols: List[str],
+        timeframes: List[str] = None,
+        start_date: Optional[datetime] = None,
+        incremental: bool = True,
+        resample: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Синхронная обёртка над collect_async() (asyncio.run)."""
+        return asyncio.run(
+            self.collect_async(symbols, timeframes, start_date, incremental, resample)
+        )
+
+    async def collect_async(
+        self,
+        symbols: List[str],
+        timeframes: List[str] = None,
+        start_date: Optional[datetime] = None,
+        incremental: bool = True,
+        resample: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Загрузка всех пар (symbol, timeframe).
+
+        Args:
+            symbols: Торговые пары ("ETH/USDT", ...)
+            timeframes: Список таймфреймов (по умолчанию 1h, 4h)
+            start_date: Дата начала (по умолчанию 2019-01-01)
+            incremental: Начинать со свечи после последней сохранённой
+            resample: Таймфреймы, строящиеся из RESAMPLE_BASE после загрузки символа
+
+        Returns:
+            {symbol_db: {timeframe: {"status": "done"|"error", "rows": n, "error": ...}}}
+        """
+        if timeframes is None:
+            timeframes = ["1h", "4h"]
+        if start_date is None:
+            start_date = self.DEFAULT_START
+
+        self.limiter = RateLimiter(self.requests_per_second)
+        self.logger.info(
+            f"Запуск async collector: {len(symbols)} символов x {timeframes}, "
+            f"concurrency={self.concurrency}, {self.requests_per_second:g} req/s"
+        )
+
+        # Задача lab.jobs на каждый символ
+        jobs = {}
+        for symbol in symbols:
+            symbol_db = symbol.replace('/', '')
+            jobs[symbol_db] = await self._in_thread(self._start_job, symbol_db, timeframes, start_date)
+        locks = {job_id: asyncio.Lock() for job_id, _ in jobs.values()}
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for symbol in symbols:
+            for timeframe in timeframes:
+                queue.put_nowait((symbol, timeframe))
+
+        summary: Dict[str, Dict[str, Dict[str, Any]]] = {s.replace('/', ''): {} for s in symbols}
+
+        async def worker():
+            while True:
+                try:
+                    symbol, timeframe = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                symbol_db = symbol.replace('/', '')
+                job_id, progress = jobs[symbol_db]
+                try:
+                    rows = await self._collect_pair(
+                        symbol, timeframe, start_date, incremental, job_id, progress,
+                        locks[job_id]
+                    )
+                    summary[symbol_db][timeframe] = {"status": "done", "rows": rows}
+                except Exception as e:
+                    self.logger.error(f"❌ Ошибка при обработке {symbol} {timeframe}: {e}")
+                    summary[symbol_db][timeframe] = {"status": "error", "rows": 0, "error": str(e)}
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, queue.qsize()))))
+
+        for symbol_db, (job_id, progress) in jobs.items():
+            failed = [tf for tf, item in summary[symbol_db].items() if item["status"] == "error"]
+            if resample:
+                not_built = await self._in_thread(
+                    self._resample, symbol_db, resample, start_date, incremental, failed
+                )
+                for timeframe in resample:
+                    status = "error" if timeframe in not_built else "done"
+                    summary[symbol_db][timeframe] = {"status": status, "resampled": True}
+                failed.extend(not_built)
+            await self._in_thread(
+                self._update_job, job_id,
+                status="error" if failed else "done",
+                progress=progress, failed=failed
+            )
+
+        self.logger.info("Async collector завершил работу")
+        return summary
+
+    async def _collect_pair(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_date: datetime,
+        incremental: bool,
+        job_id: int,
+        progress: Dict[str, Any],
+        lock: asyncio.Lock
+    ) -> int:
+        """
+        Загрузка одной пары: запись части идёт параллельно с загрузкой следующей.
+
+        Части пары пишутся по одной через общий OHLCVBulkLoader (одно
+        соединение и staging-таблица на пару).
+        """
+        symbol_db = symbol.replace('/', '')
+        since = await self._in_thread(
+            self.resume_point, symbol_db, timeframe, start_date,
+            progress.get(timeframe), incremental
+        )
+        self.logger.info(f"Загрузка {symbol} {timeframe} с {since}")
+
+        saved = 0
+        pending: Optional[asyncio.Task] = None
+        loader = self.bulk_loader()
+        try:
+            async for df in self._fetch_chunks_async(symbol, timeframe, since):
+                # Не больше одной записи на пару: порядок checkpoint сохраняется
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(
+                    self._write_chunk(df, symbol, timeframe, job_id, progress, lock, loader)
+                )
+                saved += len(df)
+            if pending is not None:
+                await pending
+        finally:
+            # Запись в пуле потоков отменой не прерывается — дожидаемся её,
+            # прежде чем закрыть соединение загрузчика
+            if pending is not None and not pending.done():
+                await asyncio.gather(pending, return_exceptions=True)
+            await self._in_thread(loader.close)
+        return saved
+
+    async def _write_chunk(
+        self,
+        df: pd.DataFrame,
+        symbol: str,
+        timeframe: str,
+        job_id: int,
+        progress: Dict[str, Any],
+        lock: asyncio.Lock,
+        loader: OHLCVBulkLoader
+    ):
+        """
+        Валидация и запись части (в пуле потоков), затем checkpoint в lab.jobs.
+
+        progress общий для таймфреймов символа, а meta || {"progress": ...}
+        заменяет объект целиком: снимок и его запись идут под lock задачи,
+        иначе запись более старого снимка из пула потоков могла бы завершиться
+        позже более нового.
+        """
+        result = await self._in_thread(self.save_chunk, df, symbol, timeframe, loader)
+        async with lock:
+            progress[timeframe] = self._checkpoint(progress.get(timeframe), df, result)
+            snapshot = {tf: dict(item) for tf, item in progress.items()}
+            await self._in_thread(self._update_job, job_id, progress=snapshot)
+
+    async def _fetch_chunks_async(
+        self,
+        symbol: str,
+        timeframe: str,
+        since: datetime
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Асинхронный аналог fetch_ohlcv_chunks(): части по CHECKPOINT_PAGES страниц."""
+        last_closed_ms = self.last_closed_ms(timeframe)
+        since_ms = int(since.timestamp() * 1000)
+
+        chunk = []
+        pages = 0
+        while True:
+            await self.limiter.acquire()
+            ohlcv = await self._fetch_page(symbol, timeframe, since_ms)
+            if not ohlcv:
+                break
+
+            pages += 1
+            chunk.extend(row for row in ohlcv if row[0] <= last_closed_ms)
+            if pages % self.CHECKPOINT_PAGES == 0 and chunk:
+                yield self._to_frame(chunk)
+                chunk = []
+
+            # Следующая страница - со свечи после последней полученной
+            since_ms = ohlcv[-1][0] + 1
+            if len(ohlcv) < self.FETCH_LIMIT:
+                break
+
+        if chunk:
+            yield self._to_frame(chunk)
+
+    async def _fetch_page(self, symbol: str, timeframe: str, since_ms: int) -> List[list]:
+        """Один запрос fetch_ohlcv (await для async-биржи, иначе в пуле потоков)."""
+        fetch = self.exchange.fetch_ohlcv
+        kwargs = {"timeframe": timeframe, "since": since_ms, "limit": self.FETCH_LIMIT}
+        if inspect.iscoroutinefunction(fetch):
+            return await fetch(symbol, **kwargs)
+        return await self._in_thread(fetch, symbol, **kwargs)
+
+    @staticmethod
+    async def _in_thread(func, *args, **kwargs) -> Any:
+        """Вызов блокирующей функции (psycopg2, sync ccxt) в пуле потоков."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
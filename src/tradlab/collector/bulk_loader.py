@@ -0,0 +1,159 @@
+"""
+Пакетная запись свечей в market.ohlcv
+
+Страница (или вся история) пишется одним COPY ... FROM STDIN во временную
+staging-таблицу и переносится в market.ohlcv одним
+INSERT ... SELECT ... ON CONFLICT (symbol, tf, ts) DO NOTHING. rowcount
+такого INSERT точен, поэтому load() возвращает число вставленных и
+пропущенных (уже сохранённых) свечей.
+
+Staging-таблица создаётся один раз на соединение (ON COMMIT DELETE ROWS),
+так что загрузчик можно держать открытым на всю загрузку.
+"""
+import io
+from typing import NamedTuple, Optional, Sequence
+
+import pandas as pd
+import psycopg2
+
+
+OHLCV_COLUMNS = ('symbol', 'tf', 'ts', 'open', 'high', 'low', 'close', 'volume', 'source')
+
+_CREATE_STAGE_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS ohlcv_stage ON COMMIT DELETE ROWS AS
+    SELECT {', '.join(OHLCV_COLUMNS)} FROM market.ohlcv WITH NO DATA
+"""
+
+_COPY_STAGE_SQL = (
+    f"COPY ohlcv_stage ({', '.join(OHLCV_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+)
+
+_MERGE_STAGE_SQL = f"""
+    INSERT INTO market.ohlcv ({', '.join(OHLCV_COLUMNS)})
+    SELECT {', '.join(OHLCV_COLUMNS)} FROM ohlcv_stage
+    ON CONFLICT (symbol, tf, ts) DO NOTHING
+"""
+
+
+def ohlcv_to_csv(df: pd.DataFrame, symbol: str, timeframe: str, source: str) -> io.StringIO:
+    """
+    CSV-буфер свечей для COPY в ohlcv_stage (в порядке OHLCV_COLUMNS)
+
+    Собирается одним DataFrame.to_csv, без Python-кортежа на строку;
+    ts пишется с таймзоной, float — без потери точности.
+    """
+    frame = df[['ts', 'open', 'high', 'low', 'close', 'volume']].assign(
+        symbol=symbol, tf=timeframe, source=source
+    )
+    buffer = io.StringIO()
+    frame[list(OHLCV_COLUMNS)].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    return buffer
+
+
+class LoadResult(NamedTuple):
+    """Итог записи: свечей передано / вставлено (остальные уже были в БД)"""
+
+    rows: int
+    inserted: int
+
+    @property
+    def skipped(self) -> int:
+        """Свечи, пропущенные по ON CONFLICT"""
+        return self.rows - self.inserted
+
+
+class OHLCVBulkLoader:
+    """
+    COPY + merge свечей в market.ohlcv на одном соединении
+
+    Пример:
+        with OHLCVBulkLoader(db_url) as loader:
+            for df in pages:
+                result = loader.load(df, "ETHUSDT", "1h")
+                print(result.inserted, result.skipped)
+
+    Каждый load() — отдельная транзакция: при ошибке откатывается только
+    текущая страница, записанные ранее остаются.
+
+    Attributes:
+        source: Значение колонки source
+        feature_timeframes: Таймфреймы, после записи которых в той же транзакции
+            вызывается lab.refresh_features_v1_mat
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        source: str = 'binance',
+        feature_timeframes: Sequence[str] = ('1h', '4h')
+    ):
+        """
+        Args:
+            db_url: PostgreSQL connection string
+            source: Источник данных (market.ohlcv.source)
+            feature_timeframes: Таймфреймы lab.features_v1_mat (пусто — без пересчёта)
+        """
+        self.db_url = db_url
+        self.source = source
+        self.feature_timeframes = tuple(feature_timeframes)
+        self._conn = None
+        self._staged = False
+
+    def __enter__(self) -> "OHLCVBulkLoader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """Закрытие соединения (staging-таблица удаляется вместе с сессией)"""
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._staged = False
+
+    def load(self, df: pd.DataFrame, symbol: str, timeframe: str) -> LoadResult:
+        """
+        Запись свечей одной транзакцией
+
+        Args:
+            df: DataFrame с колонками ts, open, high, low, close, volume
+            symbol: Символ в формате БД (ETHUSDT)
+            timeframe: Таймфрейм
+
+        Returns:
+            LoadResult(rows, inserted); skipped — уже сохранённые свечи
+        """
+        if df.empty:
+            return LoadResult(0, 0)
+
+        if self._conn is None:
+            self._conn = psycopg2.connect(self.db_url)
+        conn = self._conn
+        try:
+            with conn.cursor() as cursor:
+                if not self._staged:
+                    cursor.execute(_CREATE_STAGE_SQL)
+                cursor.copy_expert(
+                    _COPY_STAGE_SQL, ohlcv_to_csv(df, symbol, timeframe, self.source)
+                )
+                cursor.execute(_MERGE_STAGE_SQL)
+                inserted = cursor.rowcount
+
+                # Инкрементальный пересчёт lab.features_v1_mat с первой
+                # сохранённой свечи (в той же транзакции)
+                if timeframe in self.feature_timeframes:
+                    cursor.execute(
+                        "SELECT lab.refresh_features_v1_mat(%s, %s)",
+                        (symbol, df['ts'].min())
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        # CREATE TEMP TABLE откатывается вместе с транзакцией — помечаем после commit
+        self._staged = True
+        return LoadResult(len(df), inserted)
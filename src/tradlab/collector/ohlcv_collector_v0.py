@@ -5,12 +5,17 @@ OHLCV Collector v0 - Загрузка исторических данных с B
 Дата: 2025-11-24
 """
 import ccxt
+import json
+import numpy as np
 import pandas as pd
 import psycopg2
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import time
 import logging
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .bulk_loader import LoadResult, OHLCVBulkLoader
+from .resampler import OHLCVResampler
 
 
 class OHLCVCollector:
@@ -27,6 +32,11 @@ class OHLCVCollector:
     FETCH_LIMIT = 1000  # Максимум записей за один запрос к API
     RATE_LIMIT_DELAY = 0.1  # Задержка между запросами (секунды)
     DEFAULT_SOURCE = 'binance'  # Источник данных
+    FEATURE_TIMEFRAMES = ('1h', '4h')  # Таймфреймы, входящие в lab.features_v1_mat
+    DEFAULT_START = datetime(2019, 1, 1, tzinfo=timezone.utc)  # Начало истории по умолчанию
+    CHECKPOINT_PAGES = 1  # Страниц FETCH_LIMIT в одной записи в БД и checkpoint в lab.jobs
+    JOB_TYPE = 'collect'  # lab.jobs.job_type задач загрузки
+    RESAMPLE_BASE = '1h'  # Базовый таймфрейм для построения старших (resample в collect)
 
     def __init__(self, db_url: str):
         """
@@ -78,7 +88,10 @@ class OHLCVCollector:
         since: datetime
     ) -> pd.DataFrame:
         """
-        Загрузка OHLCV данных с Binance.
+        Загрузка OHLCV данных с Binance одним DataFrame.
+
+        Все страницы держатся в памяти до конца загрузки — для коротких
+        периодов; collect() использует fetch_ohlcv_chunks().
 
         Args:
             symbol: Торговая пара (например, "ETH/USDT")
@@ -92,11 +105,65 @@ class OHLCVCollector:
             f"Начало загрузки {symbol} {timeframe} с {since}"
         )
 
+        all_ohlcv = []
+        for ohlcv in self._fetch_pages(symbol, timeframe, since):
+            all_ohlcv.extend(ohlcv)
+            self.logger.info(
+                f"Загружено {len(ohlcv)} свечей, "
+                f"всего: {len(all_ohlcv)}"
+            )
+
+        df = self._to_frame(all_ohlcv)
+
+        self.logger.info(
+            f"Загрузка завершена: {len(df)} свечей "
+            f"({df['ts'].min()} - {df['ts'].max()})"
+        )
+
+        return df
+
+    def fetch_ohlcv_chunks(
+        self,
+        symbol: str,
+        timeframe: str,
+        since: datetime,
+        pages: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Загрузка OHLCV частями по pages страниц (по умолчанию CHECKPOINT_PAGES).
+
+        Генератор: следующая страница запрашивается, только когда предыдущая
+        часть обработана, так что в памяти не больше одной части.
+
+        В отличие от fetch_ohlcv() отдаёт только закрытые свечи: текущая
+        (ещё формирующаяся) свеча не сохраняется, иначе при ON CONFLICT DO
+        NOTHING её неполные значения остались бы в БД навсегда.
+
+        Yields:
+            DataFrame с колонками: ts, open, high, low, close, volume
+        """
+        pages = pages or self.CHECKPOINT_PAGES
+        last_closed_ms = self.last_closed_ms(timeframe)
+
+        chunk = []
+        for i, ohlcv in enumerate(self._fetch_pages(symbol, timeframe, since), start=1):
+            chunk.extend(row for row in ohlcv if row[0] <= last_closed_ms)
+            if i % pages == 0 and chunk:
+                yield self._to_frame(chunk)
+                chunk = []
+        if chunk:
+            yield self._to_frame(chunk)
+
+    def _fetch_pages(
+        self,
+        symbol: str,
+        timeframe: str,
+        since: datetime
+    ) -> Iterator[List[list]]:
+        """Страницы по FETCH_LIMIT свечей с since до последней свечи биржи."""
         # Конвертируем datetime в миллисекунды
         since_ms = int(since.timestamp() * 1000)
 
-        all_ohlcv = []
-
         while True:
             try:
                 # Запрос к Binance
@@ -106,38 +173,31 @@ class OHLCVCollector:
                     since=since_ms,
                     limit=self.FETCH_LIMIT
                 )
+            except Exception as e:
+                self.logger.error(f"Ошибка при загрузке данных: {e}")
+                raise
 
-                if not ohlcv:
-                    break
-
-                all_ohlcv.extend(ohlcv)
-
-                # Проверяем, есть ли ещё данные
-                last_timestamp = ohlcv[-1][0]
-
-                # Обновляем стартовую точку для следующей итерации
-                # Используем +1 чтобы не получить ту же свечу снова
-                since_ms = last_timestamp + 1
+            if not ohlcv:
+                break
 
-                self.logger.info(
-                    f"Загружено {len(ohlcv)} свечей, "
-                    f"всего: {len(all_ohlcv)}"
-                )
+            yield ohlcv
 
-                # Rate limiting - пауза между запросами
-                time.sleep(self.RATE_LIMIT_DELAY)
+            # Обновляем стартовую точку для следующей итерации
+            # Используем +1 чтобы не получить ту же свечу снова
+            since_ms = ohlcv[-1][0] + 1
 
-                # Если получили меньше limit, значит дошли до конца
-                if len(ohlcv) < self.FETCH_LIMIT:
-                    break
+            # Rate limiting - пауза между запросами
+            time.sleep(self.RATE_LIMIT_DELAY)
 
-            except Exception as e:
-                self.logger.error(f"Ошибка при загрузке данных: {e}")
-                raise
+            # Если получили меньше limit, значит дошли до конца
+            if len(ohlcv) < self.FETCH_LIMIT:
+                break
 
-        # Конвертируем в DataFrame
+    @staticmethod
+    def _to_frame(ohlcv: List[list]) -> pd.DataFrame:
+        """Свечи CCXT ([ms, o, h, l, c, v]) в DataFrame с ts в UTC."""
         df = pd.DataFrame(
-            all_ohlcv,
+            ohlcv,
             columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
         )
 
@@ -146,28 +206,94 @@ class OHLCVCollector:
         df = df.drop('timestamp', axis=1)
 
         # Переставляем колонки в нужном порядке
-        df = df[['ts', 'open', 'high', 'low', 'close', 'volume']]
+        return df[['ts', 'open', 'high', 'low', 'close', 'volume']]
 
-        self.logger.info(
-            f"Загрузка завершена: {len(df)} свечей "
-            f"({df['ts'].min()} - {df['ts'].max()})"
-        )
+    @staticmethod
+    def timeframe_ms(timeframe: str) -> int:
+        """Длительность таймфрейма в миллисекундах ("1h" -> 3600000)."""
+        return ccxt.Exchange.parse_timeframe(timeframe) * 1000
 
-        return df
+    @classmethod
+    def last_closed_ms(cls, timeframe: str) -> int:
+        """Время открытия (ms) последней закрытой свечи: не позже now - таймфрейм."""
+        return int(time.time() * 1000) - cls.timeframe_ms(timeframe)
+
+    # ===== ИНКРЕМЕНТАЛЬНАЯ ЗАГРУЗКА =====
+
+    def last_stored_ts(self, symbol: str, timeframe: str) -> Optional[datetime]:
+        """
+        Время открытия последней сохранённой свечи (max(ts) в market.ohlcv).
+
+        Args:
+            symbol: Символ в формате БД (ETHUSDT)
+            timeframe: Таймфрейм
+
+        Returns:
+            datetime в UTC или None, если свечей ещё нет
+        """
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT max(ts) FROM market.ohlcv WHERE symbol = %s AND tf = %s",
+                    (symbol, timeframe)
+                )
+                return cursor.fetchone()[0]
+
+    def resume_point(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_date: datetime,
+        checkpoint: Optional[Dict[str, Any]] = None,
+        incremental: bool = True
+    ) -> datetime:
+        """
+        С какой свечи продолжать загрузку (symbol, timeframe).
+
+        Берётся самая поздняя из точек: start_date; свеча после checkpoint
+        прерванной задачи (lab.jobs.meta.progress); при incremental — свеча
+        после max(ts) в market.ohlcv.
+
+        Args:
+            symbol: Символ в формате БД (ETHUSDT)
+            timeframe: Таймфрейм
+            start_date: Нижняя граница загрузки
+            checkpoint: {"last_ts": ISO-время последней сохранённой свечи, ...}
+            incremental: Учитывать уже сохранённые свечи (иначе — бэкфилл с start_date)
+        """
+        step = timedelta(milliseconds=self.timeframe_ms(timeframe))
+        since = start_date
+        if checkpoint and checkpoint.get("last_ts"):
+            since = max(since, datetime.fromisoformat(checkpoint["last_ts"]) + step)
+        if incremental:
+            last_ts = self.last_stored_ts(symbol, timeframe)
+            if last_ts is not None:
+                since = max(since, last_ts + step)
+        return since
+
+    def bulk_loader(self) -> OHLCVBulkLoader:
+        """Загрузчик market.ohlcv с настройками collector (соединение — при первой записи)."""
+        return OHLCVBulkLoader(self.db_url, self.DEFAULT_SOURCE, self.FEATURE_TIMEFRAMES)
 
     def save_to_db(
         self,
         df: pd.DataFrame,
         symbol: str,
-        timeframe: str
-    ):
+        timeframe: str,
+        loader: Optional[OHLCVBulkLoader] = None
+    ) -> LoadResult:
         """
-        Сохранение данных в PostgreSQL.
+        Сохранение данных в PostgreSQL (COPY + merge через OHLCVBulkLoader).
 
         Args:
             df: DataFrame с OHLCV данными
             symbol: Символ (ETHUSDT)
             timeframe: Таймфрейм (1h, 4h)
+            loader: Открытый загрузчик (одно соединение и staging-таблица на всю
+                загрузку); None — отдельный загрузчик на этот вызов
+
+        Returns:
+            LoadResult: свечей передано, вставлено и пропущено как дубликаты
         """
         self.logger.info(
             f"Сохранение {len(df)} записей в БД "
@@ -178,48 +304,24 @@ class OHLCVCollector:
         symbol_db = symbol.replace('/', '')
 
         try:
-            # Используем context manager для автоматического закрытия соединения
-            with psycopg2.connect(self.db_url) as conn:
-                with conn.cursor() as cursor:
-                    # Подготавливаем данные для bulk insert
-                    # Используем to_records() для лучшей производительности
-                    records = [
-                        (
-                            symbol_db,
-                            timeframe,
-                            row.ts,
-                            float(row.open),
-                            float(row.high),
-                            float(row.low),
-                            float(row.close),
-                            float(row.volume),
-                            self.DEFAULT_SOURCE
-                        )
-                        for row in df.itertuples(index=False)
-                    ]
-
-                    # Bulk insert с ON CONFLICT DO NOTHING
-                    insert_query = """
-                        INSERT INTO market.ohlcv
-                        (symbol, tf, ts, open, high, low, close, volume, source)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (symbol, tf, ts) DO NOTHING
-                    """
-
-                    cursor.executemany(insert_query, records)
-                    conn.commit()
-
-                    # Note: rowcount may not be accurate with ON CONFLICT
-                    inserted_count = cursor.rowcount
-                    self.logger.info(
-                        f"Обработано {inserted_count} записей "
-                        f"(дубликаты автоматически пропущены)"
-                    )
-
+            if loader is None:
+                with self.bulk_loader() as own:
+                    result = own.load(df, symbol_db, timeframe)
+            else:
+                result = loader.load(df, symbol_db, timeframe)
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении в БД: {e}")
+            if loader is not None:
+                # Соединение могло оборваться — следующая запись откроет новое
+                loader.close()
             raise
 
+        self.logger.info(
+            f"Вставлено {result.inserted} записей, "
+            f"дубликатов пропущено: {result.skipped}"
+        )
+        return result
+
     def validate_data(self, df: pd.DataFrame) -> bool:
         """
         Валидация данных (проверка пропусков, дубликатов).
@@ -237,53 +339,50 @@ class OHLCVCollector:
             self.logger.error("DataFrame пустой")
             return False
 
-        # Проверка на NaN значения в критических колонках
+        # Все проверки — по одному numpy-массиву (n, 5) без промежуточных DataFrame
         critical_columns = ['open', 'high', 'low', 'close', 'volume']
-        if df[critical_columns].isnull().any().any():
-            null_counts = df[critical_columns].isnull().sum()
+        values = df[critical_columns].to_numpy(dtype=np.float64)
+        open_, high, low, close = values[:, 0], values[:, 1], values[:, 2], values[:, 3]
+
+        # Проверка на NaN значения в критических колонках
+        nan_mask = np.isnan(values)
+        if nan_mask.any():
+            null_counts = pd.Series(nan_mask.sum(axis=0), index=critical_columns)
             self.logger.error(
                 f"Найдены NaN значения в критических колонках:\n{null_counts}"
             )
             return False
 
         # Проверка на дубликаты по timestamp
-        duplicates = df[df.duplicated(subset=['ts'], keep=False)]
-        if not duplicates.empty:
+        duplicates = int(df['ts'].duplicated(keep=False).sum())
+        if duplicates:
             self.logger.warning(
-                f"Найдено {len(duplicates)} дубликатов по timestamp"
+                f"Найдено {duplicates} дубликатов по timestamp"
             )
             # Не фейлим, дубликаты будут пропущены при insert
 
         # Проверка на правильность OHLCV
         # high должен быть >= low, open, close
-        invalid_high = df[
-            (df['high'] < df['low']) |
-            (df['high'] < df['open']) |
-            (df['high'] < df['close'])
-        ]
-        if not invalid_high.empty:
+        invalid_high = int(((high < low) | (high < open_) | (high < close)).sum())
+        if invalid_high:
             self.logger.error(
-                f"Найдено {len(invalid_high)} записей "
+                f"Найдено {invalid_high} записей "
                 f"с некорректными значениями high"
             )
             return False
 
         # Проверка на правильность OHLCV
         # low должен быть <= high, open, close
-        invalid_low = df[
-            (df['low'] > df['high']) |
-            (df['low'] > df['open']) |
-            (df['low'] > df['close'])
-        ]
-        if not invalid_low.empty:
+        invalid_low = int(((low > high) | (low > open_) | (low > close)).sum())
+        if invalid_low:
             self.logger.error(
-                f"Найдено {len(invalid_low)} записей "
+                f"Найдено {invalid_low} записей "
                 f"с некорректными значениями low"
             )
             return False
 
         # Проверка на отрицательные значения
-        if (df[critical_columns] < 0).any().any():
+        if (values < 0).any():
             self.logger.error("Найдены отрицательные значения")
             return False
 
@@ -294,59 +393,236 @@ class OHLCVCollector:
         self,
         symbol: str = "ETH/USDT",
         timeframes: List[str] = None,
-        start_date: Optional[datetime] = None
+        start_date: Optional[datetime] = None,
+        incremental: bool = True,
+        resample: Optional[List[str]] = None
     ):
         """
         Основной метод для загрузки данных.
 
+        Загрузка идёт конвейером по страницам (CHECKPOINT_PAGES): каждая
+        страница валидируется, пишется в БД (COPY + merge через один
+        OHLCVBulkLoader на весь вызов) и освобождается, прогресс пишется
+        в lab.jobs.meta.progress. Память не растёт с длиной
+        истории, при сбое сохранённые страницы остаются в БД.
+        Незавершённая задача с теми же symbol и start_date продолжается с
+        checkpoint. При incremental загрузка начинается со свечи после max(ts)
+        в market.ohlcv, так что ежедневное обновление стоит нескольких запросов.
+
+        Таймфреймы из resample не загружаются с биржи, а строятся из
+        сохранённых RESAMPLE_BASE (1h) свечей после загрузки — достаточно
+        timeframes=["1h"], resample=["4h", "1d"].
+
         Args:
             symbol: Торговая пара
             timeframes: Список таймфреймов
             start_date: Дата начала (по умолчанию 2019-01-01)
+            incremental: Начинать со свечи после последней сохранённой
+                (False — бэкфилл с start_date, дубликаты пропускаются при insert)
+            resample: Таймфреймы, строящиеся из RESAMPLE_BASE (OHLCVResampler)
         """
         if timeframes is None:
             timeframes = ["1h", "4h"]
 
         if start_date is None:
-            start_date = datetime(2019, 1, 1, tzinfo=timezone.utc)
+            start_date = self.DEFAULT_START
 
         self.logger.info(
             f"========================================\n"
             f"Запуск collector для {symbol}\n"
             f"Таймфреймы: {timeframes}\n"
-            f"Период: с {start_date}\n"
+            f"Период: с {start_date}"
+            f"{' (инкрементально)' if incremental else ''}\n"
             f"========================================"
         )
 
-        for timeframe in timeframes:
-            try:
-                self.logger.info(f"\n--- Обработка {timeframe} ---")
+        symbol_db = symbol.replace('/', '')
+        job_id, progress = self._start_job(symbol_db, timeframes, start_date)
+        failed = []
 
-                # Загрузка данных
-                df = self.fetch_ohlcv(symbol, timeframe, start_date)
+        with self.bulk_loader() as loader:
+            for timeframe in timeframes:
+                try:
+                    self.logger.info(f"\n--- Обработка {timeframe} ---")
 
-                # Валидация
-                if not self.validate_data(df):
+                    since = self.resume_point(
+                        symbol_db, timeframe, start_date,
+                        progress.get(timeframe), incremental
+                    )
+                    self.logger.info(f"Загрузка {timeframe} с {since}")
+
+                    saved = 0
+                    for df in self.fetch_ohlcv_chunks(symbol, timeframe, since):
+                        # Валидация и сохранение в БД, затем checkpoint
+                        result = self.save_chunk(df, symbol, timeframe, loader)
+                        saved += len(df)
+                        progress[timeframe] = self._checkpoint(progress.get(timeframe), df, result)
+                        self._update_job(job_id, progress=progress)
+
+                    if saved:
+                        self.logger.info(f"✅ {timeframe} обработан успешно: {saved} свечей\n")
+                    else:
+                        self.logger.info(f"✅ {timeframe}: новых закрытых свечей нет\n")
+
+                except Exception as e:
                     self.logger.error(
-                        f"Валидация не пройдена для {timeframe}, "
-                        f"пропускаем сохранение"
+                        f"❌ Ошибка при обработке {timeframe}: {e}\n"
                     )
+                    failed.append(timeframe)
+                    # Продолжаем со следующим timeframe
                     continue
 
-                # Сохранение в БД
-                self.save_to_db(df, symbol, timeframe)
-
-                self.logger.info(f"✅ {timeframe} обработан успешно\n")
+        if resample:
+            failed.extend(self._resample(symbol_db, resample, start_date, incremental, failed))
 
-            except Exception as e:
-                self.logger.error(
-                    f"❌ Ошибка при обработке {timeframe}: {e}\n"
-                )
-                # Продолжаем со следующим timeframe
-                continue
+        self._update_job(
+            job_id,
+            status="error" if failed else "done",
+            progress=progress,
+            failed=failed
+        )
 
         self.logger.info(
             "========================================\n"
             "Collector завершил работу\n"
             "========================================"
         )
+
+    def resampler(self) -> OHLCVResampler:
+        """Ресемплер старших таймфреймов из RESAMPLE_BASE с настройками collector."""
+        return OHLCVResampler(
+            self.db_url, self.RESAMPLE_BASE, self.DEFAULT_SOURCE, self.FEATURE_TIMEFRAMES
+        )
+
+    def _resample(
+        self,
+        symbol: str,
+        timeframes: List[str],
+        start_date: datetime,
+        incremental: bool,
+        failed: List[str]
+    ) -> List[str]:
+        """
+        Построение timeframes из RESAMPLE_BASE после загрузки.
+
+        Returns:
+            Таймфреймы, которые не удалось построить (все, если загрузка базы упала)
+        """
+        if self.RESAMPLE_BASE in failed:
+            self.logger.error(
+                f"❌ {self.RESAMPLE_BASE} не загружен — ресемплинг {timeframes} пропущен"
+            )
+            return list(timeframes)
+
+        try:
+            results = self.resampler().resample(symbol, timeframes, start_date, incremental)
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка ресемплинга {timeframes}: {e}")
+            return list(timeframes)
+
+        for timeframe, result in results.items():
+            self.logger.info(
+                f"✅ {timeframe} из {self.RESAMPLE_BASE}: "
+                f"вставлено {result.inserted}, пропущено {result.skipped}"
+            )
+        return []
+
+    def save_chunk(
+        self,
+        df: pd.DataFrame,
+        symbol: str,
+        timeframe: str,
+        loader: Optional[OHLCVBulkLoader] = None
+    ) -> Optional[LoadResult]:
+        """Валидация части загрузки и сохранение в БД (ValueError, если невалидна)."""
+        if not self.validate_data(df):
+            raise ValueError(
+                f"Валидация не пройдена для {timeframe} "
+                f"({df['ts'].min()} - {df['ts'].max()})"
+            )
+        return self.save_to_db(df, symbol, timeframe, loader)
+
+    @staticmethod
+    def _checkpoint(
+        previous: Optional[Dict[str, Any]],
+        df: pd.DataFrame,
+        result: Optional[LoadResult] = None
+    ) -> Dict[str, Any]:
+        """Прогресс таймфрейма после сохранения df (для lab.jobs.meta.progress)."""
+        previous = previous or {}
+        checkpoint = {
+            "last_ts": df['ts'].max().isoformat(),
+            "rows": previous.get("rows", 0) + len(df),
+        }
+        if result is not None:
+            # Точное число новых свечей (rows включает пропущенные дубликаты)
+            checkpoint["inserted"] = previous.get("inserted", 0) + result.inserted
+        return checkpoint
+
+    # ===== ЗАДАЧИ В lab.jobs =====
+
+    def _start_job(
+        self,
+        symbol: str,
+        timeframes: List[str],
+        start_date: datetime
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        Задача загрузки в lab.jobs: незавершённая с тем же symbol и start_date
+        продолжается (status снова "running"), иначе создаётся новая.
+
+        Returns:
+            (job_id, progress) — progress по таймфреймам из meta задачи
+        """
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT job_id, meta FROM lab.jobs
+                    WHERE job_type = %s AND status IN ('running', 'error')
+                      AND meta->>'symbol' = %s AND meta->>'start_date' = %s
+                    ORDER BY job_id DESC LIMIT 1
+                    """,
+                    (self.JOB_TYPE, symbol, start_date.isoformat())
+                )
+                row = cursor.fetchone()
+                if row is not None:
+                    job_id, meta = row
+                    progress = (meta or {}).get("progress") or {}
+                    cursor.execute(
+                        "UPDATE lab.jobs SET status = 'running', finished_at = NULL "
+                        "WHERE job_id = %s",
+                        (job_id,)
+                    )
+                    self.logger.info(f"Продолжение задачи lab.jobs #{job_id}: {progress}")
+                    return job_id, progress
+
+                meta = {
+                    "symbol": symbol,
+                    "timeframes": list(timeframes),
+                    "start_date": start_date.isoformat(),
+                    "progress": {},
+                }
+                cursor.execute(
+                    "INSERT INTO lab.jobs (job_type, status, meta) "
+                    "VALUES (%s, 'running', %s) RETURNING job_id",
+                    (self.JOB_TYPE, json.dumps(meta))
+                )
+                return cursor.fetchone()[0], {}
+
+    def _update_job(self, job_id: int, status: Optional[str] = None, **meta):
+        """Дописывание meta задачи (checkpoint); status — завершение задачи."""
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cursor:
+                if status is None:
+                    cursor.execute(
+                        "UPDATE lab.jobs SET meta = COALESCE(meta, '{}'::jsonb) || %s::jsonb "
+                        "WHERE job_id = %s",
+                        (json.dumps(meta), job_id)
+                    )
+                else:
+                    cursor.execute(
+                        "UPDATE lab.jobs SET meta = COALESCE(meta, '{}'::jsonb) || %s::jsonb, "
+                        "status = %s, finished_at = now() WHERE job_id = %s",
+                        (json.dumps(meta), status, job_id)
+                    )
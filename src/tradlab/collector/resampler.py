@@ -0,0 +1,219 @@
+"""
+Ресемплинг свечей: старшие таймфреймы (4h, 1d, ...) из сохранённых 1h
+
+Свечи 4h/1d полностью определяются часовыми, поэтому их не нужно
+загружать с биржи отдельно. Корзины выровнены по UTC, как у Binance:
+4h открываются в 00/04/08/... UTC, 1d — в 00:00 UTC, 1w — в понедельник.
+Пишутся только завершённые корзины: последняя, в которую ещё придут
+базовые свечи, дописывается при следующем запуске.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import ccxt
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from .bulk_loader import LoadResult, OHLCVBulkLoader
+
+
+# 1970-01-01 — четверг; недельные свечи Binance открываются в понедельник
+_WEEK_ORIGIN_MS = 4 * 86_400_000
+
+
+def _timeframe_ms(timeframe: str) -> int:
+    """Длительность таймфрейма в миллисекундах ("4h" -> 14400000)."""
+    if timeframe.endswith('M'):
+        raise ValueError(f"Месячный таймфрейм не поддерживается ресемплингом: {timeframe}")
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def bucket_start(ts: datetime, timeframe: str) -> datetime:
+    """Начало корзины timeframe (UTC), в которую попадает ts."""
+    step = _timeframe_ms(timeframe)
+    origin = _WEEK_ORIGIN_MS if timeframe.endswith('w') else 0
+    ms = int(ts.timestamp() * 1000)
+    start = (ms - origin) // step * step + origin
+    return datetime.fromtimestamp(start / 1000, tz=timezone.utc)
+
+
+def resample_ohlcv(
+    df: pd.DataFrame,
+    timeframe: str,
+    base_timeframe: str = '1h',
+    since: Optional[datetime] = None
+) -> pd.DataFrame:
+    """
+    Свечи timeframe из свечей base_timeframe (только завершённые корзины).
+
+    Группировка векторная: номер корзины считается целочисленно по ms,
+    агрегаты — через ufunc.reduceat по границам корзин.
+
+    Корзина считается завершённой, если базовые свечи дошли до её конца
+    (пропуски внутри, например простой биржи, допускаются, как у Binance).
+    Первая корзина отбрасывается, только если её начало отрезано since.
+    Если с середины корзины начинается сама история (листинг в 02:00),
+    неполная первая корзина пишется — Binance отдаёт её так же.
+
+    Args:
+        df: DataFrame с колонками ts, open, high, low, close, volume
+        timeframe: Целевой таймфрейм ("4h", "1d", "1w")
+        base_timeframe: Таймфрейм df
+        since: Нижняя граница, по которой обрезан df (None — df начинается
+            с начала истории)
+
+    Returns:
+        DataFrame с колонками ts, open, high, low, close, volume
+    """
+    step = _timeframe_ms(timeframe)
+    base_step = _timeframe_ms(base_timeframe)
+    if step <= base_step or step % base_step:
+        raise ValueError(f"{timeframe} не кратен базовому таймфрейму {base_timeframe}")
+
+    columns = ['ts', 'open', 'high', 'low', 'close', 'volume']
+    df = df.sort_values('ts', kind='stable').drop_duplicates('ts')
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    ms = df['ts'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    origin = _WEEK_ORIGIN_MS if timeframe.endswith('w') else 0
+    bucket = (ms - origin) // step * step + origin
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ms)] - 1
+
+    values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)
+    out = pd.DataFrame({
+        'ts': pd.to_datetime(bucket[starts], unit='ms', utc=True),
+        'open': values[starts, 0],
+        'high': np.maximum.reduceat(values[:, 1], starts),
+        'low': np.minimum.reduceat(values[:, 2], starts),
+        'close': values[ends, 3],
+        'volume': np.add.reduceat(values[:, 4], starts),
+    })
+
+    complete = bucket[starts] + step <= ms[-1] + base_step
+    if since is not None:
+        complete[0] &= bucket[0] >= int(pd.Timestamp(since).timestamp() * 1000)
+    return out[complete].reset_index(drop=True)
+
+
+class OHLCVResampler:
+    """
+    Запись старших таймфреймов в market.ohlcv из сохранённых базовых свечей.
+
+    Пример:
+        resampler = OHLCVResampler(db_url)
+        resampler.resample("ETHUSDT", ["4h", "1d"])
+
+    По умолчанию инкрементально: с корзины после последней сохранённой
+    свечи каждого таймфрейма. Запись — через OHLCVBulkLoader (ON CONFLICT
+    DO NOTHING, пересчёт lab.features_v1_mat для 4h).
+
+    Attributes:
+        base_timeframe: Таймфрейм, из которого строятся остальные
+        source: Значение market.ohlcv.source для построенных свечей
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        base_timeframe: str = '1h',
+        source: str = 'binance',
+        feature_timeframes: Sequence[str] = ('1h', '4h')
+    ):
+        """
+        Args:
+            db_url: PostgreSQL connection string
+            base_timeframe: Таймфрейм базовых свечей
+            source: Источник (свечи производные от базовых того же источника)
+            feature_timeframes: Таймфреймы lab.features_v1_mat (см. OHLCVBulkLoader)
+        """
+        self.db_url = db_url
+        self.base_timeframe = base_timeframe
+        self.source = source
+        self.feature_timeframes = tuple(feature_timeframes)
+
+    def resample(
+        self,
+        symbol: str,
+        timeframes: List[str],
+        since: Optional[datetime] = None,
+        incremental: bool = True
+    ) -> Dict[str, LoadResult]:
+        """
+        Построение и запись timeframes для symbol.
+
+        Args:
+            symbol: Символ в формате БД (ETHUSDT)
+            timeframes: Целевые таймфреймы ("4h", "1d", ...)
+            since: Нижняя граница (None — вся история базовых свечей)
+            incremental: Начинать с корзины после последней сохранённой
+
+        Returns:
+            {timeframe: LoadResult}
+        """
+        starts = {tf: self._start(symbol, tf, since, incremental) for tf in timeframes}
+        bounded = [s for s in starts.values() if s is not None]
+        lower = min(bounded) if len(bounded) == len(starts) else None
+        base = self.load_base(symbol, lower)
+
+        results = {}
+        for timeframe in timeframes:
+            start = starts[timeframe]
+            part = base if start is None else base[base['ts'] >= start]
+            frame = resample_ohlcv(part, timeframe, self.base_timeframe, since=start)
+            results[timeframe] = self.save(frame, symbol, timeframe)
+        return results
+
+    def _start(
+        self,
+        symbol: str,
+        timeframe: str,
+        since: Optional[datetime],
+        incremental: bool
+    ) -> Optional[datetime]:
+        """Начало первой корзины, которую нужно построить (None — с начала истории)."""
+        start = None if since is None else bucket_start(since, timeframe)
+        if start is not None and start < since:
+            # Корзина с since внутри неполна снизу — начинаем со следующей
+            start += timedelta(milliseconds=_timeframe_ms(timeframe))
+        if incremental:
+            last_ts = self.last_stored_ts(symbol, timeframe)
+            if last_ts is not None:
+                after_last = last_ts + timedelta(milliseconds=_timeframe_ms(timeframe))
+                start = after_last if start is None else max(start, after_last)
+        return start
+
+    def load_base(self, symbol: str, since: Optional[datetime] = None) -> pd.DataFrame:
+        """Базовые свечи symbol с since (None — все) в порядке ts."""
+        query = (
+            "SELECT ts, open, high, low, close, volume FROM market.ohlcv "
+            "WHERE symbol = %s AND tf = %s"
+        )
+        params = [symbol, self.base_timeframe]
+        if since is not None:
+            query += " AND ts >= %s"
+            params.append(since)
+        query += " ORDER BY ts"
+
+        with psycopg2.connect(self.db_url) as conn:
+            df = pd.read_sql(query, conn, params=params)
+        df['ts'] = pd.to_datetime(df['ts'], utc=True)
+        return df
+
+    def last_stored_ts(self, symbol: str, timeframe: str) -> Optional[datetime]:
+        """max(ts) timeframe в market.ohlcv (None, если свечей нет)."""
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT max(ts) FROM market.ohlcv WHERE symbol = %s AND tf = %s",
+                    (symbol, timeframe)
+                )
+                return cursor.fetchone()[0]
+
+    def save(self, df: pd.DataFrame, symbol: str, timeframe: str) -> LoadResult:
+        """Запись построенных свечей (COPY + merge)."""
+        with OHLCVBulkLoader(self.db_url, self.source, self.feature_timeframes) as loader:
+            return loader.load(df, symbol, timeframe)
@@ -3,7 +3,7 @@ Demo-?????? ??? ???????????? ?????????
 ?????????? ????????????? OHLCV ??????
 """
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 def generate_demo_ohlcv(
     symbol: str = "BTCUSDT",
@@ -55,6 +55,117 @@ def generate_demo_ohlcv(
     
     return data
 
+def generate_demo_ohlcv_frame(
+    symbol: str = "BTCUSDT",
+    bars: int = 100,
+    start_price: float = 50000.0,
+    volatility: float = 0.02,
+    freq: str = "1h",
+    start: str = "2024-01-01",
+    seed: Optional[int] = None,
+    max_move: Optional[float] = None
+):
+    """
+    Векторная версия generate_demo_ohlcv(): те же распределения, но DataFrame
+
+    Случайные величины всех баров генерируются массивами NumPy, путь цены
+    собирается одним cumsum логарифмов: open_i = close_{i-1} * (1 + change_i),
+    close_i = open_i * f_i, где f_i ~ U(low_i / open_i, high_i / open_i).
+    Миллион баров генерируется за доли секунды.
+
+    Мультипликативное блуждание на длинной истории уходит к нулю или в
+    бесконечность; max_move ограничивает цену коридором
+    [start_price / max_move, start_price * max_move] с отражением от границ.
+
+    Args:
+        symbol: Торговая пара
+        bars: Количество баров
+        start_price: Начальная цена
+        volatility: Волатильность (0.02 = 2%)
+        freq: Шаг баров (pandas offset, например "1h" или "4h")
+        start: Время первого бара
+        seed: Seed генератора (None — случайный)
+        max_move: Коридор цены (во сколько раз она может отойти от start_price);
+            None — без ограничения, как generate_demo_ohlcv()
+
+    Returns:
+        DataFrame с колонками symbol, timestamp, open, high, low, close, volume
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    change = rng.uniform(-volatility, volatility, bars)
+    up = rng.uniform(0, volatility / 2, bars)
+    down = rng.uniform(0, volatility / 2, bars)
+    # close / open внутри [low, high] бара
+    body = rng.uniform(1 - down, 1 + up)
+
+    # Лог-цена по шагам open_0, close_0, open_1, close_1, ...
+    steps = np.empty(2 * bars)
+    steps[0::2] = np.log1p(change)
+    steps[1::2] = np.log(body)
+    path = np.cumsum(steps)
+    if max_move is not None:
+        # Отражение от границ ±band: "пила" с периодом 4 * band
+        band = np.log(max_move)
+        path = band - np.abs(np.mod(path + band, 4 * band) - 2 * band)
+    prices = start_price * np.exp(path)
+    open_, close = prices[0::2], prices[1::2]
+
+    return pd.DataFrame({
+        "symbol": symbol,
+        "timestamp": pd.date_range(start, periods=bars, freq=freq),
+        "open": np.round(open_, 2),
+        "high": np.round(np.maximum(open_ * (1 + up), close), 2),
+        "low": np.round(np.minimum(open_ * (1 - down), close), 2),
+        "close": np.round(close, 2),
+        "volume": np.round(rng.uniform(100, 1000, bars), 2),
+    })
+
+def generate_demo_features(
+    bars: int = 1000,
+    symbol: str = "ETHUSDT",
+    start_price: float = 2000.0,
+    volatility: float = 0.02,
+    start: str = "2024-01-01",
+    seed: Optional[int] = None,
+    max_move: Optional[float] = 4.0
+):
+    """
+    Синтетические 4h-фичи в формате lab.features_v1 (для бэктестов без БД)
+
+    OHLCV — generate_demo_ohlcv_frame() с шагом 4h (цена в коридоре
+    max_move, чтобы история в миллион баров оставалась торгуемой),
+    производные фичи (ATR, SMA 50, средний объём 20) — скользящие окна pandas.
+
+    Returns:
+        DataFrame с колонками symbol, ts_4h, open_4h ... avg_volume_20
+    """
+    import numpy as np
+
+    ohlcv = generate_demo_ohlcv_frame(
+        symbol, bars, start_price, volatility, freq="4h", start=start, seed=seed,
+        max_move=max_move
+    )
+    close = ohlcv["close"]
+    prev_close = close.shift(fill_value=close.iloc[0]) if bars else close
+    true_range = np.maximum(
+        ohlcv["high"] - ohlcv["low"],
+        np.maximum((ohlcv["high"] - prev_close).abs(), (ohlcv["low"] - prev_close).abs())
+    )
+
+    return ohlcv.rename(columns={
+        "timestamp": "ts_4h", "open": "open_4h", "high": "high_4h",
+        "low": "low_4h", "close": "close_4h", "volume": "volume_4h",
+    }).assign(
+        ts_4h=ohlcv["timestamp"].dt.tz_localize("UTC"),
+        close_1h=close,
+        atr_14_1h=true_range.rolling(14, min_periods=1).mean(),
+        sma_50_4h=close.rolling(50, min_periods=1).mean(),
+        avg_volume_20=ohlcv["volume"].rolling(20, min_periods=1).mean(),
+    )
+
 if __name__ == "__main__":
     # ???? ????????? ??????
     data = generate_demo_ohlcv(bars=10)
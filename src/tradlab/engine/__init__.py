@@ -1,7 +1,12 @@
-from .signal import Signal
+from .signal import Signal, SignalBatch
 from .strategy_abi import BaseStrategy
 from .feature_adapter_v1 import FeatureAdapterV1
-from .metrics import MetricsCalculator
+from .feature_store import FeatureStore
+from .metrics import MetricsCalculator, OnlineMetrics
+from .ledger import TradeLedger
 from .backtester_v1 import BacktesterV1
+from .optimizer import GridSweep, SuccessiveHalving
+from .walk_forward import WalkForward
+from .portfolio import PortfolioBacktester
 
-__all__ = ["Signal", "BaseStrategy", "FeatureAdapterV1", "MetricsCalculator", "BacktesterV1"]
+__all__ = ["Signal", "SignalBatch", "BaseStrategy", "FeatureAdapterV1", "FeatureStore", "MetricsCalculator", "OnlineMetrics", "TradeLedger", "BacktesterV1", "GridSweep", "SuccessiveHalving", "WalkForward", "PortfolioBacktester"]
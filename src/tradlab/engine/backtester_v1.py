@@ -5,16 +5,19 @@ Backtester v1 для TradLab
 с расчётом метрик и проверкой через Risk Gate.
 """
 
+import importlib
+import numpy as np
 import pandas as pd
-import psycopg2
-import psycopg2.extras
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Sequence
 import uuid
 
 from .strategy_abi import BaseStrategy
 from .feature_adapter_v1 import FeatureAdapterV1
-from .metrics import MetricsCalculator
+from .metrics import MetricsCalculator, OnlineMetrics
+from .ledger import TradeLedger
+from .persistence import ResultWriter, load_state
+from .result_cache import ResultCache
 
 
 class BacktesterV1:
@@ -22,14 +25,39 @@ class BacktesterV1:
     Бэктестер v1 для прогона торговых стратегий
     
     Основные функции:
-    - Загрузка фич из БД через FeatureAdapterV1
+    - Загрузка фич из БД через FeatureAdapterV1 (или из локальных снапшотов FeatureStore)
     - Прогон стратегии на каждом баре
     - Симуляция исполнения трейдов
     - Расчёт метрик через MetricsCalculator
-    - Сохранение трейдов в lab.trades
-    - Сохранение результатов в lab.results
+    - Сохранение трейдов (COPY) и результатов в lab.trades / lab.results одной транзакцией
     - Проверка Risk Gate
+
+    Режимы прогона (mode):
+    - "loop": построчный обход features_df.iterrows() (эталонная реализация)
+    - "vectorized": колонки извлекаются один раз в NumPy-массивы, цикл идёт
+      по целочисленным индексам, equity curve пишется в заранее выделенный
+      float64-массив; сигналы берутся из generate_signals_batch(), если
+      стратегия его реализует. Трейды, PnL и метрики совпадают с "loop" бит-в-бит.
+
+    Досрочная остановка (prune_margin): если просадка equity от пика превышает
+    порог Risk Gate по MaxDD плюс prune_margin, прогон прерывается на этом баре
+    (позиция закрывается с exit_reason="PRUNED"), метрики считаются по
+    пройденной части, results["status"] = "pruned".
+
+    Продолжение прогона: run(..., save_state=True) сохраняет состояние на
+    последнем баре (до EOD-закрытия) в lab.backtest_state, resume(run_id)
+    загружает только бары после него и продолжает симуляцию. Итоговые
+    трейды, equity и метрики совпадают с полным прогоном по всей истории.
+
+    Сделки копятся в колоночном TradeLedger (self.trades): метрики и запись
+    в lab.trades читают его массивы; для совместимости журнал итерируется
+    как список dict прежнего формата.
     """
+
+    MODES = ("loop", "vectorized")
+
+    # Порог Risk Gate по максимальной просадке (%)
+    RISK_GATE_MAX_DD = 20.0
     
     def __init__(
         self,
@@ -37,7 +65,14 @@ class BacktesterV1:
         strategy: BaseStrategy,
         initial_capital: float = 10000.0,
         commission_rate: float = 0.0004,
-        slippage_bps: float = 5.0
+        slippage_bps: float = 5.0,
+        mode: str = "loop",
+        feature_store: Optional[FeatureAdapterV1] = None,
+        result_writer: Optional[ResultWriter] = None,
+        result_cache: Optional[ResultCache] = None,
+        prune_margin: Optional[float] = None,
+        online_metrics: Optional[OnlineMetrics] = None,
+        trade_meta: bool = True
     ):
         """
         Инициализация бэктестера
@@ -48,27 +83,61 @@ class BacktesterV1:
             initial_capital: Начальный капитал (USDT)
             commission_rate: Комиссия биржи (в долях, например 0.0004 = 0.04%)
             slippage_bps: Проскальзывание в базисных пунктах (bps)
+            mode: Режим прогона ("loop" или "vectorized")
+            feature_store: Источник фич вместо FeatureAdapterV1(db_url), например
+                FeatureStore с локальными снапшотами (db_url может быть None,
+                если прогон идёт с persist=False)
+            result_writer: Общий буфер записи в БД (несколько прогонов сбрасываются
+                одним ResultWriter.flush()); None — запись сразу после прогона
+            result_cache: Кэш результатов (lab.result_cache); None — без кэша
+            prune_margin: Запас (п.п.) сверх RISK_GATE_MAX_DD, при превышении которого
+                просадкой прогон останавливается досрочно; None — без остановки
+            online_metrics: Накопитель OnlineMetrics, получающий equity каждого
+                бара и PnL каждой закрытой сделки по ходу прогона
+            trade_meta: Хранить meta сигнала каждой сделки (нужна для записи
+                в lab.trades; без неё журнал сделок — только массивы)
         """
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid mode: {mode}. Must be one of {self.MODES}")
+
         self.db_url = db_url
         self.strategy = strategy
         self.initial_capital = initial_capital
         self.commission_rate = commission_rate
         self.slippage_bps = slippage_bps
+        self.mode = mode
+        self.result_writer = result_writer
+        self.result_cache = result_cache
+        self.prune_margin = prune_margin
+        self.online_metrics = online_metrics
+        self.trade_meta = trade_meta
         
-        self.feature_adapter = FeatureAdapterV1(db_url)
+        self.feature_adapter = feature_store if feature_store is not None else FeatureAdapterV1(db_url)
         
         # Текущее состояние бэктеста
         self.balance = initial_capital
-        self.equity_curve: List[float] = [initial_capital]
-        self.trades: List[Dict[str, Any]] = []
+        self.equity_curve: Sequence[float] = [initial_capital]
+        self.trades = TradeLedger(strategy.strategy_id, keep_meta=trade_meta)
         self.open_position: Optional[Dict[str, Any]] = None
+        # ts_4h бара, на котором прогон остановлен досрочно (None — дошёл до конца)
+        self.pruned_at = None
+        # Состояние на последнем баре до EOD-закрытия (для save_state)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        # Агрегаты сделок и начало истории продолжаемого прогона (resume)
+        self._prior_stats: Optional[Dict[str, Any]] = None
+        self._start_ts = None
     
     def run(
         self,
         symbol: str = "ETHUSDT",
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        run_id: Optional[str] = None
+        run_id: Optional[str] = None,
+        features_df: Optional[pd.DataFrame] = None,
+        persist: bool = True,
+        force: bool = False,
+        scores: Optional[Dict[str, np.ndarray]] = None,
+        save_state: bool = False
     ) -> Dict[str, Any]:
         """
         Запуск бэктеста
@@ -78,6 +147,15 @@ class BacktesterV1:
             start_date: Начальная дата (YYYY-MM-DD)
             end_date: Конечная дата (YYYY-MM-DD)
             run_id: Идентификатор прогона (генерируется автоматически если None)
+            features_df: Предзагруженные фичи (если заданы — запрос к БД не выполняется,
+                start_date/end_date задают только границы записи в result_cache)
+            persist: Сохранять ли трейды и результаты в БД
+            force: Игнорировать кэш результатов (прогон выполняется и кэш перезаписывается)
+            scores: Предрасчитанный strategy.compute_scores_batch(features_df) — сигналы
+                строятся через signals_from_scores() без пересчёта скоров
+                (только mode="vectorized"; в "loop" игнорируется)
+            save_state: Сохранить состояние на последнем баре в lab.backtest_state
+                (вместе с результатами, при persist) для resume(run_id); кэш не читается
         
         Returns:
             Dict с результатами бэктеста:
@@ -94,18 +172,23 @@ class BacktesterV1:
                 - profit_factor: Коэффициент прибыльности
                 - pass_risk_gate: Прошла ли стратегия Risk Gate
                 - total_trades: Общее количество сделок
+                - status: "completed" или "pruned" (досрочная остановка по просадке;
+                  метрики — по пройденной части, end_ts — бар остановки)
+                - cache_hit: True, если результаты взяты из result_cache
+                  (трейды не восстанавливаются, в БД ничего не пишется)
         """
         # Генерация run_id
         if run_id is None:
             run_id = f"{self.strategy.strategy_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         
         # 1. Загрузка фич из БД
-        print(f"[BacktesterV1] Загрузка данных...")
-        features_df = self.feature_adapter.fetch_features(
-            symbol=symbol,
-            start_date=start_date,
-            end_date=end_date
-        )
+        if features_df is None:
+            print(f"[BacktesterV1] Загрузка данных...")
+            features_df = self.feature_adapter.fetch_features(
+                symbol=symbol,
+                start_date=start_date,
+                end_date=end_date
+            )
         
         if features_df.empty:
             raise ValueError(f"Нет данных для {symbol} в указанном периоде")
@@ -115,10 +198,294 @@ class BacktesterV1:
         # Подготовка фич
         features_df = self.feature_adapter.prepare_features_for_strategy(features_df)
         
+        # Кэш результатов: ключ по стратегии, params, периоду, издержкам и fingerprint фич
+        if self.result_cache is not None:
+            fingerprint = self.result_cache.fingerprint(features_df)
+            cache_key = ResultCache.make_key(
+                self.strategy, symbol, start_date, end_date,
+                self.initial_capital, self.commission_rate, self.slippage_bps,
+                fingerprint
+            )
+            if not force and not save_state:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    print(f"[BacktesterV1] Результат из кэша (run_id: {cached.get('run_id')}).")
+                    cached["cache_hit"] = True
+                    return cached
+        
         # 2. Прогон стратегии на каждом баре
         print(f"[BacktesterV1] Запуск прогона стратегии...")
         
-        for idx, row in features_df.iterrows():
+        if self.mode == "vectorized":
+            self._run_vectorized(features_df, scores)
+        else:
+            self._run_loop(features_df)
+        
+        # 3-4. Метрики и Risk Gate
+        results = self._build_results(features_df, run_id)
+        
+        # 5. Сохранение в БД
+        if persist:
+            # Трейды и результаты — одной транзакцией (или в буфер result_writer)
+            state = self.state_snapshot(run_id, symbol) if save_state else None
+            self._save_to_db(run_id, results, state)
+        
+        # Результат досрочно остановленного прогона зависит от prune_margin — не кэшируется
+        if self.result_cache is not None and self.pruned_at is None:
+            self.result_cache.put(cache_key, self.strategy, symbol, start_date, end_date, fingerprint, results)
+        
+        self._print_summary(results)
+        return results
+    
+    def resume(
+        self,
+        run_id: str,
+        end_date: Optional[str] = None,
+        persist: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Продолжение прогона run_id по барам после сохранённого состояния
+        
+        Загружает lab.backtest_state, запрашивает только бары с ts_4h > last_ts
+        (до end_date) и продолжает симуляцию с сохранённых баланса, позиции и
+        equity curve. Результаты перезаписывают lab.results того же run_id,
+        прежняя EOD-сделка удаляется, состояние обновляется.
+        
+        Args:
+            run_id: Прогон, сохранённый с run(..., save_state=True)
+            end_date: Конечная дата (YYYY-MM-DD); None — до последнего бара
+            persist: Сохранять ли трейды, результаты и новое состояние
+        
+        Returns:
+            Результаты как у run() за всю историю прогона; None — новых баров нет
+        """
+        state = load_state(self.db_url, run_id)
+        if state is None:
+            raise ValueError(f"Нет сохранённого состояния для run_id {run_id}")
+        if state["strategy_id"] != self.strategy.strategy_id or state["params"] != _plain(self.strategy.params):
+            raise ValueError(f"Стратегия или params не совпадают с сохранёнными для {run_id}")
+        
+        features_df = self.feature_adapter.fetch_features(
+            symbol=state["symbol"],
+            start_date=state["last_ts"].isoformat(),
+            end_date=end_date
+        )
+        features_df = self.feature_adapter.prepare_features_for_strategy(features_df)
+        ts = pd.to_datetime(features_df["ts_4h"], utc=True)
+        features_df = features_df[(ts > state["last_ts"]).to_numpy()].reset_index(drop=True)
+        if features_df.empty:
+            print(f"[BacktesterV1] Новых баров после {state['last_ts']} нет.")
+            return None
+        
+        print(f"[BacktesterV1] Продолжение {run_id}: {len(features_df)} новых баров "
+              f"после {state['last_ts']}.")
+        
+        # Восстановление состояния
+        self.balance = state["balance"]
+        self.open_position = state["open_position"]
+        self.equity_curve = state["equity"] if self.mode == "vectorized" else state["equity"].tolist()
+        self.trades = TradeLedger(self.strategy.strategy_id, keep_meta=self.trade_meta)
+        self._prior_stats = state["trade_stats"]
+        self._start_ts = state["start_ts"]
+        
+        if self.mode == "vectorized":
+            self._run_vectorized(features_df)
+        else:
+            self._run_loop(features_df)
+        
+        results = self._build_results(features_df, run_id)
+        if persist:
+            state = self.state_snapshot(run_id, state["symbol"])
+            self._save_to_db(run_id, results, state, resumed=True)
+        
+        self._print_summary(results)
+        return results
+    
+    def run_stream(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        run_id: Optional[str] = None,
+        chunk_size: int = 50_000,
+        persist: bool = True,
+        save_state: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Потоковый бэктест для длинных историй
+        
+        Фичи читаются чанками по chunk_size строк (серверный курсор
+        FeatureAdapterV1.iter_feature_chunks() или срезы снапшота FeatureStore),
+        в начало каждого чанка переносятся strategy.WARMUP_BARS строк прогрева.
+        Между чанками хранятся только баланс, позиция, трейды и equity curve,
+        поэтому пиковая память определяется chunk_size, а не длиной истории.
+        Результаты совпадают с run() по той же истории; кэш результатов не используется.
+        
+        Args:
+            symbol: Торговая пара
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+            run_id: Идентификатор прогона (генерируется автоматически если None)
+            chunk_size: Строк в чанке
+            persist: Сохранять ли трейды и результаты в БД
+            save_state: Сохранить состояние для resume() (как в run())
+        
+        Returns:
+            Dict с результатами бэктеста (как у run())
+        """
+        if run_id is None:
+            run_id = f"{self.strategy.strategy_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        
+        chunks = self.feature_adapter.iter_feature_chunks(
+            symbol=symbol,
+            start_date=start_date,
+            end_date=end_date,
+            chunk_size=chunk_size,
+            warmup=self.strategy.WARMUP_BARS
+        )
+        
+        # Чанк симулируется, когда известен следующий: последний закрывает позицию (EOD)
+        bars, count, pending = 0, 0, None
+        first_ts = last_ts = None
+        for chunk, carried in chunks:
+            chunk = self.feature_adapter.prepare_features_for_strategy(chunk)
+            if pending is not None:
+                self._run_chunk(*pending, final=False)
+                if self.pruned_at is not None:
+                    pending = None
+                    break
+            if first_ts is None:
+                first_ts = chunk["ts_4h"].iloc[0]
+                self._start_ts = first_ts
+            last_ts = chunk["ts_4h"].iloc[-1]
+            bars += len(chunk) - carried
+            count += 1
+            pending = (chunk, carried)
+        
+        if first_ts is None:
+            raise ValueError(f"Нет данных для {symbol} в указанном периоде")
+        if pending is not None:
+            self._run_chunk(*pending, final=True)
+        print(f"[BacktesterV1] Потоковый прогон: {bars} баров, {count} чанков по {chunk_size}.")
+        
+        # Для метрик нужны только границы периода
+        bounds = pd.DataFrame({"ts_4h": [first_ts, last_ts]})
+        results = self._build_results(bounds, run_id)
+        
+        if persist:
+            state = self.state_snapshot(run_id, symbol) if save_state else None
+            self._save_to_db(run_id, results, state)
+        
+        self._print_summary(results)
+        return results
+    
+    def _run_chunk(self, chunk: pd.DataFrame, carried: int, final: bool):
+        """Симуляция чанка потокового прогона (строки прогрева пропускаются)"""
+        if self.mode == "vectorized":
+            self._run_vectorized(chunk, skip=carried, final=final)
+        else:
+            self._run_loop(chunk, skip=carried, final=final)
+    
+    @classmethod
+    def from_state(cls, db_url: str, run_id: str, **kwargs) -> "BacktesterV1":
+        """
+        Бэктестер со стратегией и издержками из lab.backtest_state
+        
+        Пример (ежедневное обновление):
+            BacktesterV1.from_state(db_url, run_id).resume(run_id)
+        """
+        state = load_state(db_url, run_id)
+        if state is None:
+            raise ValueError(f"Нет сохранённого состояния для run_id {run_id}")
+        module, _, name = state["strategy_class"].rpartition(".")
+        strategy_cls = getattr(importlib.import_module(module), name)
+        strategy = strategy_cls(strategy_id=state["strategy_id"], params=state["params"])
+        config = state["config"]
+        kwargs.setdefault("mode", config["mode"])
+        return cls(
+            db_url=db_url,
+            strategy=strategy,
+            initial_capital=config["initial_capital"],
+            commission_rate=config["commission_rate"],
+            slippage_bps=config["slippage_bps"],
+            **kwargs
+        )
+    
+    def state_snapshot(self, run_id: str, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Состояние на последнем баре до EOD-закрытия (строка lab.backtest_state)
+        
+        None, если прогон остановлен досрочно (такие прогоны не продолжаются).
+        """
+        if self._snapshot is None or self.pruned_at is not None:
+            return None
+        snapshot = self._snapshot
+        strategy_cls = type(self.strategy)
+        return {
+            "run_id": run_id,
+            "strategy_id": self.strategy.strategy_id,
+            "strategy_class": f"{strategy_cls.__module__}.{strategy_cls.__qualname__}",
+            "symbol": symbol,
+            "params": _plain(self.strategy.params),
+            "start_ts": snapshot["start_ts"],
+            "last_ts": snapshot["last_ts"],
+            "balance": snapshot["balance"],
+            "open_position": snapshot["open_position"],
+            "equity": np.asarray(self.equity_curve, dtype=np.float64),
+            "trade_stats": self._trade_stats(self.trades, self._prior_stats, snapshot["trades"]),
+            "config": {
+                "initial_capital": self.initial_capital,
+                "commission_rate": self.commission_rate,
+                "slippage_bps": self.slippage_bps,
+                "mode": self.mode,
+            },
+        }
+    
+    def _take_snapshot(self, features_df: pd.DataFrame):
+        """Запоминание состояния после последнего бара (до EOD-закрытия позиции)"""
+        position = self.open_position
+        self._snapshot = {
+            "start_ts": self._start_ts if self._start_ts is not None else features_df["ts_4h"].iloc[0],
+            "last_ts": features_df["ts_4h"].iloc[-1],
+            "balance": self.balance,
+            "open_position": {**position, "meta": dict(position.get("meta") or {})} if position else None,
+            "trades": len(self.trades),
+        }
+    
+    def _build_results(self, features_df: pd.DataFrame, run_id: str) -> Dict[str, Any]:
+        """Метрики, статус и Risk Gate прогона"""
+        print(f"[BacktesterV1] Расчёт метрик...")
+        results = self._calculate_metrics(features_df, run_id)
+        results['status'] = "completed"
+        if self.pruned_at is not None:
+            results['status'] = "pruned"
+            results['end_ts'] = self.pruned_at
+            results['meta'] = {"status": "pruned", "pruned_at": self.pruned_at.isoformat()}
+            print(f"[BacktesterV1] Прогон остановлен досрочно на {self.pruned_at}: "
+                  f"просадка > {self.RISK_GATE_MAX_DD + self.prune_margin:.1f}%")
+        
+        results['pass_risk_gate'] = self._check_risk_gate(results)
+        results['cache_hit'] = False
+        return results
+    
+    def _print_summary(self, results: Dict[str, Any]):
+        print(f"[BacktesterV1] Прогон завершен.")
+        print(f"  Total PnL: {results['pnl_total']:.2f} USDT")
+        print(f"  Sharpe: {results['sharpe']:.2f}")
+        print(f"  Max DD: {results['max_dd']:.2f}%")
+        print(f"  Win Rate: {results['win_rate']:.2f}%")
+        print(f"  Risk Gate: {'PASS' if results['pass_risk_gate'] else 'FAIL'}")
+    
+    def _run_loop(self, features_df: pd.DataFrame, skip: int = 0, final: bool = True):
+        """
+        Прогон стратегии построчно через iterrows() (режим "loop")
+        
+        skip — строки прогрева в начале features_df (не симулируются);
+        final=False — чанк не последний: без снапшота и EOD-закрытия.
+        """
+        limit = self._prune_limit()
+        peak = max(self.equity_curve)
+        for idx, row in features_df.iloc[skip:].iterrows():
             # Обновление открытой позиции (проверка на SL/TP)
             if self.open_position:
                 self._check_and_close_position(row)
@@ -133,38 +500,143 @@ class BacktesterV1:
             # Обновление equity curve
             current_equity = self._calculate_current_equity(row)
             self.equity_curve.append(current_equity)
+            if self.online_metrics is not None:
+                self.online_metrics.update_equity(current_equity)
+            
+            # Досрочная остановка по просадке
+            if limit is not None:
+                peak = max(peak, current_equity)
+                if (peak - current_equity) / peak > limit:
+                    self.pruned_at = row["ts_4h"]
+                    self._close_position(row, "PRUNED")
+                    return
+        
+        if not final:
+            return
+        self._take_snapshot(features_df)
         
         # Закрытие открытой позиции в конце периода
         if self.open_position:
             last_row = features_df.iloc[-1]
             self._force_close_position(last_row)
+    
+    def _run_vectorized(
+        self,
+        features_df: pd.DataFrame,
+        scores: Optional[Dict[str, np.ndarray]] = None,
+        skip: int = 0,
+        final: bool = True
+    ):
+        """
+        Прогон стратегии по NumPy-массивам (режим "vectorized")
         
-        # 3. Расчёт метрик
-        print(f"[BacktesterV1] Расчёт метрик...")
-        results = self._calculate_metrics(features_df, run_id)
-        
-        # 4. Проверка Risk Gate
-        results['pass_risk_gate'] = self._check_risk_gate(results)
+        OHLCV и фичи извлекаются из DataFrame один раз, дальше цикл идёт
+        по целочисленным индексам без создания pd.Series на каждый бар.
         
-        # 5. Сохранение в БД
+        Если стратегия поддерживает generate_signals_batch(), сигналы по всем
+        барам считаются одним векторным вызовом, а в цикле остаётся только
+        расчёт размера позиции по текущему балансу. Иначе строка для
+        generate_signal() собирается только когда нет открытой позиции.
         
-        # Сохранение трейдов и результатов
-        self._save_trades_to_db(run_id)                                                                                         
+        Если переданы scores (compute_scores_batch() тех же фич), пакет
+        строится через signals_from_scores() — пересчитываются только пороги и SL/TP.
         
-        self._save_results_to_db(results)
+        Потоковый прогон (run_stream): первые skip строк — прогрев (входят в
+        пакетный расчёт сигналов, но не симулируются); final=False — чанк
+        не последний, снапшот и EOD-закрытие не выполняются.
+        """
+        n = len(features_df)
+        columns = features_df.columns
+        index = features_df.index
+        
+        close = np.ascontiguousarray(features_df["close_4h"].to_numpy(dtype=np.float64))
+        # Timestamp-ы боксируются одним вызовом, а не по одному на каждое обращение ts[i]
+        ts = features_df["ts_4h"].tolist()
+        if "symbol" in features_df.columns:
+            symbols = features_df["symbol"].to_numpy()
+        else:
+            symbols = np.full(n, "ETHUSDT", dtype=object)
         
-        print(f"[BacktesterV1] Прогон завершен.")
-        print(f"  Total PnL: {results['pnl_total']:.2f} USDT")
-        print(f"  Sharpe: {results['sharpe']:.2f}")
-        print(f"  Max DD: {results['max_dd']:.2f}%")
-        print(f"  Win Rate: {results['win_rate']:.2f}%")
-        print(f"  Risk Gate: {'PASS' if results['pass_risk_gate'] else 'FAIL'}")
+        if scores is not None:
+            batch = self.strategy.signals_from_scores(scores)
+        else:
+            batch = self.strategy.generate_signals_batch(features_df)
+        if batch is not None:
+            side = batch.side
+        else:
+            # Те же значения, что отдаёт iterrows(), но без Series на каждый бар
+            values = features_df.to_numpy(dtype=object)
+        
+        # Предвыделенная equity curve (с учётом уже накопленной истории)
+        offset = len(self.equity_curve)
+        equity = np.empty(offset + n - skip, dtype=np.float64)
+        equity[:offset] = self.equity_curve
+        limit = self._prune_limit()
+        peak = equity[:offset].max()
+        # equity[base + i] — точка бара i чанка
+        base = offset - skip
+        online = self.online_metrics
+        
+        for i in range(skip, n):
+            price = close[i]
+            
+            # Обновление открытой позиции (проверка на SL/TP)
+            if self.open_position:
+                exit_reason = self._check_exit(price)
+                if exit_reason:
+                    self._close_position_at(price, ts[i], symbols[i], exit_reason, base + i)
+            
+            # Генерация сигнала
+            if not self.open_position:
+                if batch is not None:
+                    signal = None
+                    if side[i]:
+                        signal = self.strategy.signal_from_batch(batch, i, ts[i], self.balance)
+                else:
+                    row = pd.Series(values[i], index=columns, name=index[i])
+                    signal = self.strategy.generate_signal(row, self.balance)
+                
+                if signal:
+                    self._open_position_at(signal, price, ts[i], base + i)
+            
+            # Обновление equity curve
+            equity[base + i] = self._equity_at(price)
+            if online is not None:
+                online.update_equity(equity[base + i])
+            
+            # Досрочная остановка по просадке
+            if limit is not None:
+                peak = max(peak, equity[base + i])
+                if (peak - equity[base + i]) / peak > limit:
+                    self.pruned_at = ts[i]
+                    equity = equity[:base + i + 1]
+                    if self.open_position:
+                        self._close_position_at(price, ts[i], symbols[i], "PRUNED", base + i)
+                    break
+        
+        self.equity_curve = equity
+        if not final or self.pruned_at is not None:
+            return
+        self._take_snapshot(features_df)
         
-        return results
+        # Закрытие открытой позиции в конце периода
+        if self.open_position:
+            self._close_position_at(close[-1], ts[-1], symbols[-1], "EOD", len(equity) - 1)
+    
+    def _prune_limit(self) -> Optional[float]:
+        """Порог просадки (в долях) для досрочной остановки; None — выключена"""
+        if self.prune_margin is None:
+            return None
+        return (self.RISK_GATE_MAX_DD + self.prune_margin) / 100
     
     def _open_position(self, signal, current_bar: pd.Series):
-        """Открытие позиции"""
-        entry_price = current_bar["close_4h"]
+        """Открытие позиции (точка бара в equity curve добавляется после входа)"""
+        self._open_position_at(
+            signal, current_bar["close_4h"], current_bar["ts_4h"], len(self.equity_curve)
+        )
+    
+    def _open_position_at(self, signal, entry_price: float, entry_ts, entry_bar: int = -1):
+        """Открытие позиции по цене закрытия бара (entry_bar — индекс бара в equity curve)"""
         
         # Применение slippage
         if signal.side == "LONG":
@@ -177,7 +649,8 @@ class BacktesterV1:
         
         self.open_position = {
             "side": signal.side,
-            "entry_ts": current_bar["ts_4h"],
+            "entry_ts": entry_ts,
+            "entry_bar": entry_bar,
             "entry_price": entry_price,
             "qty": signal.size,
             "sl": signal.sl,
@@ -195,38 +668,51 @@ class BacktesterV1:
         if not self.open_position:
             return
         
-        current_price = current_bar["close_4h"]
-        position = self.open_position
+        exit_reason = self._check_exit(current_bar["close_4h"])
         
-        # Проверка SL/TP
-        should_close = False
-        exit_reason = None
+        if exit_reason:
+            self._close_position(current_bar, exit_reason, len(self.equity_curve))
+    
+    def _check_exit(self, current_price: float) -> Optional[str]:
+        """Причина закрытия позиции по SL/TP (None если позиция остаётся)"""
+        position = self.open_position
         
         if position["side"] == "LONG":
             if position["sl"] is not None and current_price <= position["sl"]:
-                should_close = True
-                exit_reason = "SL"
+                return "SL"
             elif position["tp1"] is not None and current_price >= position["tp1"]:
-                should_close = True
-                exit_reason = "TP1"
+                return "TP1"
         else:  # SHORT
             if position["sl"] is not None and current_price >= position["sl"]:
-                should_close = True
-                exit_reason = "SL"
+                return "SL"
             elif position["tp1"] is not None and current_price <= position["tp1"]:
-                should_close = True
-                exit_reason = "TP1"
+                return "TP1"
         
-        if should_close:
-            self._close_position(current_bar, exit_reason)
+        return None
     
-    def _close_position(self, current_bar: pd.Series, exit_reason: str):
-        """Закрытие позиции"""
+    def _close_position(self, current_bar: pd.Series, exit_reason: str, exit_bar: Optional[int] = None):
+        """Закрытие позиции (exit_bar None — бар последней точки equity curve)"""
         if not self.open_position:
             return
         
+        self._close_position_at(
+            current_bar["close_4h"],
+            current_bar["ts_4h"],
+            current_bar.get("symbol", "ETHUSDT"),
+            exit_reason,
+            len(self.equity_curve) - 1 if exit_bar is None else exit_bar
+        )
+    
+    def _close_position_at(
+        self,
+        exit_price: float,
+        exit_ts,
+        symbol: str,
+        exit_reason: str,
+        exit_bar: int = -1
+    ):
+        """Закрытие позиции по цене закрытия бара (exit_bar — индекс бара в equity curve)"""
         position = self.open_position
-        exit_price = current_bar["close_4h"]
         
         # Применение slippage
         if position["side"] == "LONG":
@@ -253,28 +739,26 @@ class BacktesterV1:
         self.balance += pnl
         
         # Сохранение трейда
-        trade = {
-            "strategy_id": self.strategy.strategy_id,
-            "mode": "backtest",
-            "symbol": str(current_bar.get("symbol", "ETHUSDT")),
-            "side": str(position["side"]),
-            "qty": float(position["qty"]),
-            "entry_ts": position["entry_ts"],
-            "entry_price": float(position["entry_price"]),
-            "exit_ts": current_bar["ts_4h"],
-            "exit_price": float(exit_price),
-            "pnl": float(pnl),
-            "pnl_pct": float(pnl_pct),
-            "meta": {
-                **position.get("meta", {}),
-                "exit_reason": exit_reason,
-                "commission_entry": float(position["commission_entry"]),
-                "commission_exit": float(commission_exit)
-            }
-        }
-        
-        self.trades.append(trade)
+        self.trades.add(
+            side=str(position["side"]),
+            qty=position["qty"],
+            entry_ts=position["entry_ts"],
+            entry_price=position["entry_price"],
+            exit_ts=exit_ts,
+            exit_price=exit_price,
+            pnl=pnl,
+            pnl_pct=pnl_pct,
+            symbol=str(symbol),
+            exit_reason=exit_reason,
+            commission_entry=position["commission_entry"],
+            commission_exit=commission_exit,
+            entry_bar=position.get("entry_bar", -1),
+            exit_bar=exit_bar,
+            meta=position.get("meta")
+        )
         self.open_position = None
+        if self.online_metrics is not None:
+            self.online_metrics.update_trade(float(pnl))
     
     def _force_close_position(self, current_bar: pd.Series):
         """Принудительное закрытие позиции в конце периода"""
@@ -282,11 +766,14 @@ class BacktesterV1:
     
     def _calculate_current_equity(self, current_bar: pd.Series) -> float:
         """Расчёт текущего капитала"""
+        return self._equity_at(current_bar["close_4h"])
+    
+    def _equity_at(self, current_price: float) -> float:
+        """Расчёт капитала с учётом нереализованного PnL по цене current_price"""
         equity = self.balance
         
         if self.open_position:
             position = self.open_position
-            current_price = current_bar["close_4h"]
             
             # Нереализованный PnL
             if position["side"] == "LONG":
@@ -314,25 +801,30 @@ class BacktesterV1:
         sortino = MetricsCalculator.calculate_sortino(returns)
         max_dd = MetricsCalculator.calculate_max_drawdown(equity_series)
         calmar = MetricsCalculator.calculate_calmar(total_return_pct, max_dd)
-        win_rate = MetricsCalculator.calculate_win_rate(self.trades)
-        profit_factor = MetricsCalculator.calculate_profit_factor(self.trades)
+        # Сделочные метрики по колонкам журнала (как calculate_win_rate() / calculate_profit_factor())
+        pnl = self.trades.column("pnl")
+        win_rate, profit_factor = (
+            float(m[0]) for m in MetricsCalculator.batch_trade_metrics(np.zeros(len(pnl), dtype=np.int64), pnl, 1)
+        )
         
-        # Calculate average hold time
-        hold_times = []
-        for trade in self.trades:
-            if trade.get("exit_ts") and trade.get("entry_ts"):
-                # Убедимся, что exit_ts и entry_ts - datetime объекты
-                if isinstance(trade["exit_ts"], datetime) and isinstance(trade["entry_ts"], datetime):
-                    duration = (trade["exit_ts"] - trade["entry_ts"]).total_seconds() / 3600.0
-                    hold_times.append(duration)
+        # Calculate average hold time (суммирование последовательное, как sum())
+        hold_times = self.trades.hold_hours()
+        avg_hold_time_hours = float(np.cumsum(hold_times)[-1] / len(hold_times)) if len(hold_times) else 0.0
+        total_trades, holds = len(self.trades), len(hold_times)
+        start_ts = features_df.iloc[0]["ts_4h"]
         
-        avg_hold_time_hours = sum(hold_times) / len(hold_times) if hold_times else 0.0
-        print(f"DEBUG: Trades={len(self.trades)}, Hold_times={len(hold_times)}, Avg={avg_hold_time_hours:.2f}h")
+        # Продолженный прогон: сделочные метрики по агрегатам всей истории
+        if self._prior_stats is not None:
+            stats = self._trade_stats(self.trades, self._prior_stats)
+            win_rate, profit_factor, avg_hold_time_hours = self._trade_metrics(stats)
+            total_trades, holds = stats["trades"], stats["holds"]
+            start_ts = self._start_ts
+        print(f"DEBUG: Trades={total_trades}, Hold_times={holds}, Avg={avg_hold_time_hours:.2f}h")
         
         results = {
             "run_id": run_id,
             "strategy_id": self.strategy.strategy_id,
-            "start_ts": features_df.iloc[0]["ts_4h"],
+            "start_ts": start_ts,
             "end_ts": features_df.iloc[-1]["ts_4h"],
             "pnl_total": pnl_total,
             "sharpe": sharpe,
@@ -341,7 +833,7 @@ class BacktesterV1:
             "calmar": calmar,
             "win_rate": win_rate,
             "profit_factor": profit_factor,
-            "total_trades": len(self.trades),
+            "total_trades": total_trades,
             "avg_hold_time_hours": avg_hold_time_hours,
             "initial_capital": self.initial_capital,
             "final_capital": self.balance
@@ -349,6 +841,52 @@ class BacktesterV1:
         
         return results
     
+    @staticmethod
+    def _trade_stats(
+        trades: TradeLedger,
+        prior: Optional[Dict[str, Any]] = None,
+        stop: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Агрегаты первых stop сделок журнала (None — всех) для продолжения прогона
+        
+        Суммы накапливаются в порядке сделок (cumsum от значения prior), как
+        в MetricsCalculator, поэтому метрики по агрегатам совпадают с расчётом
+        по полному списку сделок.
+        """
+        stats = dict(prior or {
+            "trades": 0, "closed": 0, "wins": 0,
+            "gross_profit": 0, "gross_loss": 0, "hold_hours": 0, "holds": 0,
+        })
+        pnl = trades.column("pnl")[:stop]
+        hold_hours = trades.hold_hours()[:stop]
+        
+        def running(start, values):
+            return float(np.cumsum(np.concatenate([[start], values]))[-1]) if len(values) else start
+        
+        stats["trades"] += len(pnl)
+        stats["closed"] += len(pnl)
+        stats["wins"] += int(np.count_nonzero(pnl > 0))
+        stats["gross_profit"] = running(stats["gross_profit"], pnl[pnl > 0])
+        stats["gross_loss"] = running(stats["gross_loss"], pnl[pnl < 0])
+        stats["hold_hours"] = running(stats["hold_hours"], hold_hours)
+        stats["holds"] += len(hold_hours)
+        return stats
+    
+    @staticmethod
+    def _trade_metrics(stats: Dict[str, Any]):
+        """(win_rate, profit_factor, avg_hold_time_hours) по агрегатам _trade_stats()"""
+        win_rate = profit_factor = 0.0
+        if stats["closed"]:
+            win_rate = float(stats["wins"] / stats["closed"] * 100)
+            gross_loss = abs(stats["gross_loss"])
+            if gross_loss == 0:
+                profit_factor = 0.0 if stats["gross_profit"] == 0 else float("inf")
+            else:
+                profit_factor = float(stats["gross_profit"] / gross_loss)
+        avg_hold = stats["hold_hours"] / stats["holds"] if stats["holds"] else 0.0
+        return win_rate, profit_factor, avg_hold
+    
     def _check_risk_gate(self, results: Dict[str, Any]) -> bool:
         """
         Проверка Risk Gate
@@ -359,120 +897,39 @@ class BacktesterV1:
         - Win Rate >= 40%
         """
         sharpe_pass = results["sharpe"] >= 1.0
-        max_dd_pass = results["max_dd"] <= 20.0
+        max_dd_pass = results["max_dd"] <= self.RISK_GATE_MAX_DD
         win_rate_pass = results["win_rate"] >= 40.0
         
         return sharpe_pass and max_dd_pass and win_rate_pass
     
-    def _save_trades_to_db(self, run_id: str):
-        """Сохранение трейдов в lab.trades"""
-        if not self.trades:
-            print("[BacktesterV1] Нет трейдов для сохранения")
+    def _save_to_db(
+        self,
+        run_id: str,
+        results: Dict[str, Any],
+        state: Optional[Dict[str, Any]] = None,
+        resumed: bool = False
+    ):
+        """
+        Сохранение трейдов в lab.trades и результатов в lab.results
+        (и состояния в lab.backtest_state, если передано)
+
+        Если задан result_writer — прогон только добавляется в его буфер
+        (запись произойдёт при flush()). Иначе трейды пишутся через COPY,
+        результат — upsert'ом, на одном соединении в одной транзакции.
+        """
+        if self.result_writer is not None:
+            self.result_writer.add(run_id, self.trades, results, state, resumed)
             return
-        
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-        
-        try:
-            for trade in self.trades:
-                # Добавляем run_id в meta для удобства и на случай отсутствия в trade
-                trade_meta = trade.get("meta", {})
-                trade_meta["run_id"] = run_id
 
-                cursor.execute("""
-                    INSERT INTO lab.trades (
-                        run_id, strategy_id, mode, symbol, side, qty,
-                        entry_ts, entry_price, exit_ts, exit_price, pnl, pnl_pct, meta
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    )
-                """, (
-                    run_id,
-                    trade["strategy_id"],
-                    trade["mode"],
-                    trade["symbol"],
-                    trade["side"],
-                    trade["qty"],
-                    trade["entry_ts"],
-                    trade["entry_price"],
-                    trade["exit_ts"],
-                    trade["exit_price"],
-                    trade["pnl"],
-                    trade["pnl_pct"],
-                    psycopg2.extras.Json(trade_meta)
-                ))
-            
-            conn.commit()
-            print(f"[BacktesterV1] Сохранено {len(self.trades)} трейдов.")
-        
-        except Exception as e:
-            conn.rollback()
-            print(f"[BacktesterV1] Ошибка при сохранении трейдов: {e}")
-            raise
-        
-        finally:
-            cursor.close()
-            conn.close()
-    
-    def _save_results_to_db(self, results: Dict[str, Any]):
-        """Сохранение результатов в lab.results"""
-        conn = psycopg2.connect(self.db_url)
-        cursor = conn.cursor()
-        
         try:
-            # Добавляем все доп. метрики в meta
-            meta_data = {
-                "initial_capital": float(results.get("initial_capital", 0)),
-                "final_capital": float(results.get("final_capital", 0)),
-                "total_trades": int(results.get("total_trades", 0)),
-                "avg_hold_time_hours": float(results.get("avg_hold_time_hours", 0)) 
-            }
-
-            cursor.execute("""
-                INSERT INTO lab.results (
-                    run_id, strategy_id, start_ts, end_ts, pnl_total,
-                    sharpe, sortino, max_dd, calmar, win_rate, profit_factor,
-                    pass_risk_gate, meta
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-                ON CONFLICT (run_id) DO UPDATE SET
-                    strategy_id = EXCLUDED.strategy_id,
-                    start_ts = EXCLUDED.start_ts,
-                    end_ts = EXCLUDED.end_ts,
-                    pnl_total = EXCLUDED.pnl_total,
-                    sharpe = EXCLUDED.sharpe,
-                    sortino = EXCLUDED.sortino,
-                    max_dd = EXCLUDED.max_dd,
-                    calmar = EXCLUDED.calmar,
-                    win_rate = EXCLUDED.win_rate,
-                    profit_factor = EXCLUDED.profit_factor,
-                    pass_risk_gate = EXCLUDED.pass_risk_gate,
-                    meta = EXCLUDED.meta
-            """, (
-                results["run_id"],
-                results["strategy_id"],
-                results["start_ts"],
-                results["end_ts"],
-                float(results["pnl_total"]),
-                float(results["sharpe"]),
-                float(results["sortino"]),
-                float(results["max_dd"]),
-                float(results["calmar"]),
-                float(results["win_rate"]),
-                float(results["profit_factor"]),
-                bool(results["pass_risk_gate"]),
-                psycopg2.extras.Json(meta_data)
-            ))
-            
-            conn.commit()
-            print(f"[BacktesterV1] Результаты сохранены для run_id: {results['run_id']}")
-        
+            ResultWriter(self.db_url).write(run_id, self.trades, results, state, resumed)
         except Exception as e:
-            conn.rollback()
-            print(f"[BacktesterV1] Ошибка при сохранении результатов: {e}")
+            print(f"[BacktesterV1] Ошибка при сохранении в БД: {e}")
             raise
-        
-        finally:
-            cursor.close()
-            conn.close()
\ No newline at end of file
+
+        print(f"[BacktesterV1] Сохранено {len(self.trades)} трейдов, результаты для run_id: {run_id}")
+
+
+def _plain(params: Dict[str, Any]) -> Dict[str, Any]:
+    """params в JSON-совместимом виде (для сравнения с сохранёнными в lab.backtest_state)"""
+    return {k: (v.item() if isinstance(v, np.generic) else v) for k, v in params.items()}
\ No newline at end of file
@@ -1,19 +1,47 @@
 ﻿import pandas as pd
 import psycopg2
 import logging
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
 
+def carry_warmup(chunks: Iterable[pd.DataFrame], warmup: int = 0) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """
+    Чанки с перенесённым хвостом прогрева
+
+    Каждый чанк, кроме первого, начинается с последних warmup строк
+    предыдущих данных. Возвращает пары (чанк, число строк прогрева в начале).
+    """
+    tail = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        carried = 0
+        if warmup and tail is not None:
+            carried = len(tail)
+            chunk = pd.concat([tail, chunk], ignore_index=True)
+        yield chunk, carried
+        if warmup:
+            tail = chunk.iloc[-warmup:].reset_index(drop=True)
+
+
 class FeatureAdapterV1:
     """
     Адаптер для извлечения и подготовки фич из БД
 
-    Извлекает данные из lab.features_v1 и подготавливает их
-    для передачи в стратегию.
+    Извлекает данные из материализованной таблицы lab.features_v1_mat
+    (см. миграцию 20251126_005) и подготавливает их для передачи в стратегию.
+    Представление lab.features_v1 остаётся эталонным определением фич.
     """
 
+    FEATURES_TABLE = "lab.features_v1_mat"
+
+    FEATURE_COLUMNS = (
+        "symbol", "ts_4h", "open_4h", "high_4h", "low_4h", "close_4h",
+        "volume_4h", "close_1h", "atr_14_1h", "sma_50_4h", "avg_volume_20"
+    )
+
     def __init__(self, db_url: str):
         """
         Инициализация адаптера
@@ -30,7 +58,7 @@ class FeatureAdapterV1:
         end_date: Optional[str] = None
     ) -> pd.DataFrame:
         """
-        Загрузка фич из lab.features_v1
+        Загрузка фич из lab.features_v1_mat
 
         Args:
             symbol: Торговая пара
@@ -40,24 +68,101 @@ class FeatureAdapterV1:
         Returns:
             DataFrame с фичами
         """
-        query = """
-        SELECT
-            symbol,
-            ts_4h,
-            open_4h,
-            high_4h,
-            low_4h,
-            close_4h,
-            volume_4h,
-            close_1h,
-            atr_14_1h,
-            sma_50_4h,
-            avg_volume_20
-        FROM lab.features_v1
-        WHERE symbol = %s
-        """
-
-        params = [symbol]
+        query, params = self._features_query(symbol, start_date, end_date)
+
+        with psycopg2.connect(self.db_url) as conn:
+            df = pd.read_sql(query, conn, params=params)
+
+        return df
+
+    def fetch_portfolio_features(
+        self,
+        symbols: Sequence[str],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Загрузка фич нескольких символов одним запросом
+
+        Args:
+            symbols: Торговые пары корзины
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+
+        Returns:
+            DataFrame в длинном формате (строка на пару (ts_4h, symbol)),
+            упорядоченный по ts_4h, затем по symbol
+        """
+        query, params = self._features_query(list(symbols), start_date, end_date)
+
+        with psycopg2.connect(self.db_url) as conn:
+            df = pd.read_sql(query, conn, params=params)
+
+        return df
+
+    def iter_feature_chunks(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        chunk_size: int = 50_000,
+        warmup: int = 0
+    ) -> Iterator[Tuple[pd.DataFrame, int]]:
+        """
+        Потоковая загрузка фич чанками через серверный (named) курсор
+
+        В памяти одновременно находится один чанк (chunk_size строк плюс
+        хвост прогрева), а не вся история.
+
+        Args:
+            symbol: Торговая пара
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+            chunk_size: Строк в чанке (и в одном сетевом fetch курсора)
+            warmup: Сколько последних строк предыдущего чанка переносить
+                в начало следующего (прогрев скользящих индикаторов)
+
+        Yields:
+            (DataFrame чанка, число строк прогрева в его начале)
+        """
+        query, params = self._features_query(symbol, start_date, end_date)
+        conn = psycopg2.connect(self.db_url)
+        try:
+            with conn.cursor(name=f"tradlab_features_{symbol.lower()}") as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                yield from carry_warmup(self._fetch_chunks(cur, chunk_size), warmup)
+        finally:
+            conn.close()
+
+    def _fetch_chunks(self, cursor, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """DataFrame-чанки из открытого курсора (колонки FEATURE_COLUMNS)"""
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield pd.DataFrame.from_records(rows, columns=list(self.FEATURE_COLUMNS))
+
+    def _features_query(
+        self,
+        symbol: Union[str, Sequence[str]],
+        start_date: Optional[str],
+        end_date: Optional[str]
+    ) -> Tuple[str, list]:
+        """
+        SQL и параметры выборки фич за период (по возрастанию ts_4h)
+
+        symbol — одна пара или список пар (symbol = ANY(...), сортировка
+        по ts_4h, затем по symbol)
+        """
+        multi = not isinstance(symbol, str)
+        query = f"""
+        SELECT {', '.join(self.FEATURE_COLUMNS)}
+        FROM {self.FEATURES_TABLE}
+        WHERE symbol {'= ANY(%s)' if multi else '= %s'}
+        """
+
+        params = [list(symbol) if multi else symbol]
 
         if start_date:
             query += " AND ts_4h >= %s"
@@ -67,12 +172,33 @@ class FeatureAdapterV1:
             query += " AND ts_4h <= %s"
             params.append(end_date)
 
-        query += " ORDER BY ts_4h ASC"
+        query += " ORDER BY ts_4h ASC, symbol ASC" if multi else " ORDER BY ts_4h ASC"
+        return query, params
+
+    def refresh_materialized(self, symbol: str = "ETHUSDT", since=None) -> int:
+        """
+        Инкрементальное обновление lab.features_v1_mat
+
+        Пересчитывает бары с ts_4h >= since (окна прогреваются
+        предыдущими барами внутри lab.refresh_features_v1_mat).
 
+        Args:
+            symbol: Торговая пара
+            since: Начало пересчёта; None — с последнего материализованного бара
+
+        Returns:
+            Количество обновлённых строк
+        """
         with psycopg2.connect(self.db_url) as conn:
-            df = pd.read_sql(query, conn, params=params)
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT lab.refresh_features_v1_mat(%s, %s)",
+                    (symbol, since)
+                )
+                rows = cur.fetchone()[0]
 
-        return df
+        logger.info(f"features_v1_mat refreshed: {symbol}, {rows} rows")
+        return rows
 
     def prepare_features_for_strategy(self, df: pd.DataFrame) -> pd.DataFrame:
         """
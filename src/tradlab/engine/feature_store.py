@@ -0,0 +1,374 @@
+"""
+Локальное колоночное хранилище фич для TradLab
+
+FeatureStore выгружает срез (symbol, период) из lab.features_v1_mat в каталог
+с одним .npy-файлом на колонку и manifest.json (max(ts) источника, хэш
+содержимого). Повторные загрузки того же среза отображают файлы в память
+(np.load(mmap_mode="r")) вместо запроса к БД, поэтому бэктесты можно гонять
+без PostgreSQL (ноутбуки, CI).
+
+С db_url снапшот перед чтением сверяется с БД (max(ts_4h) и число баров
+среза) и при расхождении выгружается заново. Без db_url свежесть проверить
+нельзя, поэтому открытые срезы (end_date=None) не отдаются через
+fetch_features() / iter_feature_chunks() — только явным load().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from .feature_adapter_v1 import FeatureAdapterV1, carry_warmup
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureStore(FeatureAdapterV1):
+    """
+    Снапшоты фич на диске с интерфейсом FeatureAdapterV1
+
+    Структура снапшота:
+        <root>/<symbol>__<start>__<end>/
+            manifest.json
+            ts_4h.npy          — int64, наносекунды UTC
+            <колонка>.npy      — float64 для каждой числовой колонки
+
+    Колонка symbol не хранится (один символ на снапшот, берётся из manifest).
+    Без db_url хранилище работает только на чтение готовых снапшотов
+    с закрытым периодом.
+    """
+
+    TS_COLUMN = "ts_4h"
+    MANIFEST = "manifest.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, root: Union[str, os.PathLike], db_url: Optional[str] = None):
+        """
+        Инициализация хранилища
+
+        Args:
+            root: Каталог со снапшотами (создаётся при первой выгрузке)
+            db_url: PostgreSQL connection string (None — офлайн-режим)
+        """
+        super().__init__(db_url)
+        self.root = Path(root)
+
+    # ------------------------------------------------------------
+    # Интерфейс FeatureAdapterV1
+    # ------------------------------------------------------------
+
+    def fetch_features(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Загрузка фич из снапшота (с выгрузкой из БД, если снапшота нет или он устарел)
+
+        Args:
+            symbol: Торговая пара
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+
+        Returns:
+            DataFrame с фичами; числовые колонки — view на memory-mapped файлы
+
+        Raises:
+            FileNotFoundError: Снапшота нет, а db_url не задан
+            ValueError: Открытый срез (end_date=None) без db_url
+        """
+        if not self._ensure_fresh(symbol, start_date, end_date):
+            if self.db_url is None:
+                raise FileNotFoundError(
+                    f"Нет снапшота {symbol} [{start_date}, {end_date}] в {self.root} "
+                    f"и не задан db_url для выгрузки"
+                )
+            self.export(symbol, start_date, end_date)
+
+        return self.load(symbol, start_date, end_date)
+
+    def iter_feature_chunks(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        chunk_size: int = 50_000,
+        warmup: int = 0
+    ) -> Iterator[Tuple[pd.DataFrame, int]]:
+        """
+        Чанки из снапшота (срезы memory-mapped колонок); без снапшота — поток из БД
+
+        Параметры и формат — как у FeatureAdapterV1.iter_feature_chunks();
+        устаревший снапшот перевыгружается, как в fetch_features().
+        """
+        if not self._ensure_fresh(symbol, start_date, end_date):
+            yield from super().iter_feature_chunks(symbol, start_date, end_date, chunk_size, warmup)
+            return
+
+        df = self.load(symbol, start_date, end_date)
+        chunks = (df.iloc[i:i + chunk_size] for i in range(0, len(df), chunk_size))
+        yield from carry_warmup(chunks, warmup)
+
+    # ------------------------------------------------------------
+    # Снапшоты
+    # ------------------------------------------------------------
+
+    def snapshot_path(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Path:
+        """Каталог снапшота для среза (symbol, start_date, end_date)"""
+        parts = [symbol, start_date or "begin", end_date or "end"]
+        name = "__".join(re.sub(r"[^0-9A-Za-z_.-]", "-", str(p)) for p in parts)
+        return self.root / name
+
+    def has(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> bool:
+        """Есть ли готовый снапшот среза"""
+        return (self.snapshot_path(symbol, start_date, end_date) / self.MANIFEST).exists()
+
+    def manifest(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Чтение manifest.json снапшота"""
+        path = self.snapshot_path(symbol, start_date, end_date) / self.MANIFEST
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def export(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        features_df: Optional[pd.DataFrame] = None
+    ) -> Dict[str, Any]:
+        """
+        Выгрузка среза в снапшот (перезаписывает существующий)
+
+        Args:
+            symbol: Торговая пара
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+            features_df: Готовые фичи (None — загрузить из БД)
+
+        Returns:
+            Manifest снапшота
+        """
+        if features_df is None:
+            features_df = super().fetch_features(symbol, start_date, end_date)
+
+        if "symbol" in features_df.columns and features_df["symbol"].nunique() > 1:
+            raise ValueError("FeatureStore поддерживает только один символ на снапшот")
+
+        arrays = self._to_arrays(features_df)
+        ts = arrays[self.TS_COLUMN]
+
+        manifest = {
+            "format_version": self.FORMAT_VERSION,
+            "symbol": symbol,
+            "start_date": start_date,
+            "end_date": end_date,
+            "source_table": self.FEATURES_TABLE,
+            "bars": len(features_df),
+            "columns": list(features_df.columns),
+            "source_max_ts": (
+                pd.Timestamp(int(ts.max()), unit="ns", tz="UTC").isoformat() if len(ts) else None
+            ),
+            "content_hash": self._content_hash(arrays),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        target = self.snapshot_path(symbol, start_date, end_date)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # Пишем во временный каталог и подменяем целиком: читатель никогда
+        # не увидит наполовину записанный снапшот
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp_", dir=self.root))
+        try:
+            for column, values in arrays.items():
+                np.save(tmp / f"{column}.npy", values, allow_pickle=False)
+            with open(tmp / self.MANIFEST, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+            if target.exists():
+                shutil.rmtree(target)
+            os.replace(tmp, target)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        logger.info(f"Снапшот фич сохранён: {target} ({manifest['bars']} баров)")
+        return manifest
+
+    def load(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        mmap: bool = True
+    ) -> pd.DataFrame:
+        """
+        Загрузка снапшота без обращения к БД
+
+        Args:
+            symbol: Торговая пара
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+            mmap: Отображать файлы в память (read-only) вместо чтения целиком
+
+        Returns:
+            DataFrame с колонками в порядке исходной выгрузки
+        """
+        path = self.snapshot_path(symbol, start_date, end_date)
+        manifest = self.manifest(symbol, start_date, end_date)
+        mmap_mode = "r" if mmap else None
+        n = manifest["bars"]
+
+        data = {}
+        for column in manifest["columns"]:
+            if column == "symbol":
+                data[column] = np.full(n, manifest["symbol"], dtype=object)
+            elif column == self.TS_COLUMN:
+                ts = np.load(path / f"{column}.npy", mmap_mode=mmap_mode)
+                data[column] = pd.to_datetime(np.asarray(ts), unit="ns", utc=True)
+            else:
+                data[column] = np.load(path / f"{column}.npy", mmap_mode=mmap_mode)
+
+        return pd.DataFrame(data, copy=False)
+
+    def verify(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> bool:
+        """Совпадает ли хэш файлов снапшота с хэшем из manifest"""
+        path = self.snapshot_path(symbol, start_date, end_date)
+        manifest = self.manifest(symbol, start_date, end_date)
+
+        arrays = {
+            column: np.load(path / f"{column}.npy", mmap_mode="r")
+            for column in manifest["columns"] if column != "symbol"
+        }
+        return self._content_hash(arrays) == manifest["content_hash"]
+
+    def is_stale(
+        self,
+        symbol: str = "ETHUSDT",
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> bool:
+        """
+        Устарел ли снапшот относительно БД (требует db_url)
+
+        Сравнивает source_max_ts и bars из manifest с текущими max(ts_4h)
+        и числом баров среза в БД (новые свечи, догрузка пропусков).
+        """
+        if self.db_url is None:
+            raise ValueError("is_stale() требует db_url")
+
+        db_max, db_bars = self._source_state(symbol, start_date, end_date)
+        manifest = self.manifest(symbol, start_date, end_date)
+        stored = manifest["source_max_ts"]
+        if db_bars != manifest["bars"]:
+            return True
+        if db_max is None or stored is None:
+            return db_max is not None or stored is not None
+        return pd.Timestamp(db_max) != pd.Timestamp(stored)
+
+    def _ensure_fresh(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> bool:
+        """
+        Готов ли снапшот среза к чтению (устаревший перевыгружается из БД)
+
+        Без db_url свежесть не проверить: открытый срез (end_date=None)
+        молча отставал бы от новых свечей, поэтому он не отдаётся.
+        """
+        if not self.has(symbol, start_date, end_date):
+            return False
+        if self.db_url is None:
+            if end_date is None:
+                raise ValueError(
+                    f"Снапшот {symbol} [{start_date}, ...) без end_date нельзя проверить "
+                    f"на свежесть без db_url: задайте end_date или читайте его через load()"
+                )
+            return True
+        if self.is_stale(symbol, start_date, end_date):
+            logger.info(f"Снапшот фич {symbol} [{start_date}, {end_date}] устарел, перевыгрузка")
+            self.export(symbol, start_date, end_date)
+        return True
+
+    def _source_state(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Tuple[Any, int]:
+        """(max(ts_4h), число баров) среза в lab.features_v1_mat"""
+        query = f"SELECT max(ts_4h), count(*) FROM {self.FEATURES_TABLE} WHERE symbol = %s"
+        params = [symbol]
+        if start_date:
+            query += " AND ts_4h >= %s"
+            params.append(start_date)
+        if end_date:
+            query += " AND ts_4h <= %s"
+            params.append(end_date)
+
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                db_max, db_bars = cur.fetchone()
+        return db_max, int(db_bars)
+
+    # ------------------------------------------------------------
+    # Вспомогательные
+    # ------------------------------------------------------------
+
+    def _to_arrays(self, features_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Колонки DataFrame → непрерывные массивы (ts — int64 ns UTC, прочие — float64)"""
+        arrays = {}
+        for column in features_df.columns:
+            if column == "symbol":
+                continue
+            if column == self.TS_COLUMN:
+                arrays[column] = pd.DatetimeIndex(
+                    pd.to_datetime(features_df[column], utc=True)
+                ).as_unit("ns").asi8.copy()
+            else:
+                arrays[column] = np.ascontiguousarray(
+                    features_df[column].to_numpy(dtype=np.float64)
+                )
+        return arrays
+
+    @staticmethod
+    def _content_hash(arrays: Dict[str, np.ndarray]) -> str:
+        """SHA-256 по именам колонок и байтам массивов (в отсортированном порядке)"""
+        digest = hashlib.sha256()
+        for column in sorted(arrays):
+            digest.update(column.encode("utf-8"))
+            digest.update(np.ascontiguousarray(arrays[column]).tobytes())
+        return digest.hexdigest()
@@ -0,0 +1,293 @@
+"""
+Колоночный журнал сделок для TradLab
+
+TradeLedger хранит сделки прогона как структуру массивов (structure of
+arrays): цены, объёмы, PnL, время и индексы баров входа/выхода, коды
+направления и причины выхода — в заранее выделенных NumPy-массивах,
+которые растут удвоением ёмкости. Метрики, запись в lab.trades и экспорт
+в DataFrame читают массивы напрямую; meta сигнала хранится отдельным
+списком и только если журнал создан с keep_meta=True.
+
+Для совместимости журнал ведёт себя как последовательность сделок в
+прежнем формате dict: len(), итерация, индексация и сравнение.
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .signal import SIDE_LONG, SIDE_SHORT
+
+
+# Коды причин выхода (колонка exit_reason)
+EXIT_REASONS = ("SL", "TP1", "EOD", "PRUNED")
+
+_FLOAT_COLUMNS = (
+    "qty", "entry_price", "exit_price", "pnl", "pnl_pct",
+    "commission_entry", "commission_exit",
+)
+_INT_COLUMNS = ("entry_ts", "exit_ts", "entry_bar", "exit_bar")
+_NAT = np.iinfo(np.int64).min
+
+
+class TradeLedger:
+    """
+    Журнал сделок прогона в колоночном формате
+
+    Колонки (массивы длины len(ledger), см. column()):
+        qty, entry_price, exit_price, pnl, pnl_pct, commission_entry,
+        commission_exit — float64;
+        entry_ts, exit_ts — int64, микросекунды от эпохи (точность timestamptz;
+            UTC для tz-aware времени);
+        entry_bar, exit_bar — int64, индекс точки equity curve бара входа/выхода
+            (-1 — неизвестен);
+        side — int8 (SIDE_LONG / SIDE_SHORT);
+        exit_reason — int8, индекс в EXIT_REASONS;
+        symbol — int32, индекс в ledger.symbols
+
+    Attributes:
+        strategy_id: ID стратегии (общий для всех сделок)
+        mode: Режим записи в lab.trades ("backtest")
+        keep_meta: Хранить ли meta сигнала каждой сделки
+        symbols: Справочник символов
+    """
+
+    def __init__(
+        self,
+        strategy_id: str,
+        mode: str = "backtest",
+        keep_meta: bool = True,
+        capacity: int = 64
+    ):
+        self.strategy_id = strategy_id
+        self.mode = mode
+        self.keep_meta = keep_meta
+        self.symbols: List[str] = []
+        self._symbol_codes: Dict[str, int] = {}
+        self._tz = None
+        self._n = 0
+        self._data: Dict[str, np.ndarray] = {}
+        self._allocate(max(capacity, 1))
+        self._meta: List[Dict[str, Any]] = []
+
+    def _allocate(self, capacity: int):
+        """Выделение (или увеличение) массивов до capacity строк"""
+        dtypes = {
+            **{name: np.float64 for name in _FLOAT_COLUMNS},
+            **{name: np.int64 for name in _INT_COLUMNS},
+            "side": np.int8, "exit_reason": np.int8, "symbol": np.int32,
+        }
+        for name, dtype in dtypes.items():
+            array = np.empty(capacity, dtype=dtype)
+            if name in self._data:
+                array[:self._n] = self._data[name][:self._n]
+            self._data[name] = array
+
+    def add(
+        self,
+        side: str,
+        qty: float,
+        entry_ts,
+        entry_price: float,
+        exit_ts,
+        exit_price: float,
+        pnl: float,
+        pnl_pct: float,
+        symbol: str,
+        exit_reason: str,
+        commission_entry: float,
+        commission_exit: float,
+        entry_bar: int = -1,
+        exit_bar: int = -1,
+        meta: Optional[Dict[str, Any]] = None
+    ):
+        """Добавление закрытой сделки (амортизированно O(1))"""
+        n = self._n
+        if n == len(self._data["pnl"]):
+            self._allocate(2 * n)
+
+        code = self._symbol_codes.get(symbol)
+        if code is None:
+            code = self._symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        data = self._data
+        data["qty"][n] = qty
+        data["entry_price"][n] = entry_price
+        data["exit_price"][n] = exit_price
+        data["pnl"][n] = pnl
+        data["pnl_pct"][n] = pnl_pct
+        data["commission_entry"][n] = commission_entry
+        data["commission_exit"][n] = commission_exit
+        data["entry_ts"][n] = self._to_us(entry_ts)
+        data["exit_ts"][n] = self._to_us(exit_ts)
+        data["entry_bar"][n] = entry_bar
+        data["exit_bar"][n] = exit_bar
+        data["side"][n] = SIDE_LONG if side == "LONG" else SIDE_SHORT
+        data["exit_reason"][n] = EXIT_REASONS.index(exit_reason)
+        data["symbol"][n] = code
+        if self.keep_meta:
+            self._meta.append(dict(meta or {}))
+        self._n = n + 1
+
+    def _to_us(self, ts) -> int:
+        if ts is None:
+            return _NAT
+        ts = pd.Timestamp(ts)
+        if self._tz is None and ts.tz is not None:
+            self._tz = ts.tz
+        return int(ts.as_unit("us").asm8.view("i8"))
+
+    def _to_ts(self, value: int):
+        if value == _NAT:
+            return None
+        return pd.Timestamp(value, unit="us", tz=self._tz)
+
+    # ===== ДОСТУП К КОЛОНКАМ =====
+
+    def column(self, name: str) -> np.ndarray:
+        """Колонка как view длины len(ledger) (без копирования)"""
+        return self._data[name][:self._n]
+
+    def hold_hours(self) -> np.ndarray:
+        """
+        Длительность сделок с известным временем входа и выхода в часах
+
+        Как (exit_ts - entry_ts).total_seconds() / 3600 (timedelta тоже
+        считает в микросекундах).
+        """
+        entry_ts, exit_ts = self.column("entry_ts"), self.column("exit_ts")
+        known = (entry_ts != _NAT) & (exit_ts != _NAT)
+        if not known.all():
+            entry_ts, exit_ts = entry_ts[known], exit_ts[known]
+        return (exit_ts - entry_ts) / 1e6 / 3600.0
+
+    def __len__(self) -> int:
+        return self._n
+
+    # ===== СОВМЕСТИМОСТЬ СО СПИСКОМ DICT =====
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Сделка i в прежнем формате dict"""
+        data = self._data
+        meta = self._meta[i] if self.keep_meta else {}
+        return {
+            "strategy_id": self.strategy_id,
+            "mode": self.mode,
+            "symbol": self.symbols[data["symbol"][i]],
+            "side": "LONG" if data["side"][i] == SIDE_LONG else "SHORT",
+            "qty": float(data["qty"][i]),
+            "entry_ts": self._to_ts(data["entry_ts"][i]),
+            "entry_price": float(data["entry_price"][i]),
+            "exit_ts": self._to_ts(data["exit_ts"][i]),
+            "exit_price": float(data["exit_price"][i]),
+            "pnl": float(data["pnl"][i]),
+            "pnl_pct": float(data["pnl_pct"][i]),
+            "meta": {
+                **meta,
+                "exit_reason": EXIT_REASONS[data["exit_reason"][i]],
+                "commission_entry": float(data["commission_entry"][i]),
+                "commission_exit": float(data["commission_exit"][i]),
+            },
+        }
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(self._n))]
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("trade index out of range")
+        return self.record(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._n):
+            yield self.record(i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TradeLedger):
+            if self._n != len(other):
+                return False
+            same = all(
+                np.array_equal(self.column(name), other.column(name))
+                for name in _FLOAT_COLUMNS + ("entry_ts", "exit_ts", "side", "exit_reason")
+            )
+            return (
+                same
+                and [self.symbols[c] for c in self.column("symbol")]
+                == [other.symbols[c] for c in other.column("symbol")]
+                and (self._meta == other._meta or not (self.keep_meta and other.keep_meta))
+            )
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TradeLedger(strategy_id='{self.strategy_id}', trades={self._n})"
+
+    # ===== ЭКСПОРТ =====
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Сделки как DataFrame (колонки lab.trades без meta + exit_reason, бары входа/выхода)"""
+        entry_ts = pd.to_datetime(self.column("entry_ts"), unit="us", utc=self._tz is not None)
+        exit_ts = pd.to_datetime(self.column("exit_ts"), unit="us", utc=self._tz is not None)
+        return pd.DataFrame({
+            "strategy_id": self.strategy_id,
+            "mode": self.mode,
+            "symbol": np.asarray(self.symbols, dtype=object)[self.column("symbol")]
+            if self._n else np.empty(0, dtype=object),
+            "side": np.where(self.column("side") == SIDE_LONG, "LONG", "SHORT"),
+            "qty": self.column("qty"),
+            "entry_ts": entry_ts,
+            "entry_price": self.column("entry_price"),
+            "exit_ts": exit_ts,
+            "exit_price": self.column("exit_price"),
+            "pnl": self.column("pnl"),
+            "pnl_pct": self.column("pnl_pct"),
+            "exit_reason": np.asarray(EXIT_REASONS, dtype=object)[self.column("exit_reason")],
+            "commission_entry": self.column("commission_entry"),
+            "commission_exit": self.column("commission_exit"),
+            "entry_bar": self.column("entry_bar"),
+            "exit_bar": self.column("exit_bar"),
+        })
+
+    def to_records(self, run_id: str) -> List[Tuple]:
+        """
+        Строки lab.trades для COPY (в порядке persistence.TRADE_COLUMNS)
+
+        Колонки переводятся в Python-значения целиком (tolist()), meta
+        собирается из журнала (причина выхода, комиссии, run_id) и, при
+        keep_meta, meta сигнала.
+        """
+        if not self._n:
+            return []
+        symbols = [self.symbols[c] for c in self.column("symbol").tolist()]
+        sides = ["LONG" if s == SIDE_LONG else "SHORT" for s in self.column("side").tolist()]
+        entry_ts = [self._to_ts(v) for v in self.column("entry_ts").tolist()]
+        exit_ts = [self._to_ts(v) for v in self.column("exit_ts").tolist()]
+        reasons = self.column("exit_reason").tolist()
+        commission_entry = self.column("commission_entry").tolist()
+        commission_exit = self.column("commission_exit").tolist()
+        metas = self._meta if self.keep_meta else [{}] * self._n
+
+        records = []
+        for i, (qty, entry_price, exit_price, pnl, pnl_pct) in enumerate(zip(
+            self.column("qty").tolist(), self.column("entry_price").tolist(),
+            self.column("exit_price").tolist(), self.column("pnl").tolist(),
+            self.column("pnl_pct").tolist()
+        )):
+            meta = {
+                **metas[i],
+                "exit_reason": EXIT_REASONS[reasons[i]],
+                "commission_entry": commission_entry[i],
+                "commission_exit": commission_exit[i],
+                "run_id": run_id,
+            }
+            records.append((
+                run_id, self.strategy_id, self.mode, symbols[i], sides[i], qty,
+                entry_ts[i], entry_price, exit_ts[i], exit_price, pnl, pnl_pct,
+                json.dumps(meta, default=str),
+            ))
+        return records
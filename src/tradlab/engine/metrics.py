@@ -3,11 +3,21 @@
 
 Этот модуль содержит класс MetricsCalculator с статическими методами
 для расчёта различных метрик эффективности торговых стратегий.
+
+Кроме расчёта по одной pd.Series есть пакетный API для оптимизатора:
+batch_metrics() — по матрице equity (прогоны × бары), batch_trade_metrics() —
+по колоночной таблице сделок. Значения совпадают с расчётом по одной серии
+бит-в-бит (те же операции и тот же порядок суммирования, что у pandas).
+
+OnlineMetrics — накопитель тех же метрик с обновлением O(1) на бар / сделку
+для live- и paper-торговли.
 """
 
+import math
+
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 
 class MetricsCalculator:
@@ -231,3 +241,312 @@ class MetricsCalculator:
         profit_factor = gross_profit / gross_loss
         
         return float(profit_factor)
+    
+    # ===== BATCH (ПО МНОГИМ ПРОГОНАМ) =====
+    
+    @staticmethod
+    def batch_metrics(
+        equity: np.ndarray,
+        total_return: Optional[np.ndarray] = None,
+        risk_free_rate: float = 0.0
+    ) -> Dict[str, np.ndarray]:
+        """
+        Sharpe, Sortino, MaxDD и Calmar по матрице equity curves
+        
+        Строка i — equity curve прогона i (как BacktesterV1.equity_curve);
+        кривые разной длины дополняются NaN в конце. Результат по строке
+        совпадает с calculate_*() от pd.Series этой кривой бит-в-бит.
+        
+        Args:
+            equity: Матрица (прогоны × бары)
+            total_return: Общая доходность каждого прогона в процентах (для
+                Calmar); None — по первой и последней точке кривой
+            risk_free_rate: Безрисковая ставка (годовая, в долях единицы)
+        
+        Returns:
+            Dict массивов длины «число прогонов»: sharpe, sortino, max_dd, calmar
+        
+        Note:
+            - Доходности: equity[t] / equity[t - 1] - 1 (как pct_change().dropna());
+              кривая не должна содержать NaN внутри и нулевых значений
+            - Суммы считаются по группам строк одинаковой длины, чтобы порядок
+              попарного суммирования NumPy совпадал с pandas
+        """
+        equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+        lengths = np.count_nonzero(~np.isnan(equity), axis=1)
+        
+        # Max Drawdown: кумулятивный максимум вдоль строки
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cumulative_max = np.maximum.accumulate(equity, axis=1)
+            drawdown = (cumulative_max - equity) / cumulative_max
+        has_dd = ~np.all(np.isnan(drawdown), axis=1)
+        max_dd = np.zeros(len(equity))
+        max_dd[has_dd] = np.nanmax(drawdown[has_dd], axis=1) * 100
+        
+        # Доходности (длина строки на 1 меньше кривой)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = equity[:, 1:] / equity[:, :-1] - 1
+        n_returns = np.maximum(lengths - 1, 0)
+        
+        sums = MetricsCalculator._row_sums(returns, n_returns)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / n_returns
+        std = MetricsCalculator._row_std(returns, n_returns, mean)
+        
+        # Downside: отрицательные доходности сдвигаются в начало строки с сохранением порядка
+        negative = returns < 0
+        order = np.argsort(~negative, axis=1, kind="stable")
+        downside = np.take_along_axis(returns, order, axis=1)
+        n_downside = np.count_nonzero(negative, axis=1)
+        downside_sums = MetricsCalculator._row_sums(downside, n_downside)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            downside_std = MetricsCalculator._row_std(downside, n_downside, downside_sums / n_downside)
+        
+        excess = mean - risk_free_rate / 252
+        sharpe = np.zeros(len(equity))
+        ok = (n_returns > 0) & (std != 0) & ~np.isnan(std)
+        sharpe[ok] = excess[ok] / std[ok] * np.sqrt(252)
+        
+        sortino = np.zeros(len(equity))
+        ok = (n_returns > 0) & (n_downside > 0) & (downside_std != 0) & ~np.isnan(downside_std)
+        sortino[ok] = excess[ok] / downside_std[ok] * np.sqrt(252)
+        
+        if total_return is None:
+            rows = np.arange(len(equity))
+            first = equity[:, 0]
+            last = equity[rows, np.maximum(lengths - 1, 0)]
+            total_return = (last - first) / first * 100
+        total_return = np.asarray(total_return, dtype=np.float64)
+        calmar = np.zeros(len(equity))
+        ok = (max_dd != 0) & ~np.isnan(max_dd)
+        calmar[ok] = total_return[ok] / max_dd[ok]
+        
+        return {"sharpe": sharpe, "sortino": sortino, "max_dd": max_dd, "calmar": calmar}
+    
+    @staticmethod
+    def batch_trade_metrics(
+        run_index: np.ndarray,
+        pnl: np.ndarray,
+        n_runs: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Win Rate и Profit Factor по колоночной таблице сделок многих прогонов
+        
+        Сделки прогона идут в таблице в том же порядке, что в его списке
+        trades: суммы прибылей/убытков накапливаются последовательно
+        (np.bincount с весами), как sum() в calculate_profit_factor().
+        
+        Args:
+            run_index: Номер прогона каждой сделки (0..n_runs-1)
+            pnl: PnL каждой сделки (NaN — сделка не закрыта)
+            n_runs: Число прогонов (None — max(run_index) + 1)
+        
+        Returns:
+            (win_rate, profit_factor) — массивы длины n_runs; совпадают с
+            calculate_win_rate() / calculate_profit_factor() по трейдам прогона
+        """
+        run_index = np.asarray(run_index, dtype=np.int64)
+        pnl = np.asarray(pnl, dtype=np.float64)
+        if n_runs is None:
+            n_runs = int(run_index.max()) + 1 if len(run_index) else 0
+        
+        runs, values = run_index, pnl
+        closed = ~np.isnan(pnl)
+        if not closed.all():
+            runs, values = run_index[closed], pnl[closed]
+        n_closed = np.bincount(runs, minlength=n_runs)
+        n_wins = np.bincount(runs, weights=values > 0, minlength=n_runs)
+        gross_profit = np.bincount(runs, weights=np.maximum(values, 0.0), minlength=n_runs)
+        gross_loss = np.abs(np.bincount(runs, weights=np.minimum(values, 0.0), minlength=n_runs))
+        
+        win_rate = np.zeros(n_runs)
+        has = n_closed > 0
+        win_rate[has] = (n_wins[has] / n_closed[has]) * 100
+        
+        profit_factor = np.zeros(n_runs)
+        has_loss = has & (gross_loss != 0)
+        profit_factor[has_loss] = gross_profit[has_loss] / gross_loss[has_loss]
+        profit_factor[has & (gross_loss == 0) & (gross_profit != 0)] = np.inf
+        
+        return win_rate, profit_factor
+    
+    @staticmethod
+    def _row_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Суммы первых lengths[i] элементов каждой строки
+        
+        Строки одной длины суммируются одним вызовом по плотному блоку —
+        попарное суммирование NumPy идёт так же, как для отдельной серии.
+        """
+        sums = np.zeros(len(values))
+        for length in np.unique(lengths):
+            if length == 0:
+                continue
+            rows = np.flatnonzero(lengths == length)
+            sums[rows] = values[rows, :length].sum(axis=1)
+        return sums
+    
+    @staticmethod
+    def _row_std(values: np.ndarray, lengths: np.ndarray, mean: np.ndarray) -> np.ndarray:
+        """Выборочное std (ddof=1) первых lengths[i] элементов строк, двухпроходно как в pandas"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            squares = (mean[:, None] - values) ** 2
+            variance = MetricsCalculator._row_sums(squares, lengths) / (lengths - 1)
+            variance[lengths <= 1] = np.nan
+            return np.sqrt(variance)
+
+
+class OnlineMetrics:
+    """
+    Потоковые метрики: O(1) на бар (equity) и на закрытую сделку
+    
+    Те же определения, что у MetricsCalculator, но без пересчёта по всей
+    истории:
+    - Sharpe: среднее и дисперсия доходностей по Уэлфорду (ddof=1)
+    - Sortino: отдельный накопитель Уэлфорда по отрицательным доходностям
+    - MaxDD: бегущий пик equity и максимальная просадка от него
+    - Win Rate / Profit Factor: счётчики и суммы прибылей/убытков
+      (суммы накапливаются в порядке сделок, как в calculate_profit_factor)
+    
+    Sharpe/Sortino совпадают с MetricsCalculator с точностью до округления
+    (однопроходный алгоритм), MaxDD, Win Rate и Profit Factor — точно.
+    
+    Пример:
+        metrics = OnlineMetrics(initial_equity=10000.0)
+        metrics.update_equity(10120.0)       # на каждом баре
+        metrics.update_trade(pnl=120.0)      # при закрытии сделки
+        metrics.snapshot()                   # {"sharpe": ..., "max_dd": ..., ...}
+    """
+    
+    def __init__(self, initial_equity: Optional[float] = None, risk_free_rate: float = 0.0):
+        """
+        Args:
+            initial_equity: Начальный капитал (первая точка equity curve);
+                None — первой точкой станет первый update_equity()
+            risk_free_rate: Безрисковая ставка (годовая, в долях единицы)
+        """
+        self.risk_free_rate = risk_free_rate
+        self.initial_equity = initial_equity
+        self.equity = initial_equity
+        self.peak = initial_equity
+        self.max_drawdown = 0.0
+        
+        # Уэлфорд по всем доходностям и по отрицательным
+        self.n_returns = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.n_downside = 0
+        self._downside_mean = 0.0
+        self._downside_m2 = 0.0
+        
+        # Сделки
+        self.closed_trades = 0
+        self.winning_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+    
+    def update_equity(self, equity: float):
+        """Новая точка equity curve (обычно закрытие бара)"""
+        equity = float(equity)
+        if self.equity is None:
+            self.initial_equity = self.equity = self.peak = equity
+            return
+        
+        if self.equity != 0:
+            r = equity / self.equity - 1
+            self.n_returns += 1
+            delta = r - self._mean
+            self._mean += delta / self.n_returns
+            self._m2 += delta * (r - self._mean)
+            
+            if r < 0:
+                self.n_downside += 1
+                delta = r - self._downside_mean
+                self._downside_mean += delta / self.n_downside
+                self._downside_m2 += delta * (r - self._downside_mean)
+        
+        self.equity = equity
+        if equity > self.peak:
+            self.peak = equity
+        elif self.peak:
+            drawdown = (self.peak - equity) / self.peak
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+    
+    def update_trade(self, pnl: Optional[float]):
+        """Закрытая сделка (pnl=None — сделка без PnL, не учитывается)"""
+        if pnl is None:
+            return
+        self.closed_trades += 1
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.gross_loss += pnl
+    
+    @property
+    def sharpe(self) -> float:
+        """Sharpe по доходностям с начала (аннуализация sqrt(252))"""
+        if self.n_returns < 2:
+            return 0.0
+        std = math.sqrt(self._m2 / (self.n_returns - 1))
+        if std == 0:
+            return 0.0
+        return float((self._mean - self.risk_free_rate / 252) / std * np.sqrt(252))
+    
+    @property
+    def sortino(self) -> float:
+        """Sortino: среднее всех доходностей / std отрицательных"""
+        if self.n_downside < 2:
+            return 0.0
+        downside_std = math.sqrt(self._downside_m2 / (self.n_downside - 1))
+        if downside_std == 0:
+            return 0.0
+        return float((self._mean - self.risk_free_rate / 252) / downside_std * np.sqrt(252))
+    
+    @property
+    def max_dd(self) -> float:
+        """Максимальная просадка в процентах"""
+        return float(self.max_drawdown * 100)
+    
+    @property
+    def total_return(self) -> float:
+        """Доходность от начального капитала в процентах"""
+        if not self.initial_equity:
+            return 0.0
+        return float((self.equity - self.initial_equity) / self.initial_equity * 100)
+    
+    @property
+    def calmar(self) -> float:
+        return MetricsCalculator.calculate_calmar(self.total_return, self.max_dd)
+    
+    @property
+    def win_rate(self) -> float:
+        if not self.closed_trades:
+            return 0.0
+        return float((self.winning_trades / self.closed_trades) * 100)
+    
+    @property
+    def profit_factor(self) -> float:
+        gross_loss = abs(self.gross_loss)
+        if gross_loss == 0:
+            return 0.0 if self.gross_profit == 0 else float('inf')
+        return float(self.gross_profit / gross_loss)
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Текущие значения всех метрик"""
+        return {
+            "equity": self.equity,
+            "total_return": self.total_return,
+            "sharpe": self.sharpe,
+            "sortino": self.sortino,
+            "max_dd": self.max_dd,
+            "calmar": self.calmar,
+            "win_rate": self.win_rate,
+            "profit_factor": self.profit_factor,
+            "closed_trades": self.closed_trades,
+        }
+    
+    def passes_risk_gate(self, max_dd: float = 20.0) -> bool:
+        """Критерии Risk Gate L1 (как BacktesterV1._check_risk_gate) по текущим метрикам"""
+        return self.sharpe >= 1.0 and self.max_dd <= max_dd and self.win_rate >= 40.0
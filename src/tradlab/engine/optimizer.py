@@ -0,0 +1,928 @@
+"""
+Оптимизатор параметров стратегий для TradLab
+
+Модуль содержит движок параллельного перебора сетки параметров (grid sweep):
+- фичи каждого периода загружаются из БД один раз;
+- числовые колонки кладутся в shared memory, воркеры читают их без копирования;
+- прогоны BacktesterV1 распределяются по ProcessPoolExecutor;
+- строки результатов собираются централизованно в главном процессе;
+- score-массивы стратегии (compute_scores_batch) считаются один раз на период
+  и набор SCORE_PARAMS, точки сетки прогоняют только пороги, SL/TP и цикл позиций;
+- точки сетки, отличающиеся только параметрами, которые стратегия не читает
+  (определяется пробным прогоном с TrackedParams), считаются один раз;
+- трейды и результаты воркеров пишутся в БД главным процессом пачками
+  через ResultWriter (COPY + upsert), а не отдельной транзакцией на прогон;
+- с prune_margin прогоны, чья просадка заведомо проваливает Risk Gate,
+  останавливаются досрочно (status="pruned").
+"""
+
+import contextlib
+import io
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+import pandas as pd
+
+from .backtester_v1 import BacktesterV1
+from .feature_adapter_v1 import FeatureAdapterV1
+from .persistence import ResultWriter
+from .result_cache import ResultCache
+from .strategy_abi import BaseStrategy
+
+
+logger = logging.getLogger(__name__)
+
+
+def expand_grid(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Декартово произведение сетки параметров
+
+    Args:
+        param_grid: Словарь {параметр: список значений}
+
+    Returns:
+        Список словарей с комбинациями (в порядке itertools.product)
+    """
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*param_grid.values())]
+
+
+class TrackedParams(dict):
+    """
+    Словарь параметров, запоминающий прочитанные ключи
+
+    Передаётся стратегии вместо params при пробном прогоне. Чтение по ключу,
+    get() и проверка `in` отмечают ключ; операции над всем словарём
+    (итерация, items(), copy() и т.п.) консервативно отмечают все ключи.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accessed = set()
+
+    def __getitem__(self, key):
+        self.accessed.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.accessed.add(key)
+        return super().__contains__(key)
+
+    def _touch_all(self):
+        self.accessed.update(super().keys())
+
+    def __iter__(self):
+        self._touch_all()
+        return super().__iter__()
+
+    def keys(self):
+        self._touch_all()
+        return super().keys()
+
+    def values(self):
+        self._touch_all()
+        return super().values()
+
+    def items(self):
+        self._touch_all()
+        return super().items()
+
+    def copy(self):
+        self._touch_all()
+        return dict(super().items())
+
+
+def rank_points(table: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """Строки sweep-таблицы по убыванию metric; досрочно остановленные — в конце"""
+    pruned = table["status"].eq("pruned") if "status" in table else pd.Series(False, index=table.index)
+    order = table.assign(_pruned=pruned).sort_values(
+        ["_pruned", metric], ascending=[True, False], kind="stable"
+    )
+    return order.drop(columns="_pruned")
+
+
+def group_points(points: List[Dict[str, Any]], used_keys) -> List[int]:
+    """
+    Индекс представителя для каждой точки сетки
+
+    Точки, совпадающие по всем ключам из used_keys, эквивалентны;
+    представитель — первая такая точка в порядке сетки.
+    """
+    first_seen: Dict[Tuple, int] = {}
+    representatives = []
+    for i, point in enumerate(points):
+        signature = tuple((k, repr(point[k])) for k in sorted(point) if k in used_keys)
+        representatives.append(first_seen.setdefault(signature, i))
+    return representatives
+
+
+class SharedFeatures:
+    """
+    Фичи одного периода в shared memory
+
+    Числовые колонки хранятся одним float64-блоком формы (колонки × бары),
+    так что каждая колонка — непрерывный участок памяти. ts_4h хранится
+    отдельным int64-блоком (наносекунды UTC), symbol — константой в spec.
+    """
+
+    TS_COLUMN = "ts_4h"
+
+    def __init__(self, shm_values, shm_ts, spec: Dict[str, Any]):
+        self._shm_values = shm_values
+        self._shm_ts = shm_ts
+        self.spec = spec
+
+    @classmethod
+    def create(cls, features_df: pd.DataFrame) -> "SharedFeatures":
+        """
+        Копирование DataFrame с фичами в shared memory (один раз на период)
+
+        Args:
+            features_df: DataFrame с фичами одного символа
+
+        Returns:
+            SharedFeatures-владелец сегментов памяти
+        """
+        symbols = features_df["symbol"].unique() if "symbol" in features_df.columns else []
+        if len(symbols) > 1:
+            raise ValueError("SharedFeatures поддерживает только один символ на период")
+
+        numeric = [
+            c for c in features_df.columns
+            if c not in ("symbol", cls.TS_COLUMN)
+        ]
+        n = len(features_df)
+
+        shm_values = shared_memory.SharedMemory(create=True, size=max(len(numeric) * n * 8, 1))
+        shm_ts = shared_memory.SharedMemory(create=True, size=max(n * 8, 1))
+
+        values = np.ndarray((len(numeric), n), dtype=np.float64, buffer=shm_values.buf)
+        for j, column in enumerate(numeric):
+            values[j] = features_df[column].to_numpy(dtype=np.float64)
+
+        ts = np.ndarray((n,), dtype=np.int64, buffer=shm_ts.buf)
+        ts[:] = pd.DatetimeIndex(pd.to_datetime(features_df[cls.TS_COLUMN], utc=True)).as_unit("ns").asi8
+
+        spec = {
+            "values_name": shm_values.name,
+            "ts_name": shm_ts.name,
+            "bars": n,
+            "columns": list(features_df.columns),
+            "numeric": numeric,
+            "symbol": str(symbols[0]) if len(symbols) else None,
+        }
+        return cls(shm_values, shm_ts, spec)
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> Tuple["SharedFeatures", pd.DataFrame]:
+        """
+        Подключение к сегментам по spec и сборка DataFrame поверх них
+
+        Returns:
+            (SharedFeatures, DataFrame) — числовые колонки DataFrame являются
+            view на shared memory (без копирования)
+        """
+        shm_values = _attach_shared_memory(spec["values_name"])
+        shm_ts = _attach_shared_memory(spec["ts_name"])
+        n = spec["bars"]
+        numeric = spec["numeric"]
+
+        values = np.ndarray((len(numeric), n), dtype=np.float64, buffer=shm_values.buf)
+        ts = np.ndarray((n,), dtype=np.int64, buffer=shm_ts.buf)
+
+        data = {}
+        for column in spec["columns"]:
+            if column == "symbol":
+                data[column] = np.full(n, spec["symbol"], dtype=object)
+            elif column == cls.TS_COLUMN:
+                data[column] = pd.to_datetime(ts, unit="ns", utc=True)
+            else:
+                data[column] = values[numeric.index(column)]
+
+        return cls(shm_values, shm_ts, spec), pd.DataFrame(data, copy=False)
+
+    def close(self):
+        """Отключение от сегментов (в каждом процессе)"""
+        self._shm_values.close()
+        self._shm_ts.close()
+
+    def unlink(self):
+        """Освобождение сегментов (только владелец)"""
+        self._shm_values.unlink()
+        self._shm_ts.unlink()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Подключение к чужому сегменту без регистрации в resource_tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: иначе трекер воркера удалит сегмент владельца при выходе
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ============================================================
+# Воркер (состояние процесса пула)
+# ============================================================
+
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(
+    specs: Dict[str, Dict[str, Any]],
+    config: Dict[str, Any],
+    frames: Optional[Dict[str, pd.DataFrame]] = None,
+    views: Optional[Dict[str, Tuple[str, Optional[int], Optional[int]]]] = None
+):
+    """
+    Инициализатор воркера: подключение к фичам всех периодов
+
+    frames — готовые DataFrame для выполнения в текущем процессе (без shared memory).
+    views — {ключ: (базовый ключ, start, stop)}: срезы строк базовых фич
+    (например, окна walk-forward поверх одной истории), без копирования.
+    """
+    _WORKER_STATE["config"] = config
+    _WORKER_STATE["cache"] = ResultCache(config["db_url"]) if config["use_cache"] else None
+    _WORKER_STATE["shared"] = {}
+    _WORKER_STATE["features"] = {}
+    _WORKER_STATE["scores"] = {}
+    _WORKER_STATE["features"].update(frames or {})
+    for period_key, spec in specs.items():
+        shared, frame = SharedFeatures.attach(spec)
+        _WORKER_STATE["shared"][period_key] = shared
+        _WORKER_STATE["features"][period_key] = frame
+    for period_key, view in (views or {}).items():
+        _WORKER_STATE["features"][period_key] = _window(_WORKER_STATE["features"], view)
+
+
+def _window(
+    features: Dict[str, pd.DataFrame],
+    view: Tuple[str, Optional[int], Optional[int]]
+) -> pd.DataFrame:
+    """Срез строк [start:stop) базового DataFrame (view при Copy-on-Write)"""
+    base, start, stop = view
+    if start is None and stop is None:
+        return features[base]
+    return features[base].iloc[start:stop]
+
+
+def _bounds(
+    features: Dict[str, pd.DataFrame],
+    views: Dict[str, Tuple[str, Optional[int], Optional[int]]],
+    periods: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """
+    Границы периодов для ключа кэша и lab.result_cache.start_ts/end_ts
+
+    Берутся start/end периода (те же строки, что у run_backtest.py), иначе —
+    ts_4h первого и последнего бара среза. Без границ триггер инвалидации
+    (миграция 20251126_006) удалял бы запись при любой вставке свечей символа.
+    """
+    bounds = {}
+    for key, view in views.items():
+        period = (periods or {}).get(key) or {}
+        start, end = period.get("start"), period.get("end")
+        if start is None or end is None:
+            ts = _window(features, view)["ts_4h"]
+            if len(ts):
+                start = start or pd.Timestamp(ts.iloc[0]).isoformat()
+                end = end or pd.Timestamp(ts.iloc[-1]).isoformat()
+        bounds[key] = (start, end)
+    return bounds
+
+
+def _run_point(period_key: str, point: Dict[str, Any]) -> Dict[str, Any]:
+    """Один прогон BacktesterV1 для точки сетки на фичах периода"""
+    config = _WORKER_STATE["config"]
+    features_df = _WORKER_STATE["features"][period_key]
+    start_date, end_date = config["bounds"].get(period_key, (None, None))
+
+    params = {**config["fixed_params"], **point}
+    strategy = config["strategy_cls"](strategy_id=config["strategy_id"], params=params)
+    backtester = BacktesterV1(
+        db_url=config["db_url"],
+        strategy=strategy,
+        initial_capital=config["initial_capital"],
+        commission_rate=config["commission_rate"],
+        slippage_bps=config["slippage_bps"],
+        mode=config["mode"],
+        result_cache=_WORKER_STATE["cache"],
+        prune_margin=config["prune_margin"],
+        # meta сигналов нужна только для записи сделок в lab.trades
+        trade_meta=config["persist"]
+    )
+
+    scores = None
+    if config["reuse_scores"] and config["mode"] == "vectorized":
+        scores = _cached_scores(period_key, strategy, features_df)
+
+    output = io.StringIO() if config["quiet"] else None
+    with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+        results = backtester.run(
+            symbol=config["symbol"],
+            start_date=start_date,
+            end_date=end_date,
+            features_df=features_df,
+            persist=False,
+            # equity curve в кэше не хранится — при return_equity прогон обязателен
+            force=config["force"] or config["return_equity"],
+            scores=scores
+        )
+
+    # Запись в БД делает главный процесс (буфер ResultWriter)
+    if config["persist"] and not results["cache_hit"]:
+        results["trades"] = backtester.trades
+    if config["return_equity"]:
+        results["equity_curve"] = np.asarray(backtester.equity_curve, dtype=np.float64)
+
+    return results
+
+
+def _cached_scores(period_key: str, strategy: BaseStrategy, features_df: pd.DataFrame):
+    """compute_scores_batch() периода, один раз на процесс и набор SCORE_PARAMS"""
+    key = (period_key, strategy.score_key())
+    cache = _WORKER_STATE["scores"]
+    if key not in cache:
+        cache[key] = strategy.compute_scores_batch(features_df)
+    return cache[key]
+
+
+class GridSweep:
+    """
+    Параллельный grid sweep параметров стратегии
+
+    Пример:
+        sweep = GridSweep(db_url, STR100ChainFlowETH, PARAM_GRID, FIXED_PARAMS)
+        tables = sweep.run({"bull": {"start": "2024-02-01", "end": "2024-03-31"}})
+
+    Attributes:
+        param_grid: Оптимизируемые параметры {имя: список значений}
+        fixed_params: Фиксированные параметры стратегии
+        max_workers: Размер пула процессов (1 — выполнение в текущем процессе)
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        strategy_cls: Type[BaseStrategy],
+        param_grid: Dict[str, List[Any]],
+        fixed_params: Optional[Dict[str, Any]] = None,
+        strategy_id: str = "STR-100",
+        symbol: str = "ETHUSDT",
+        initial_capital: float = 10000.0,
+        commission_rate: float = 0.0004,
+        slippage_bps: float = 5.0,
+        max_workers: Optional[int] = None,
+        mode: str = "vectorized",
+        persist: bool = True,
+        quiet: bool = True,
+        feature_store: Optional[FeatureAdapterV1] = None,
+        flush_every: int = 500,
+        use_cache: bool = False,
+        force: bool = False,
+        dedupe: bool = True,
+        reuse_scores: bool = True,
+        prune_margin: Optional[float] = None
+    ):
+        """
+        Инициализация sweep-движка
+
+        Args:
+            db_url: PostgreSQL connection string
+            strategy_cls: Класс стратегии (наследник BaseStrategy)
+            param_grid: Сетка оптимизируемых параметров
+            fixed_params: Фиксированные параметры (сливаются с точкой сетки)
+            strategy_id: ID стратегии для прогонов
+            symbol: Торговая пара
+            initial_capital: Начальный капитал (USDT)
+            commission_rate: Комиссия биржи (в долях)
+            slippage_bps: Проскальзывание (bps)
+            max_workers: Число процессов (None — os.cpu_count())
+            mode: Режим BacktesterV1 ("loop" или "vectorized")
+            persist: Сохранять ли каждый прогон в lab.trades / lab.results
+            quiet: Подавлять ли вывод BacktesterV1 в воркерах
+            feature_store: Источник фич вместо FeatureAdapterV1(db_url)
+                (например, FeatureStore с локальными снапшотами)
+            flush_every: Сколько прогонов копить перед записью в БД (при persist)
+            use_cache: Брать результаты точек из lab.result_cache (ResultCache)
+            force: Пересчитать точки, даже если они есть в кэше
+            dedupe: Схлопывать точки, отличающиеся только непрочитанными
+                стратегией параметрами (по пробным прогонам probe_used_params)
+            reuse_scores: Считать compute_scores_batch() один раз на период
+                (и набор SCORE_PARAMS) и строить сигналы точек через
+                signals_from_scores(); только для mode="vectorized"
+            prune_margin: Досрочная остановка прогонов, чья просадка превысила
+                BacktesterV1.RISK_GATE_MAX_DD + prune_margin (п.п.); None — выключена
+        """
+        self.db_url = db_url
+        self.strategy_cls = strategy_cls
+        self.param_grid = param_grid
+        self.fixed_params = fixed_params or {}
+        self.strategy_id = strategy_id
+        self.symbol = symbol
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.slippage_bps = slippage_bps
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mode = mode
+        self.persist = persist
+        self.quiet = quiet
+        self.flush_every = flush_every
+        self.use_cache = use_cache
+        self.force = force
+        self.dedupe = dedupe
+        self.reuse_scores = reuse_scores
+        self.prune_margin = prune_margin
+        self.used_params: Optional[set] = None
+        self.dead_axes: List[str] = []
+        # Возвращать ли equity curve прогонов (нужно walk-forward для склейки OOS)
+        self.return_equity = False
+        # Доп. meta для строк lab.results по ключу периода
+        self.run_meta: Dict[str, Dict[str, Any]] = {}
+        self._writer: Optional[ResultWriter] = None
+
+        self.feature_adapter = feature_store if feature_store is not None else FeatureAdapterV1(db_url)
+
+    def combinations(self) -> List[Dict[str, Any]]:
+        """Все точки сетки"""
+        return expand_grid(self.param_grid)
+
+    def probe_used_params(
+        self,
+        features_df: pd.DataFrame,
+        points: Optional[List[Dict[str, Any]]] = None
+    ) -> set:
+        """
+        Ключи params, которые стратегия читает при прогоне
+
+        Делает пробные прогоны (без записи в БД) на первой и последней точках
+        (points или вся сетка) с TrackedParams и объединяет прочитанные ключи. Ключ, который
+        читается только в редкой ветке, не попавшей в пробы, будет ошибочно
+        сочтён мёртвым — для таких стратегий используйте dedupe=False.
+        """
+        if points is None:
+            points = self.combinations()
+        probes = [points[0], points[-1]] if len(points) > 1 else points[:1]
+
+        used = set()
+        for point in probes:
+            params = TrackedParams({**self.fixed_params, **point})
+            strategy = self.strategy_cls(strategy_id=self.strategy_id, params=params)
+            backtester = BacktesterV1(
+                db_url=self.db_url,
+                strategy=strategy,
+                initial_capital=self.initial_capital,
+                commission_rate=self.commission_rate,
+                slippage_bps=self.slippage_bps,
+                mode=self.mode
+            )
+            output = io.StringIO() if self.quiet else None
+            with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+                backtester.run(symbol=self.symbol, features_df=features_df, persist=False)
+            used |= params.accessed
+        return used
+
+    def load_features(self, periods: Dict[str, Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
+        """
+        Загрузка фич для каждого периода (один запрос к БД на период)
+
+        Args:
+            periods: {ключ периода: {"start": ..., "end": ...}}
+
+        Returns:
+            {ключ периода: DataFrame с фичами}
+        """
+        features = {}
+        for period_key, period in periods.items():
+            df = self.feature_adapter.fetch_features(
+                symbol=self.symbol,
+                start_date=period["start"],
+                end_date=period["end"]
+            )
+            if df.empty:
+                raise ValueError(f"Нет данных для {self.symbol} в периоде {period_key}")
+            features[period_key] = self.feature_adapter.prepare_features_for_strategy(df)
+        return features
+
+    def run(
+        self,
+        periods: Dict[str, Dict[str, Any]],
+        features: Optional[Dict[str, pd.DataFrame]] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        points: Optional[List[Dict[str, Any]]] = None,
+        windows: Optional[Dict[str, Tuple[str, Optional[int], Optional[int]]]] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Запуск sweep по всем периодам
+
+        Args:
+            periods: {ключ периода: {"start": ..., "end": ...}}
+            features: Предзагруженные фичи по периодам (иначе загружаются из БД)
+            progress: Колбэк progress(done, total)
+            points: Явный список точек (по умолчанию — вся сетка combinations())
+            windows: {ключ периода: (ключ в features, start, stop)} — периоды как срезы
+                строк общих фич (в shared memory кладутся только базовые фичи)
+
+        Returns:
+            {ключ периода: DataFrame со строками результатов в порядке сетки}
+        """
+        if features is None:
+            features = self.load_features(periods)
+        views = windows or {key: (key, None, None) for key in periods}
+
+        if points is None:
+            points = self.combinations()
+        representatives = list(range(len(points)))
+
+        if self.dedupe and points:
+            # Пробные прогоны — один раз на объект sweep (повторные run() их переиспользуют)
+            if self.used_params is None:
+                first = _window(features, views[next(iter(periods))])
+                self.used_params = self.probe_used_params(first, points)
+                self.dead_axes = [k for k in self.param_grid if k not in self.used_params]
+                for axis in self.dead_axes:
+                    print(f"⚠️  [GridSweep] Параметр '{axis}' не читается стратегией "
+                          f"{self.strategy_cls.__name__}: ось сетки не влияет на результат")
+            representatives = group_points(points, self.used_params)
+
+        unique = sorted(set(representatives))
+        if len(unique) < len(points):
+            print(f"[GridSweep] {len(points)} точек → {len(unique)} уникальных прогонов на период")
+
+        tasks = [(period_key, points[r]) for period_key in periods for r in unique]
+        outcomes = self.execute_tasks(features, views, tasks, progress, periods)
+
+        # Результат представителя раздаётся всем эквивалентным точкам
+        tables = {}
+        for p, period_key in enumerate(periods):
+            outcome_of = {r: outcomes[p * len(unique) + j] for j, r in enumerate(unique)}
+            period_rows = [
+                self.result_row(point, outcome_of[representatives[i]])
+                for i, point in enumerate(points)
+                if outcome_of[representatives[i]] is not None
+            ]
+            tables[period_key] = pd.DataFrame(period_rows)
+        return tables
+
+    def execute_tasks(
+        self,
+        features: Dict[str, pd.DataFrame],
+        views: Dict[str, Tuple[str, Optional[int], Optional[int]]],
+        tasks: List[Tuple[str, Dict[str, Any]]],
+        progress: Optional[Callable[[int, int], None]] = None,
+        periods: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Прогоны произвольных задач (ключ периода, точка) на общих фичах
+
+        Базовые фичи (features) кладутся в shared memory один раз, периоды
+        задаются срезами views. Границы периода в прогоне — start/end из
+        periods, иначе ts_4h среза. Возвращает результаты в порядке задач
+        (None для упавших прогонов).
+        """
+        bounds = _bounds(features, views, periods)
+        bases = sorted({base for base, _, _ in views.values()})
+
+        # В текущем процессе (max_workers=1) фичи передаются напрямую, без shared memory
+        inline = self.max_workers == 1
+        shared = {} if inline else {key: SharedFeatures.create(features[key]) for key in bases}
+        try:
+            specs = {key: sh.spec for key, sh in shared.items()}
+            frames = {key: features[key] for key in bases} if inline else None
+            return self._execute(specs, tasks, progress, frames, views, bounds)
+        finally:
+            for sh in shared.values():
+                sh.close()
+                sh.unlink()
+
+    def _execute(
+        self,
+        specs: Dict[str, Dict[str, Any]],
+        tasks: List[Tuple[str, Dict[str, Any]]],
+        progress: Optional[Callable[[int, int], None]],
+        frames: Optional[Dict[str, pd.DataFrame]] = None,
+        views: Optional[Dict[str, Tuple[str, Optional[int], Optional[int]]]] = None,
+        bounds: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Выполнение задач в пуле процессов; возвращает результаты в порядке задач"""
+        config = {**self._worker_config(), "bounds": bounds or {}}
+        outcomes: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+        started = time.time()
+        self._writer = ResultWriter(self.db_url, buffer_runs=self.flush_every) if self.persist else None
+
+        if self.max_workers == 1:
+            _init_worker(specs, config, frames, views)
+            try:
+                for i, (period_key, point) in enumerate(tasks):
+                    outcomes[i] = self._collect(tasks[i], _safe_run_point(period_key, point))
+                    if progress:
+                        progress(i + 1, len(tasks))
+            finally:
+                for sh in _WORKER_STATE.get("shared", {}).values():
+                    sh.close()
+                _WORKER_STATE.clear()
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(specs, config, None, views)
+            ) as executor:
+                futures = {
+                    executor.submit(_safe_run_point, period_key, point): i
+                    for i, (period_key, point) in enumerate(tasks)
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    i = futures[future]
+                    outcomes[i] = self._collect(tasks[i], future.result())
+                    if progress:
+                        progress(done, len(tasks))
+
+        if self._writer is not None:
+            self._writer.flush()
+            self._writer = None
+
+        pruned = sum(1 for outcome in outcomes if outcome and outcome.get("status") == "pruned")
+        print(f"[GridSweep] {len(tasks)} прогонов за {time.time() - started:.1f}s "
+              f"({self.max_workers} процессов)"
+              + (f", остановлено досрочно: {pruned}" if pruned else ""))
+        return outcomes
+
+    def _collect(
+        self,
+        task: Tuple[str, Dict[str, Any]],
+        outcome: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Результаты прогона точки сетки (None если прогон упал)"""
+        period_key, point = task
+        if "error" in outcome:
+            print(f"    ❌ Ошибка {point}: {outcome['error']}")
+            return None
+        trades = outcome.pop("trades", None)
+        if period_key in self.run_meta:
+            outcome["meta"] = {**outcome.get("meta", {}), **self.run_meta[period_key]}
+        if self._writer is not None and not outcome.get("cache_hit"):
+            self._writer.add(outcome["run_id"], trades or [], outcome)
+        return outcome
+
+    def result_row(self, point: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        """Строка sweep-таблицы: параметры точки + ключевые метрики"""
+        pnl_total = results.get("pnl_total", 0)
+        return {
+            **point,
+            "sharpe": results.get("sharpe", 0),
+            "pnl_total": pnl_total,
+            "pnl_pct": (pnl_total / self.initial_capital) * 100,
+            "max_dd": results.get("max_dd", 0),
+            "win_rate": results.get("win_rate", 0),
+            "total_trades": results.get("total_trades", 0),
+            "profit_factor": results.get("profit_factor", 0),
+            "status": results.get("status", "completed"),
+            "run_id": results.get("run_id"),
+        }
+
+    def _worker_config(self) -> Dict[str, Any]:
+        """Конфигурация, передаваемая воркерам при инициализации"""
+        return {
+            "db_url": self.db_url,
+            "strategy_cls": self.strategy_cls,
+            "strategy_id": self.strategy_id,
+            "fixed_params": self.fixed_params,
+            "symbol": self.symbol,
+            "initial_capital": self.initial_capital,
+            "commission_rate": self.commission_rate,
+            "slippage_bps": self.slippage_bps,
+            "mode": self.mode,
+            "persist": self.persist,
+            "quiet": self.quiet,
+            "use_cache": self.use_cache,
+            "force": self.force,
+            "reuse_scores": self.reuse_scores,
+            "return_equity": self.return_equity,
+            "prune_margin": self.prune_margin,
+        }
+
+
+def _safe_run_point(period_key: str, point: Dict[str, Any]) -> Dict[str, Any]:
+    """_run_point с перехватом ошибок (ошибка одной точки не роняет sweep)"""
+    try:
+        return _run_point(period_key, point)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+
+# ============================================================
+# Сэмплеры и successive halving
+# ============================================================
+
+class RandomSampler:
+    """
+    Случайные точки пространства параметров без повторов
+
+    Attributes:
+        param_space: {параметр: список допустимых значений} (как param_grid)
+        seed: Seed генератора (None — недетерминированно)
+    """
+
+    def __init__(self, param_space: Dict[str, List[Any]], seed: Optional[int] = None):
+        self.param_space = param_space
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def size(self) -> int:
+        """Размер полного пространства"""
+        return int(np.prod([len(v) for v in self.param_space.values()], dtype=np.int64))
+
+    def point_at(self, index: int) -> Dict[str, Any]:
+        """Точка по номеру в порядке itertools.product (смешанная система счисления)"""
+        point = {}
+        for name in reversed(list(self.param_space)):
+            values = self.param_space[name]
+            index, j = divmod(index, len(values))
+            point[name] = values[j]
+        return {name: point[name] for name in self.param_space}
+
+    def sample(self, n: int) -> List[Dict[str, Any]]:
+        """n уникальных точек (все точки, если n >= размера пространства)"""
+        n = min(n, self.size)
+        indices = self.rng.choice(self.size, size=n, replace=False)
+        return [self.point_at(int(i)) for i in indices]
+
+
+class HaltonSampler(RandomSampler):
+    """
+    Квазислучайные точки (последовательность Холтона) без повторов
+
+    Каждой оси соответствует своё простое основание; значение оси —
+    values[floor(u * len(values))]. Точки покрывают пространство
+    равномернее случайных при том же n.
+    """
+
+    PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47)
+
+    def __init__(self, param_space: Dict[str, List[Any]], seed: Optional[int] = None):
+        super().__init__(param_space, seed)
+        if len(param_space) > len(self.PRIMES):
+            raise ValueError(f"HaltonSampler поддерживает до {len(self.PRIMES)} осей")
+        # Случайный сдвиг начала последовательности (воспроизводим по seed)
+        self.offset = int(self.rng.integers(0, 1000))
+
+    @staticmethod
+    def radical_inverse(i: int, base: int) -> float:
+        """Обращение цифр i в системе base: 0.d1d2d3... (base)"""
+        result, f = 0.0, 1.0 / base
+        while i > 0:
+            i, digit = divmod(i, base)
+            result += digit * f
+            f /= base
+        return result
+
+    def sample(self, n: int) -> List[Dict[str, Any]]:
+        """n уникальных точек (повторы при округлении до сетки пропускаются)"""
+        n = min(n, self.size)
+        names = list(self.param_space)
+        seen, points = set(), []
+        i = self.offset + 1
+        # Ограничение числа попыток: на грубых сетках совпадения часты
+        for _ in range(n * 50):
+            if len(points) == n:
+                break
+            idx = tuple(
+                int(self.radical_inverse(i, self.PRIMES[d]) * len(self.param_space[name]))
+                for d, name in enumerate(names)
+            )
+            i += 1
+            if idx not in seen:
+                seen.add(idx)
+                points.append({name: self.param_space[name][j] for name, j in zip(names, idx)})
+        return points
+
+
+class SuccessiveHalving(GridSweep):
+    """
+    Successive halving вместо полного перебора сетки
+
+    На каждом периоде sampler выдаёт n_configs точек из param_grid. Точки
+    прогоняются на коротком начальном под-окне периода, лучшая 1/eta часть
+    (по metric) переходит на следующую ступень с окном в eta раз длиннее,
+    последняя ступень — полный период. Прогоны каждой ступени идут тем же
+    параллельным движком, что и GridSweep.
+
+    Возвращаемые таблицы имеют формат GridSweep.run() и содержат точки,
+    дошедшие до полного окна; все ступени — в self.history.
+
+    При persist в lab.trades / lab.results пишется только последняя ступень
+    (полное окно периода): прогоны коротких окон иначе были бы неотличимы
+    от полных прогонов того же периода.
+
+    Пример:
+        search = SuccessiveHalving(db_url, STR100ChainFlowETH, PARAM_GRID,
+                                   FIXED_PARAMS, n_configs=81, eta=3)
+        tables = search.run(TEST_PERIODS)
+    """
+
+    def __init__(
+        self,
+        *args,
+        sampler: Optional[RandomSampler] = None,
+        n_configs: int = 81,
+        eta: int = 3,
+        min_fraction: float = 1 / 9,
+        metric: str = "sharpe",
+        seed: Optional[int] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            *args, **kwargs: Параметры GridSweep
+            sampler: Источник точек (по умолчанию HaltonSampler(param_grid, seed))
+            n_configs: Число точек на первой ступени
+            eta: Во сколько раз сокращается число точек и растёт окно на ступень
+            min_fraction: Доля периода для первой ступени (нижняя граница)
+            metric: Колонка строки результата, по которой отбираются точки (больше — лучше)
+            seed: Seed сэмплера по умолчанию
+        """
+        super().__init__(*args, **kwargs)
+        if eta < 2:
+            raise ValueError("eta должно быть >= 2")
+        self.sampler = sampler or HaltonSampler(self.param_grid, seed=seed)
+        self.n_configs = n_configs
+        self.eta = eta
+        self.min_fraction = min_fraction
+        self.metric = metric
+        self.history: Dict[str, pd.DataFrame] = {}
+
+    def rung_fractions(self) -> List[float]:
+        """Доли периода по ступеням, от короткой к полной (последняя = 1.0)"""
+        fractions = [1.0]
+        while fractions[0] / self.eta >= self.min_fraction - 1e-12:
+            fractions.insert(0, fractions[0] / self.eta)
+        return fractions
+
+    def run(
+        self,
+        periods: Dict[str, Dict[str, Any]],
+        features: Optional[Dict[str, pd.DataFrame]] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Successive halving по каждому периоду
+
+        Returns:
+            {ключ периода: DataFrame точек, прогнанных на полном периоде}
+        """
+        if features is None:
+            features = self.load_features(periods)
+
+        tables = {}
+        for period_key, period in periods.items():
+            frame = features[period_key]
+            points = self.sampler.sample(self.n_configs)
+            rungs = []
+            table = pd.DataFrame()
+
+            for r, fraction in enumerate(self.rung_fractions()):
+                bars = max(int(round(len(frame) * fraction)), 1)
+                window = frame.iloc[:bars]
+                # Короткая ступень кончается раньше периода — end по её последнему бару
+                rung_period = period if fraction >= 1.0 else {
+                    **period, "end": pd.Timestamp(window["ts_4h"].iloc[-1]).isoformat()
+                }
+                persist = self.persist
+                # Короткие ступени не сохраняются — только полное окно
+                self.persist = persist and fraction >= 1.0
+                try:
+                    table = super().run(
+                        {period_key: rung_period}, features={period_key: window},
+                        progress=progress, points=points
+                    )[period_key]
+                finally:
+                    self.persist = persist
+                logger.info(
+                    "[SuccessiveHalving] %s: ступень %d, %d точек на %d барах",
+                    period_key, r, len(points), bars
+                )
+
+                rungs.append(table.assign(rung=r, window_bars=bars))
+                if fraction >= 1.0 or table.empty:
+                    break
+
+                keep = max(1, int(np.ceil(len(points) / self.eta)))
+                top = rank_points(table, self.metric).head(keep)
+                points = top[list(self.param_grid)].to_dict("records")
+
+            self.history[period_key] = pd.concat(rungs, ignore_index=True) if rungs else pd.DataFrame()
+            tables[period_key] = table
+        return tables
@@ -0,0 +1,392 @@
+"""
+Пакетное сохранение результатов бэктестов для TradLab
+
+Трейды пишутся в lab.trades одним COPY ... FROM STDIN (CSV), строки
+lab.results — одним execute_values с upsert; всё на одном соединении
+в одной транзакции. ResultWriter может копить прогоны (например, в sweep)
+и сбрасывать их в БД одним flush().
+
+Состояние прогона на последнем баре (баланс, открытая позиция, equity curve,
+агрегаты сделок) пишется в lab.backtest_state в той же транзакции — по нему
+BacktesterV1.resume() продолжает прогон только по новым барам.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import psycopg2.extras
+
+
+TRADE_COLUMNS = (
+    "run_id", "strategy_id", "mode", "symbol", "side", "qty",
+    "entry_ts", "entry_price", "exit_ts", "exit_price", "pnl", "pnl_pct", "meta"
+)
+
+RESULT_COLUMNS = (
+    "run_id", "strategy_id", "start_ts", "end_ts", "pnl_total",
+    "sharpe", "sortino", "max_dd", "calmar", "win_rate", "profit_factor",
+    "pass_risk_gate", "meta"
+)
+
+STATE_COLUMNS = (
+    "run_id", "strategy_id", "strategy_class", "symbol", "params", "start_ts",
+    "last_ts", "balance", "open_position", "equity", "trade_stats", "config"
+)
+
+_COPY_TRADES_SQL = (
+    f"COPY lab.trades ({', '.join(TRADE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+)
+
+_UPSERT_RESULTS_SQL = f"""
+    INSERT INTO lab.results ({', '.join(RESULT_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (run_id) DO UPDATE SET
+        {', '.join(f'{c} = EXCLUDED.{c}' for c in RESULT_COLUMNS if c != 'run_id')}
+"""
+
+
+_UPSERT_STATE_SQL = f"""
+    INSERT INTO lab.backtest_state ({', '.join(STATE_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (run_id) DO UPDATE SET
+        {', '.join(f'{c} = EXCLUDED.{c}' for c in STATE_COLUMNS if c != 'run_id')},
+        updated_at = now()
+"""
+
+# Сделка, закрытая в конце периода (EOD), при продолжении прогона ещё открыта
+_DELETE_EOD_TRADES_SQL = """
+    DELETE FROM lab.trades
+    WHERE run_id = ANY(%s) AND meta->>'exit_reason' = 'EOD'
+"""
+
+_SELECT_STATE_SQL = f"""
+    SELECT {', '.join(STATE_COLUMNS)} FROM lab.backtest_state WHERE run_id = %s
+"""
+
+_SELECT_TRADES_SQL = """
+    SELECT symbol, side, qty, entry_ts, entry_price, exit_ts, exit_price, pnl, pnl_pct
+    FROM lab.trades
+    WHERE run_id = %s
+    ORDER BY exit_ts, trade_id
+"""
+
+# Дописывание ключей в lab.results.meta (существующие ключи перезаписываются)
+_MERGE_RESULT_META_SQL = """
+    UPDATE lab.results SET meta = COALESCE(meta, '{}'::jsonb) || %s::jsonb
+    WHERE run_id = %s
+"""
+
+
+def trade_records(run_id: str, trades: Sequence[Dict[str, Any]]) -> List[Tuple]:
+    """
+    Строки lab.trades для COPY (в порядке TRADE_COLUMNS)
+
+    run_id добавляется в meta каждой сделки. TradeLedger отдаёт строки
+    из своих колонок (TradeLedger.to_records()), без промежуточных dict.
+    """
+    if hasattr(trades, "to_records"):
+        return trades.to_records(run_id)
+    records = []
+    for trade in trades:
+        meta = {**(trade.get("meta") or {}), "run_id": run_id}
+        records.append((
+            run_id,
+            trade["strategy_id"],
+            trade["mode"],
+            trade["symbol"],
+            trade["side"],
+            float(trade["qty"]),
+            trade["entry_ts"],
+            float(trade["entry_price"]),
+            trade["exit_ts"],
+            _optional_float(trade["exit_price"]),
+            _optional_float(trade["pnl"]),
+            _optional_float(trade["pnl_pct"]),
+            json.dumps(meta, default=str),
+        ))
+    return records
+
+
+def result_record(results: Dict[str, Any]) -> Tuple:
+    """
+    Строка lab.results (в порядке RESULT_COLUMNS); доп. метрики уходят в meta
+
+    results["meta"] (если есть) дописывается в meta как есть (JSON-сериализуемый dict).
+    """
+    meta_data = {
+        "initial_capital": float(results.get("initial_capital", 0)),
+        "final_capital": float(results.get("final_capital", 0)),
+        "total_trades": int(results.get("total_trades", 0)),
+        "avg_hold_time_hours": float(results.get("avg_hold_time_hours", 0)),
+        **(results.get("meta") or {})
+    }
+    return (
+        results["run_id"],
+        results["strategy_id"],
+        results["start_ts"],
+        results["end_ts"],
+        float(results["pnl_total"]),
+        float(results["sharpe"]),
+        float(results["sortino"]),
+        float(results["max_dd"]),
+        float(results["calmar"]),
+        float(results["win_rate"]),
+        float(results["profit_factor"]),
+        bool(results["pass_risk_gate"]),
+        psycopg2.extras.Json(meta_data),
+    )
+
+
+def state_record(state: Dict[str, Any]) -> Tuple:
+    """
+    Строка lab.backtest_state (в порядке STATE_COLUMNS)
+
+    JSON-поля сериализуются строкой (timestamp — ISO), equity curve —
+    float64 little-endian в BYTEA.
+    """
+    return (
+        state["run_id"],
+        state["strategy_id"],
+        state["strategy_class"],
+        state["symbol"],
+        _json(state["params"]),
+        state["start_ts"],
+        state["last_ts"],
+        float(state["balance"]),
+        _json(state["open_position"]),
+        np.ascontiguousarray(state["equity"], dtype="<f8").tobytes(),
+        _json(state["trade_stats"]),
+        _json(state["config"]),
+    )
+
+
+def decode_state(row: Sequence[Any]) -> Dict[str, Any]:
+    """Состояние из строки lab.backtest_state (обратное state_record())"""
+    state = dict(zip(STATE_COLUMNS, row))
+    for key in ("params", "open_position", "trade_stats", "config"):
+        if isinstance(state[key], (str, bytes)):
+            state[key] = json.loads(state[key])
+    state["equity"] = np.frombuffer(bytes(state["equity"]), dtype="<f8").copy()
+    state["start_ts"] = pd.Timestamp(state["start_ts"])
+    state["last_ts"] = pd.Timestamp(state["last_ts"])
+    position = state["open_position"]
+    if position is not None:
+        position["entry_ts"] = pd.Timestamp(position["entry_ts"])
+    return state
+
+
+def load_state(db_url: str, run_id: str) -> Optional[Dict[str, Any]]:
+    """Сохранённое состояние прогона (None — не сохранялось)"""
+    with psycopg2.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(_SELECT_STATE_SQL, (run_id,))
+            row = cur.fetchone()
+    return decode_state(row) if row is not None else None
+
+
+def load_trades(db_url: str, run_id: str) -> pd.DataFrame:
+    """Сделки прогона из lab.trades в порядке закрытия"""
+    with psycopg2.connect(db_url) as conn:
+        return pd.read_sql(_SELECT_TRADES_SQL, conn, params=(run_id,))
+
+
+def load_result(db_url: str, run_id: str) -> Optional[Dict[str, Any]]:
+    """Строка lab.results прогона (None — прогон не сохранялся)"""
+    with psycopg2.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {', '.join(RESULT_COLUMNS)} FROM lab.results WHERE run_id = %s",
+                (run_id,)
+            )
+            row = cur.fetchone()
+    return dict(zip(RESULT_COLUMNS, row)) if row is not None else None
+
+
+def merge_result_meta(db_url: str, run_id: str, meta: Dict[str, Any]) -> bool:
+    """
+    Дописать ключи meta в lab.results.meta прогона
+
+    Returns:
+        False, если строки прогона в lab.results нет
+    """
+    with psycopg2.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(_MERGE_RESULT_META_SQL, (_json(meta), run_id))
+            return cur.rowcount > 0
+
+
+def trades_to_csv(records: Sequence[Tuple]) -> io.StringIO:
+    """
+    CSV-буфер для COPY FROM STDIN
+
+    None пишется пустым полем без кавычек (NULL в FORMAT csv),
+    timestamp — в ISO-формате с таймзоной.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for record in records:
+        writer.writerow([_csv_value(v) for v in record])
+    buffer.seek(0)
+    return buffer
+
+
+class ResultWriter:
+    """
+    Запись трейдов и результатов прогонов в lab.trades / lab.results
+
+    Пример (sweep):
+        with ResultWriter(db_url, buffer_runs=500) as writer:
+            for ...:
+                writer.add(run_id, backtester.trades, results)
+        # оставшиеся прогоны сбрасываются при выходе из with
+
+    Attributes:
+        buffer_runs: Автоматический flush() после стольких прогонов (0 — только вручную)
+    """
+
+    def __init__(self, db_url: str, buffer_runs: int = 0):
+        """
+        Args:
+            db_url: PostgreSQL connection string
+            buffer_runs: Размер буфера в прогонах (0 — без автоматического сброса)
+        """
+        self.db_url = db_url
+        self.buffer_runs = buffer_runs
+        self._trades: List[Tuple] = []
+        self._results: List[Tuple] = []
+        self._states: List[Tuple] = []
+        self._resumed: List[str] = []
+
+    def __len__(self) -> int:
+        """Количество прогонов в буфере"""
+        return len(self._results)
+
+    def add(
+        self,
+        run_id: str,
+        trades: Sequence[Dict[str, Any]],
+        results: Dict[str, Any],
+        state: Optional[Dict[str, Any]] = None,
+        resumed: bool = False
+    ):
+        """
+        Добавление прогона в буфер (с автоматическим flush при заполнении)
+
+        Args:
+            state: Состояние для lab.backtest_state (None — не сохранять)
+            resumed: Прогон продолжает run_id — прежняя EOD-сделка удаляется
+        """
+        if resumed:
+            self._resumed.append(run_id)
+        self._trades.extend(trade_records(run_id, trades))
+        self._results.append(result_record(results))
+        if state is not None:
+            self._states.append(state_record(state))
+        if self.buffer_runs and len(self._results) >= self.buffer_runs:
+            self.flush()
+
+    def write(
+        self,
+        run_id: str,
+        trades: Sequence[Dict[str, Any]],
+        results: Dict[str, Any],
+        state: Optional[Dict[str, Any]] = None,
+        resumed: bool = False
+    ):
+        """Немедленная запись одного прогона (вместе с уже накопленными)"""
+        self.add(run_id, trades, results, state, resumed)
+        self.flush()
+
+    def flush(self) -> int:
+        """
+        Запись буфера в БД одной транзакцией
+
+        Returns:
+            Количество записанных прогонов
+        """
+        if not self._results:
+            return 0
+
+        conn = psycopg2.connect(self.db_url)
+        try:
+            with conn.cursor() as cursor:
+                if self._resumed:
+                    cursor.execute(_DELETE_EOD_TRADES_SQL, (self._resumed,))
+                if self._trades:
+                    cursor.copy_expert(_COPY_TRADES_SQL, trades_to_csv(self._trades))
+                psycopg2.extras.execute_values(
+                    cursor, _UPSERT_RESULTS_SQL, self._results,
+                    page_size=max(len(self._results), 1)
+                )
+                if self._states:
+                    psycopg2.extras.execute_values(
+                        cursor, _UPSERT_STATE_SQL, self._states,
+                        page_size=len(self._states)
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        runs = len(self._results)
+        self._trades = []
+        self._results = []
+        self._states = []
+        self._resumed = []
+        return runs
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def jsonb_safe(value: Any) -> Any:
+    """
+    Копия value для JSONB: нефинитные float (profit_factor = inf, NaN)
+    заменяются строками "inf" / "-inf" / "nan" во вложенных dict/list
+    """
+    if isinstance(value, dict):
+        return {key: jsonb_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonb_safe(item) for item in value]
+    if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+        return str(float(value))
+    return value
+
+
+def _json(value: Any) -> Optional[str]:
+    # JSONB не принимает NaN/Infinity — нефинитные значения должны быть
+    # заменены заранее (jsonb_safe), иначе ValueError здесь, а не в Postgres
+    if value is None:
+        return None
+    return json.dumps(value, default=_json_default, allow_nan=False)
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
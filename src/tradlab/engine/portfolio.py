@@ -0,0 +1,396 @@
+"""
+Портфельный бэктестер для TradLab
+
+Одна стратегия торгует корзиной символов с общим балансом. Фичи всех
+символов загружаются одним запросом и выравниваются по общему индексу ts_4h
+в матрицы (бары × символы). Сигналы по всем ячейкам матрицы считаются одним
+пакетным вызовом стратегии, а цикл идёт по барам общей шкалы времени:
+SL/TP проверяются и нереализованный PnL считается векторно по строке
+символов, поэтому 20 символов — это один проход по матрице, а не 20 бэктестов.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .backtester_v1 import BacktesterV1
+from .feature_adapter_v1 import FeatureAdapterV1
+from .metrics import OnlineMetrics
+from .persistence import ResultWriter
+from .signal import SignalBatch, SIDE_LONG, SIDE_NONE, SIDE_SHORT
+from .strategy_abi import BaseStrategy
+
+
+def align_features(
+    features_df: pd.DataFrame,
+    symbols: Sequence[str],
+    columns: Optional[Sequence[str]] = None
+) -> Tuple[pd.DatetimeIndex, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Выравнивание фич в длинном формате по общему индексу ts_4h
+
+    Args:
+        features_df: Строки (ts_4h, symbol, фичи...) нескольких символов
+        symbols: Порядок колонок матриц
+        columns: Числовые колонки (None — все, кроме ts_4h и symbol)
+
+    Returns:
+        (ts — объединение баров всех символов,
+         rows, cols — позиция каждой строки features_df в матрице (-1 у
+         символов вне symbols),
+         {колонка: float64-матрица (бары × символы), NaN где у символа нет бара})
+    """
+    if columns is None:
+        columns = [c for c in features_df.columns if c not in ("ts_4h", "symbol")]
+    ts = pd.DatetimeIndex(features_df["ts_4h"].unique()).sort_values()
+    rows = ts.get_indexer(features_df["ts_4h"])
+    cols = pd.Index(list(symbols)).get_indexer(features_df["symbol"])
+    inside = cols >= 0
+
+    matrices = {}
+    for name in columns:
+        matrix = np.full((len(ts), len(symbols)), np.nan)
+        matrix[rows[inside], cols[inside]] = features_df[name].to_numpy(dtype=np.float64)[inside]
+        matrices[name] = matrix
+    return ts, rows, cols, matrices
+
+
+class PortfolioBacktester(BacktesterV1):
+    """
+    Бэктестер стратегии на корзине символов с общим капиталом
+
+    На каждом баре общей шкалы ts_4h:
+    1. Открытые позиции всех символов проверяются на SL/TP одной векторной
+       операцией по строке цен (символы без бара пропускаются);
+    2. Символы без позиции и с сигналом открываются по порядку symbols,
+       размер позиции — по текущему общему балансу (не больше max_positions
+       одновременно открытых позиций);
+    3. Equity = баланс + нереализованный PnL всех позиций по последней
+       известной цене символа.
+
+    Трейды, метрики, Risk Gate и запись в lab.trades / lab.results — как
+    у BacktesterV1 (в трейдах — символ позиции); разбивка PnL по символам
+    уходит в results["per_symbol"] и meta результата. С одним символом прогон
+    совпадает с BacktesterV1(mode="vectorized") бит-в-бит.
+
+    Стратегии с WARMUP_BARS > 0 (скользящие окна по барам) получают пакетный
+    расчёт сигналов отдельно по каждому символу, остальные — одним вызовом
+    по всем ячейкам матрицы.
+
+    run() принимает те же именованные параметры, что BacktesterV1.run().
+    Не поддерживаются (явная ошибка, а не молчаливое игнорирование):
+    result_cache / prune_margin, scores, save_state, resume() и run_stream().
+
+    Пример:
+        bt = PortfolioBacktester(db_url, STR100ChainFlowETH(),
+                                 symbols=["ETHUSDT", "BTCUSDT", "SOLUSDT"])
+        results = bt.run(start_date="2024-01-01", end_date="2024-12-31")
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        strategy: BaseStrategy,
+        symbols: Sequence[str],
+        initial_capital: float = 10000.0,
+        commission_rate: float = 0.0004,
+        slippage_bps: float = 5.0,
+        max_positions: Optional[int] = None,
+        feature_store: Optional[FeatureAdapterV1] = None,
+        result_writer: Optional[ResultWriter] = None,
+        online_metrics: Optional[OnlineMetrics] = None,
+        trade_meta: bool = True
+    ):
+        """
+        Args:
+            db_url: PostgreSQL connection string
+            strategy: Экземпляр стратегии (одна на всю корзину)
+            symbols: Торговые пары корзины (порядок = приоритет входа на баре)
+            initial_capital: Начальный общий капитал (USDT)
+            commission_rate: Комиссия биржи (в долях)
+            slippage_bps: Проскальзывание в базисных пунктах (bps)
+            max_positions: Лимит одновременно открытых позиций (None — по одной
+                на каждый символ)
+            feature_store, result_writer, online_metrics, trade_meta: Как у BacktesterV1
+                (result_cache и prune_margin портфельный прогон не поддерживает)
+        """
+        if not symbols:
+            raise ValueError("symbols не может быть пустым")
+        if len(set(symbols)) != len(symbols):
+            raise ValueError(f"Повторяющиеся символы: {list(symbols)}")
+        super().__init__(
+            db_url, strategy, initial_capital=initial_capital,
+            commission_rate=commission_rate, slippage_bps=slippage_bps,
+            mode="vectorized", feature_store=feature_store, result_writer=result_writer,
+            online_metrics=online_metrics, trade_meta=trade_meta
+        )
+        self.symbols = list(symbols)
+        self.max_positions = max_positions or len(self.symbols)
+        # Позиции по символам: колонки массивов = symbols
+        k = len(self.symbols)
+        self.position_side = np.zeros(k, dtype=np.int8)
+        self.position_qty = np.zeros(k)
+        self.position_entry = np.zeros(k)
+        self.position_sl = np.full(k, np.nan)
+        self.position_tp1 = np.full(k, np.nan)
+        self.position_commission = np.zeros(k)
+        self.position_bar = np.full(k, -1, dtype=np.int64)
+        self._position_ts: List[Any] = [None] * k
+        self._position_meta: List[Dict[str, Any]] = [{}] * k
+
+    def run(
+        self,
+        symbol: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        run_id: Optional[str] = None,
+        features_df: Optional[pd.DataFrame] = None,
+        persist: bool = True,
+        force: bool = False,
+        scores: Optional[Dict[str, np.ndarray]] = None,
+        save_state: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Запуск портфельного бэктеста (интерфейс BacktesterV1.run())
+
+        Args:
+            symbol: Для совместимости с BacktesterV1.run(): None или символ
+                корзины — торгуется всегда вся корзина symbols
+            start_date: Начальная дата (YYYY-MM-DD)
+            end_date: Конечная дата (YYYY-MM-DD)
+            run_id: Идентификатор прогона (генерируется автоматически если None)
+            features_df: Предзагруженные фичи в длинном формате (строки разных
+                символов); иначе — один запрос fetch_portfolio_features()
+            persist: Сохранять ли трейды и результаты в БД
+            force: Как у BacktesterV1 (кэша результатов у портфеля нет — ни на что не влияет)
+            scores: Не поддерживается (ValueError, если задан)
+            save_state: Не поддерживается (ValueError, если True)
+
+        Returns:
+            Dict с результатами как у BacktesterV1.run() плюс:
+                - symbols: Символы корзины
+                - per_symbol: {symbol: {"pnl_total", "total_trades", "win_rate"}}
+        """
+        if symbol is not None and symbol not in self.symbols:
+            raise ValueError(f"Символ {symbol} не входит в корзину {self.symbols}")
+        if scores is not None:
+            raise ValueError("PortfolioBacktester не поддерживает предрасчитанные scores")
+        if save_state:
+            raise ValueError("PortfolioBacktester не поддерживает save_state (resume)")
+
+        if run_id is None:
+            run_id = f"{self.strategy.strategy_id}_PF_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+        if features_df is None:
+            print(f"[PortfolioBacktester] Загрузка данных ({len(self.symbols)} символов)...")
+            features_df = self.feature_adapter.fetch_portfolio_features(
+                self.symbols, start_date=start_date, end_date=end_date
+            )
+        features_df = features_df[features_df["symbol"].isin(self.symbols)]
+        if features_df.empty:
+            raise ValueError(f"Нет данных для {self.symbols} в указанном периоде")
+
+        features_df = self.feature_adapter.prepare_features_for_strategy(
+            features_df.sort_values(["ts_4h", "symbol"], kind="stable").reset_index(drop=True)
+        )
+        print(f"[PortfolioBacktester] Загружено {len(features_df)} строк.")
+
+        print(f"[PortfolioBacktester] Запуск прогона стратегии...")
+        self._run_portfolio(features_df)
+
+        results = self._build_results(features_df, run_id)
+        results["symbols"] = list(self.symbols)
+        results["per_symbol"] = self._per_symbol_stats()
+        results["meta"] = {
+            **results.get("meta", {}),
+            "symbols": list(self.symbols),
+            "per_symbol": results["per_symbol"],
+        }
+
+        if persist:
+            self._save_to_db(run_id, results)
+
+        self._print_summary(results)
+        return results
+
+    def resume(self, *args, **kwargs):
+        raise NotImplementedError("PortfolioBacktester не поддерживает resume()")
+
+    def run_stream(self, *args, **kwargs):
+        raise NotImplementedError("PortfolioBacktester не поддерживает run_stream()")
+
+    def signal_batch(self, features_df: pd.DataFrame) -> Optional[SignalBatch]:
+        """
+        Пакет сигналов по всем строкам features_df (длинный формат)
+
+        Для стратегий с WARMUP_BARS > 0 пакет собирается из расчётов по
+        каждому символу отдельно (окна не смешивают символы).
+
+        Returns:
+            SignalBatch, выровненный по строкам features_df, или None, если
+            стратегия не поддерживает пакетный режим
+        """
+        if not self.strategy.WARMUP_BARS:
+            return self.strategy.generate_signals_batch(features_df)
+
+        n = len(features_df)
+        combined = None
+        for symbol, rows in features_df.groupby("symbol", sort=False).indices.items():
+            batch = self.strategy.generate_signals_batch(features_df.iloc[rows])
+            if batch is None:
+                return None
+            if combined is None:
+                combined = SignalBatch(
+                    strategy_id=batch.strategy_id,
+                    symbol=batch.symbol,
+                    side=np.full(n, SIDE_NONE, dtype=np.int8),
+                    master=np.full(n, np.nan),
+                    entry=np.full(n, np.nan),
+                    sl=np.full(n, np.nan),
+                    tp1=np.full(n, np.nan),
+                    tp2=np.full(n, np.nan),
+                    meta={key: np.full(n, np.nan) for key in batch.meta},
+                    valid_for=batch.valid_for
+                )
+            for name in ("side", "master", "entry", "sl", "tp1", "tp2"):
+                getattr(combined, name)[rows] = getattr(batch, name)
+            for key, values in batch.meta.items():
+                combined.meta[key][rows] = values
+        return combined
+
+    def _run_portfolio(self, features_df: pd.DataFrame):
+        """Один проход по общей шкале ts_4h (строки матрицы бары × символы)"""
+        ts, rows, cols, matrices = align_features(features_df, self.symbols, ["close_4h"])
+        close = matrices["close_4h"]
+        n, k = close.shape
+        bar_ts = ts.tolist()
+
+        # cell[t, j] — строка features_df (и индекс пакета) бара t символа j
+        cell = np.full((n, k), -1, dtype=np.int64)
+        cell[rows, cols] = np.arange(len(features_df))
+
+        batch = self.signal_batch(features_df)
+        side = np.zeros((n, k), dtype=np.int8)
+        if batch is not None:
+            side[rows, cols] = batch.side
+        else:
+            side[rows, cols] = SIDE_LONG  # кандидаты: сигнал считается generate_signal()
+            columns, values = features_df.columns, features_df.to_numpy(dtype=object)
+
+        equity = np.empty(n + 1, dtype=np.float64)
+        equity[0] = self.initial_capital
+        last_price = np.full(k, np.nan)
+
+        with np.errstate(invalid="ignore"):
+            for t in range(n):
+                price = close[t]
+                present = ~np.isnan(price)
+                last_price = np.where(present, price, last_price)
+
+                # 1. SL/TP по всем открытым позициям сразу
+                long_ = self.position_side == SIDE_LONG
+                short_ = self.position_side == SIDE_SHORT
+                hit_sl = (long_ & (price <= self.position_sl)) | (short_ & (price >= self.position_sl))
+                hit_tp = (long_ & (price >= self.position_tp1)) | (short_ & (price <= self.position_tp1))
+                for j in np.flatnonzero(present & (hit_sl | hit_tp)):
+                    self._close_symbol(j, price[j], bar_ts[t], "SL" if hit_sl[j] else "TP1", t + 1)
+
+                # 2. Входы по сигналам (общий баланс, порядок symbols)
+                for j in np.flatnonzero((side[t] != SIDE_NONE) & (self.position_side == SIDE_NONE)):
+                    if np.count_nonzero(self.position_side) >= self.max_positions:
+                        break
+                    i = cell[t, j]
+                    if batch is not None:
+                        signal = self.strategy.signal_from_batch(
+                            batch, i, bar_ts[t], self.balance, self.symbols[j]
+                        )
+                    else:
+                        row = pd.Series(values[i], index=columns, name=i)
+                        signal = self.strategy.generate_signal(row, self.balance)
+                    if signal:
+                        self._open_symbol(j, signal, price[j], bar_ts[t], t + 1)
+
+                # 3. Equity: баланс + нереализованный PnL по последним ценам
+                unrealized = np.where(
+                    self.position_side == SIDE_LONG,
+                    self.position_qty * (last_price - self.position_entry),
+                    np.where(
+                        self.position_side == SIDE_SHORT,
+                        self.position_qty * (self.position_entry - last_price),
+                        0.0
+                    )
+                )
+                equity[t + 1] = self.balance + unrealized.sum()
+                if self.online_metrics is not None:
+                    self.online_metrics.update_equity(equity[t + 1])
+
+        self.equity_curve = equity
+
+        # Закрытие открытых позиций в конце периода (по последней цене символа)
+        for j in np.flatnonzero(self.position_side):
+            self._close_symbol(j, last_price[j], bar_ts[-1], "EOD", n)
+
+    def _open_symbol(self, j: int, signal, entry_price: float, entry_ts, entry_bar: int = -1):
+        """Открытие позиции символа j (как BacktesterV1._open_position_at)"""
+        if signal.side == "LONG":
+            entry_price *= (1 + self.slippage_bps / 10000)
+        else:
+            entry_price *= (1 - self.slippage_bps / 10000)
+
+        commission = signal.size * entry_price * self.commission_rate
+
+        self.position_side[j] = SIDE_LONG if signal.side == "LONG" else SIDE_SHORT
+        self.position_qty[j] = signal.size
+        self.position_entry[j] = entry_price
+        self.position_sl[j] = np.nan if signal.sl is None else signal.sl
+        self.position_tp1[j] = np.nan if signal.tp1 is None else signal.tp1
+        self.position_commission[j] = commission
+        self.position_bar[j] = entry_bar
+        self._position_ts[j] = entry_ts
+        self._position_meta[j] = signal.meta
+
+        self.balance -= commission
+
+    def _close_symbol(self, j: int, exit_price: float, exit_ts, exit_reason: str, exit_bar: int = -1):
+        """Закрытие позиции символа j (как BacktesterV1._close_position_at)"""
+        self.open_position = {
+            "side": "LONG" if self.position_side[j] == SIDE_LONG else "SHORT",
+            "entry_ts": self._position_ts[j],
+            "entry_bar": int(self.position_bar[j]),
+            "entry_price": float(self.position_entry[j]),
+            "qty": float(self.position_qty[j]),
+            "commission_entry": float(self.position_commission[j]),
+            "meta": self._position_meta[j],
+        }
+        self._close_position_at(float(exit_price), exit_ts, self.symbols[j], exit_reason, exit_bar)
+
+        self.position_side[j] = SIDE_NONE
+        self.position_qty[j] = 0.0
+        self.position_entry[j] = 0.0
+        self.position_sl[j] = self.position_tp1[j] = np.nan
+        self.position_commission[j] = 0.0
+        self.position_bar[j] = -1
+        self._position_ts[j] = None
+        self._position_meta[j] = {}
+
+    def _per_symbol_stats(self) -> Dict[str, Dict[str, float]]:
+        """PnL, число сделок и win rate по символам (по колонкам журнала сделок)"""
+        codes = self.trades.column("symbol")
+        pnl = self.trades.column("pnl")
+        stats = {}
+        for symbol in self.symbols:
+            if symbol in self.trades.symbols:
+                values = pnl[codes == self.trades.symbols.index(symbol)]
+            else:
+                values = pnl[:0]
+            count = len(values)
+            stats[symbol] = {
+                # cumsum — последовательная сумма, как sum() по сделкам
+                "pnl_total": float(np.cumsum(values)[-1]) if count else 0.0,
+                "total_trades": count,
+                "win_rate": float(np.count_nonzero(values > 0) / count * 100) if count else 0.0,
+            }
+        return stats
@@ -0,0 +1,183 @@
+"""
+Кэш результатов бэктестов для TradLab
+
+Ключ — sha256 от (класс стратегии, params, symbol, start/end, капитал,
+комиссия, проскальзывание, fingerprint фич). Fingerprint фич — число баров,
+max(ts_4h) и хэш содержимого колонок, поэтому изменение данных в окне
+всегда даёт новый ключ. Записи хранятся в lab.result_cache и дополнительно
+удаляются триггерами на market.ohlcv (миграция 20251126_006).
+"""
+
+import hashlib
+import json
+import weakref
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import psycopg2.extras
+
+
+def features_fingerprint(features_df: pd.DataFrame) -> str:
+    """
+    Fingerprint фич: "<бары>:<max ts_4h>:<sha256 содержимого[:16]>"
+
+    Хэшируются ts_4h (int64 ns UTC) и все числовые колонки (float64)
+    в отсортированном по имени порядке.
+    """
+    digest = hashlib.sha256()
+    max_ts = None
+    for column in sorted(features_df.columns):
+        if column == "symbol":
+            continue
+        if column == "ts_4h":
+            ts = pd.DatetimeIndex(pd.to_datetime(features_df[column], utc=True)).as_unit("ns")
+            values = ts.asi8
+            max_ts = ts.max().isoformat() if len(ts) else None
+        else:
+            values = features_df[column].to_numpy(dtype=np.float64)
+        digest.update(column.encode("utf-8"))
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return f"{len(features_df)}:{max_ts}:{digest.hexdigest()[:16]}"
+
+
+class ResultCache:
+    """
+    Кэш метрик прогонов BacktesterV1 в lab.result_cache
+
+    Пример:
+        cache = ResultCache(db_url)
+        bt = BacktesterV1(db_url, strategy, result_cache=cache)
+        bt.run("ETHUSDT", "2024-01-01", "2024-03-31")              # прогон + запись
+        bt.run("ETHUSDT", "2024-01-01", "2024-03-31")              # мгновенный hit
+        bt.run("ETHUSDT", "2024-01-01", "2024-03-31", force=True)  # мимо кэша
+    """
+
+    def __init__(self, db_url: str):
+        """
+        Args:
+            db_url: PostgreSQL connection string
+        """
+        self.db_url = db_url
+        # Fingerprint последнего DataFrame (в sweep одни и те же фичи на все точки)
+        self._last_fingerprint = (None, None)
+
+    def fingerprint(self, features_df: pd.DataFrame) -> str:
+        """features_fingerprint() с запоминанием для последнего DataFrame"""
+        ref, value = self._last_fingerprint
+        if ref is not None and ref() is features_df:
+            return value
+        value = features_fingerprint(features_df)
+        self._last_fingerprint = (weakref.ref(features_df), value)
+        return value
+
+    @staticmethod
+    def make_key(
+        strategy,
+        symbol: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        initial_capital: float,
+        commission_rate: float,
+        slippage_bps: float,
+        fingerprint: str
+    ) -> str:
+        """Стабильный ключ кэша (sha256 от канонического JSON)"""
+        payload = {
+            "strategy": f"{type(strategy).__module__}.{type(strategy).__qualname__}",
+            "strategy_id": strategy.strategy_id,
+            "params": strategy.params,
+            "symbol": symbol,
+            "start": start_date,
+            "end": end_date,
+            "initial_capital": float(initial_capital),
+            "commission_rate": float(commission_rate),
+            "slippage_bps": float(slippage_bps),
+            "fingerprint": fingerprint,
+        }
+        canonical = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Сохранённые результаты по ключу (None — промах)"""
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT results FROM lab.result_cache WHERE cache_key = %s",
+                    (cache_key,)
+                )
+                row = cur.fetchone()
+
+        if row is None:
+            return None
+
+        results = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+        for key, value in results.items():
+            if key in ("start_ts", "end_ts") and value is not None:
+                results[key] = pd.Timestamp(value)
+            elif value in _NON_FINITE:
+                results[key] = float(value)
+        return results
+
+    def put(
+        self,
+        cache_key: str,
+        strategy,
+        symbol: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        fingerprint: str,
+        results: Dict[str, Any]
+    ):
+        """Запись (или замена) результатов по ключу"""
+        # JSONB не принимает NaN/Infinity (profit_factor = inf) — храним строкой
+        payload = {
+            key: str(value) if isinstance(value, float) and not np.isfinite(value) else value
+            for key, value in results.items()
+        }
+        payload = json.loads(json.dumps(payload, default=_json_default))
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO lab.result_cache (
+                        cache_key, strategy_id, symbol, start_ts, end_ts,
+                        params, fingerprint, results
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        results = EXCLUDED.results,
+                        created_at = now()
+                """, (
+                    cache_key,
+                    strategy.strategy_id,
+                    symbol,
+                    start_date,
+                    end_date,
+                    psycopg2.extras.Json(json.loads(json.dumps(strategy.params, default=str))),
+                    fingerprint,
+                    psycopg2.extras.Json(payload),
+                ))
+
+    def invalidate(self, symbol: Optional[str] = None) -> int:
+        """Ручная очистка кэша (всего или по символу); возвращает число удалённых записей"""
+        query = "DELETE FROM lab.result_cache"
+        params = []
+        if symbol:
+            query += " WHERE symbol = %s"
+            params.append(symbol)
+
+        with psycopg2.connect(self.db_url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.rowcount
+
+
+_NON_FINITE = ("inf", "-inf", "nan")
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
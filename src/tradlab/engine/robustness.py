@@ -0,0 +1,179 @@
+"""
+Bootstrap / Monte Carlo анализ устойчивости прогона для TradLab
+
+Список сделок прогона (из lab.trades или из памяти) превращается в
+матрицу из тысяч пересэмплированных (bootstrap с возвращением) или
+перемешанных (shuffle) последовательностей PnL. Кривые капитала всех
+последовательностей строятся одним cumsum по матрице, метрики — одним
+вызовом MetricsCalculator.batch_metrics() / batch_trade_metrics().
+Перцентили метрик сохраняются в lab.results.meta["robustness"].
+
+Profit factor последовательности без убыточных сделок бесконечен; для
+перцентилей он ограничивается PROFIT_FACTOR_CAP, чтобы такие выборки не
+выпадали из распределения. Неопределённые значения (NaN) отбрасываются,
+их число по метрикам возвращается в "dropped". В lab.results.meta
+нефинитные значения пишутся строками (JSONB не принимает NaN/Infinity).
+
+Кривые строятся по сделкам (точка на закрытие каждой сделки), поэтому
+Sharpe/Sortino распределения сравниваются с "observed" — той же метрикой
+исходного порядка сделок, а не с барной метрикой из lab.results.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from .metrics import MetricsCalculator
+from .persistence import jsonb_safe, load_result, load_trades, merge_result_meta
+
+
+METHODS = ("bootstrap", "shuffle")
+PERCENTILES = (5, 25, 50, 75, 95)
+METRICS = ("sharpe", "sortino", "max_dd", "calmar", "win_rate", "profit_factor")
+PROFIT_FACTOR_CAP = 100.0
+
+
+def resample_pnl(
+    pnl: Sequence[float],
+    n_samples: int = 10_000,
+    method: str = "bootstrap",
+    seed: Optional[int] = None
+) -> np.ndarray:
+    """
+    Матрица пересэмплированных последовательностей PnL
+
+    Args:
+        pnl: PnL сделок в порядке закрытия
+        n_samples: Число последовательностей
+        method: "bootstrap" — выборка с возвращением (меняется и состав сделок),
+            "shuffle" — перестановка (меняется только порядок)
+        seed: Seed генератора
+
+    Returns:
+        float64-матрица (n_samples × число сделок)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid method: {method}. Must be one of {METHODS}")
+    pnl = np.asarray(pnl, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    if method == "bootstrap":
+        return pnl[rng.integers(0, len(pnl), size=(n_samples, len(pnl)))]
+    return rng.permuted(np.tile(pnl, (n_samples, 1)), axis=1)
+
+
+def equity_paths(samples: np.ndarray, initial_capital: float) -> np.ndarray:
+    """Кривые капитала (строка = initial_capital, затем капитал после каждой сделки)"""
+    equity = np.empty((samples.shape[0], samples.shape[1] + 1), dtype=np.float64)
+    equity[:, 0] = initial_capital
+    np.cumsum(samples, axis=1, out=equity[:, 1:])
+    equity[:, 1:] += initial_capital
+    return equity
+
+
+def path_metrics(samples: np.ndarray, initial_capital: float) -> Dict[str, np.ndarray]:
+    """Метрики каждой строки матрицы PnL одним векторным проходом"""
+    metrics = MetricsCalculator.batch_metrics(equity_paths(samples, initial_capital))
+    n_samples, n_trades = samples.shape
+    metrics["win_rate"], metrics["profit_factor"] = MetricsCalculator.batch_trade_metrics(
+        np.repeat(np.arange(n_samples), n_trades), samples.ravel(), n_samples
+    )
+    return metrics
+
+
+def robustness(
+    pnl: Sequence[float],
+    initial_capital: float = 10000.0,
+    n_samples: int = 10_000,
+    method: str = "bootstrap",
+    seed: Optional[int] = None,
+    percentiles: Sequence[float] = PERCENTILES
+) -> Dict[str, Any]:
+    """
+    Распределения метрик по пересэмплированным последовательностям сделок
+
+    Args:
+        pnl: PnL сделок в порядке закрытия (None/NaN — открытые, пропускаются)
+        initial_capital: Начальный капитал прогона
+        n_samples: Число последовательностей
+        method: "bootstrap" или "shuffle"
+        seed: Seed генератора
+        percentiles: Перцентили распределений
+
+    Returns:
+        {"method", "n_samples", "n_trades", "seed",
+         "observed": {метрика: значение для исходного порядка сделок},
+         "percentiles": {метрика: {"p5": ..., "p50": ..., ...}},
+         "dropped": {метрика: число выборок с NaN (только ненулевые)}}
+    """
+    pnl = np.asarray([np.nan if p is None else p for p in pnl], dtype=np.float64)
+    pnl = pnl[~np.isnan(pnl)]
+    if len(pnl) == 0:
+        raise ValueError("Нет закрытых сделок для анализа")
+
+    observed = path_metrics(pnl[None, :], initial_capital)
+    metrics = path_metrics(resample_pnl(pnl, n_samples, method, seed), initial_capital)
+
+    table = {}
+    dropped = {}
+    for name in METRICS:
+        values = metrics[name]
+        if name == "profit_factor":
+            # Без убыточных сделок PF = inf: выборка остаётся на верхней границе
+            values = np.minimum(values, PROFIT_FACTOR_CAP)
+        defined = values[~np.isnan(values)]
+        if len(defined) < len(values):
+            dropped[name] = int(len(values) - len(defined))
+        quantiles = np.percentile(defined, percentiles) if len(defined) else [np.nan] * len(percentiles)
+        table[name] = {f"p{p:g}": float(q) for p, q in zip(percentiles, quantiles)}
+
+    return {
+        "method": method,
+        "n_samples": int(n_samples),
+        "n_trades": int(len(pnl)),
+        "seed": seed,
+        "observed": {name: float(observed[name][0]) for name in METRICS},
+        "percentiles": table,
+        "dropped": dropped,
+    }
+
+
+def analyze_run(
+    db_url: str,
+    run_id: str,
+    n_samples: int = 10_000,
+    method: str = "bootstrap",
+    seed: Optional[int] = None,
+    persist: bool = True
+) -> Dict[str, Any]:
+    """
+    Анализ устойчивости сохранённого прогона
+
+    Сделки читаются из lab.trades, начальный капитал — из
+    lab.results.meta.initial_capital; результат дописывается в
+    lab.results.meta["robustness"] (при persist).
+
+    Args:
+        db_url: PostgreSQL connection string
+        run_id: Идентификатор прогона
+        n_samples: Число последовательностей
+        method: "bootstrap" или "shuffle"
+        seed: Seed генератора
+        persist: Сохранить перцентили в lab.results.meta
+
+    Returns:
+        Результат robustness() с добавленным run_id (нефинитные значения
+        остаются float; в meta они пишутся строками)
+    """
+    result = load_result(db_url, run_id)
+    if result is None:
+        raise ValueError(f"Прогон {run_id} не найден в lab.results")
+    initial_capital = float((result["meta"] or {}).get("initial_capital") or 10000.0)
+
+    trades = load_trades(db_url, run_id)
+    summary = {"run_id": run_id, **robustness(
+        trades["pnl"].to_numpy(dtype=np.float64), initial_capital, n_samples, method, seed
+    )}
+
+    if persist:
+        merge_result_meta(db_url, run_id, {"robustness": jsonb_safe(summary)})
+    return summary
@@ -1,6 +1,15 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict
+
+import numpy as np
+import pandas as pd
+
+
+# Коды направления в колоночных массивах SignalBatch.side
+SIDE_NONE = 0
+SIDE_LONG = 1
+SIDE_SHORT = -1
 
 
 @dataclass
@@ -59,3 +68,67 @@ class Signal:
             "valid_until": self.valid_until.isoformat() if self.valid_until else None,
             "meta": self.meta
         }
+
+
+@dataclass
+class SignalBatch:
+    """
+    Пакет сигналов стратегии по всем барам сразу (колоночный формат)
+    
+    Возвращается BaseStrategy.generate_signals_batch(). Содержит всё, что
+    является чистой функцией строки фич; размер позиции (зависит от баланса)
+    досчитывается в цикле бэктестера через BaseStrategy.signal_from_batch().
+    
+    Attributes:
+        strategy_id: ID стратегии
+        symbol: Торговая пара
+        side: int8-массив направлений (SIDE_LONG, SIDE_SHORT, SIDE_NONE)
+        master: Master score по каждому бару
+        entry: Цена входа (close_4h) по каждому бару
+        sl: Цена Stop-Loss (NaN где нет сигнала)
+        tp1: Цена Take-Profit 1 (NaN где нет сигнала)
+        tp2: Цена Take-Profit 2 (NaN где нет сигнала)
+        meta: Колонки для Signal.meta (имя ключа -> массив)
+        valid_for: Срок действия сигнала от ts бара (None — без ограничения)
+    """
+    strategy_id: str
+    symbol: str
+    side: np.ndarray
+    master: np.ndarray
+    entry: np.ndarray
+    sl: np.ndarray
+    tp1: np.ndarray
+    tp2: np.ndarray
+    meta: Dict[str, np.ndarray] = field(default_factory=dict)
+    valid_for: Optional[pd.Timedelta] = None
+    
+    def __len__(self) -> int:
+        return len(self.side)
+    
+    def signal_at(self, i: int, ts: datetime, size: float, symbol: Optional[str] = None) -> Signal:
+        """
+        Сборка Signal для бара i
+        
+        Args:
+            i: Индекс бара
+            ts: Timestamp бара
+            size: Размер позиции (посчитан по текущему балансу)
+            symbol: Торговая пара (None — self.symbol); пакет портфельного
+                бэктестера покрывает несколько символов сразу
+        
+        Returns:
+            Signal объект
+        """
+        return Signal(
+            strategy_id=self.strategy_id,
+            ts=ts,
+            symbol=symbol or self.symbol,
+            side="LONG" if self.side[i] == SIDE_LONG else "SHORT",
+            size=size,
+            sl=float(self.sl[i]),
+            tp1=float(self.tp1[i]),
+            tp2=float(self.tp2[i]),
+            tsl=None,
+            valid_until=ts + self.valid_for if self.valid_for is not None else None,
+            meta={key: float(values[i]) for key, values in self.meta.items()}
+        )
@@ -3,7 +3,7 @@ import pandas as pd
 import logging
 from typing import Optional
 from ..strategy_abi import BaseStrategy
-from ..signal import Signal
+from ..signal import Signal, SignalBatch, SIDE_LONG, SIDE_SHORT, SIDE_NONE
 
 
 class STR100ChainFlowETH(BaseStrategy):
@@ -41,6 +41,9 @@ class STR100ChainFlowETH(BaseStrategy):
         "slippage_bps": 5
     }
     
+    # Params that compute_scores_batch() depends on (score cache key)
+    SCORE_PARAMS = ("atr_expansion_multiplier", "volume_collapse_multiplier")
+    
     # Exchange constraints for position sizing
     EXCHANGE_CONSTRAINTS = {
         'min_lot_size': 0.001,
@@ -117,7 +120,7 @@ class STR100ChainFlowETH(BaseStrategy):
         signal = Signal(
             strategy_id=self.strategy_id,
             ts=features["ts_4h"],
-            symbol="ETHUSDT",
+            symbol=features.get("symbol", "ETHUSDT"),
             side=side,
             size=size,
             sl=sl,
@@ -134,6 +137,160 @@ class STR100ChainFlowETH(BaseStrategy):
         
         return signal
     
+    def generate_signals_batch(self, features: pd.DataFrame) -> SignalBatch:
+        """
+        Vectorized signal generation over all bars at once
+        
+        Mirrors generate_signal() element-wise (same operations in the same
+        order), so every bar yields bit-identical master/SL/TP values.
+        Position sizing depends on balance and is done in signal_from_batch().
+        
+        Args:
+            features: DataFrame with feature rows
+        
+        Returns:
+            SignalBatch with side/master/SL/TP1/TP2 columns
+        """
+        batch = self.signals_from_scores(self.compute_scores_batch(features))
+        if "symbol" in features.columns and len(features):
+            batch.symbol = str(features["symbol"].iloc[0])
+        return batch
+    
+    def compute_scores_batch(self, features: pd.DataFrame) -> dict:
+        """
+        Threshold-independent part of generate_signals_batch()
+        
+        Scores and veto flags depend only on the feature rows and SCORE_PARAMS
+        (veto multipliers), so a sweep over thresholds / SL / TP can compute
+        them once per period and reuse them via signals_from_scores().
+        
+        Returns:
+            Dict of arrays: close, atr, price_score, volume_score, master, veto
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            close = features["close_4h"].to_numpy(dtype=np.float64)
+            atr = self._column(features, "atr_14_1h", 50.0)
+            
+            price_score = self._price_score_batch(features, close, atr)
+            volume_score = self._volume_score_batch(features)
+            master = price_score * 0.60 + volume_score * 0.40
+            
+            veto = self._atr_veto_batch(features, atr) | self._volume_veto_batch(features)
+        
+        return {
+            "close": close,
+            "atr": atr,
+            "price_score": price_score,
+            "volume_score": volume_score,
+            "master": master,
+            "veto": veto,
+        }
+    
+    def signals_from_scores(self, scores: dict) -> SignalBatch:
+        """
+        Cheap per-parameter-set part: thresholds -> side, then SL/TP
+        
+        Args:
+            scores: Output of compute_scores_batch() (not modified)
+        
+        Returns:
+            SignalBatch identical to generate_signals_batch() on the same features
+        """
+        close = scores["close"]
+        atr = scores["atr"]
+        master = scores["master"]
+        veto = scores["veto"]
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            long_mask = ~veto & (master > self.params["master_long_threshold"])
+            short_mask = ~veto & ~long_mask & (master < self.params["master_short_threshold"])
+            side = np.full(len(close), SIDE_NONE, dtype=np.int8)
+            side[long_mask] = SIDE_LONG
+            side[short_mask] = SIDE_SHORT
+            
+            sl = self._sl_batch(close, atr, side, master)
+            tp1, tp2 = self._tp_batch(close, atr, side)
+        
+        return SignalBatch(
+            strategy_id=self.strategy_id,
+            symbol="ETHUSDT",
+            side=side,
+            master=master,
+            entry=close,
+            sl=sl,
+            tp1=tp1,
+            tp2=tp2,
+            meta={
+                "master_signal": master,
+                "price_score": scores["price_score"],
+                "volume_score": scores["volume_score"]
+            },
+            valid_for=pd.Timedelta(hours=4)
+        )
+    
+    def size_position(self, account_balance: float, entry_price: float, sl: float) -> float:
+        """Balance-dependent sizing for the batch path"""
+        return self._calculate_position_size_safe(account_balance, entry_price, sl)
+    
+    # ===== BATCH (VECTORIZED) HELPERS =====
+    
+    @staticmethod
+    def _column(features: pd.DataFrame, name: str, fallback) -> np.ndarray:
+        """Column as float64 array; scalar/array fallback when the column is missing"""
+        if name in features.columns:
+            return features[name].to_numpy(dtype=np.float64)
+        if isinstance(fallback, np.ndarray):
+            return fallback
+        return np.full(len(features), fallback, dtype=np.float64)
+    
+    def _price_score_batch(self, features: pd.DataFrame, close: np.ndarray, atr: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_price_score"""
+        sma = self._column(features, "sma_50_4h", close)
+        distance = (close - sma) / atr
+        return np.tanh(distance / 2) * 100
+    
+    def _volume_score_batch(self, features: pd.DataFrame) -> np.ndarray:
+        """Vectorized _calculate_volume_score_l1"""
+        volume = features["volume_4h"].to_numpy(dtype=np.float64)
+        avg_volume = self._column(features, "avg_volume_20", volume)
+        volume_ratio = volume / avg_volume
+        return np.clip((volume_ratio - 1) * 100, -100, 100)
+    
+    def _atr_veto_batch(self, features: pd.DataFrame, atr: np.ndarray) -> np.ndarray:
+        """Vectorized _atr_veto (boolean mask)"""
+        atr_ma = self._column(features, "atr_ma_50_1h", atr)
+        return atr > atr_ma * self.params["atr_expansion_multiplier"]
+    
+    def _volume_veto_batch(self, features: pd.DataFrame) -> np.ndarray:
+        """Vectorized _volume_veto (boolean mask)"""
+        volume = features["volume_4h"].to_numpy(dtype=np.float64)
+        avg_volume = self._column(features, "avg_volume_20", volume)
+        return volume < avg_volume * self.params["volume_collapse_multiplier"]
+    
+    def _sl_batch(self, entry: np.ndarray, atr: np.ndarray, side: np.ndarray, master: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_sl (NaN where there is no signal)"""
+        k_sl_min = self.params["k_sl_min"]
+        k_sl_max = self.params["k_sl_max"]
+        k_sl = k_sl_max - (np.abs(master) / 100) * (k_sl_max - k_sl_min)
+        
+        sl = np.full(len(entry), np.nan)
+        sl = np.where(side == SIDE_LONG, entry - (atr * k_sl), sl)
+        sl = np.where(side == SIDE_SHORT, entry + (atr * k_sl), sl)
+        return sl
+    
+    def _tp_batch(self, entry: np.ndarray, atr: np.ndarray, side: np.ndarray) -> tuple:
+        """Vectorized _calculate_tp (NaN where there is no signal)"""
+        k_tp1 = self.params["k_tp1"]
+        k_tp2 = self.params["k_tp2"]
+        
+        tp1 = np.full(len(entry), np.nan)
+        tp2 = np.full(len(entry), np.nan)
+        tp1 = np.where(side == SIDE_LONG, entry + (atr * k_tp1), tp1)
+        tp2 = np.where(side == SIDE_LONG, entry + (atr * k_tp2), tp2)
+        tp1 = np.where(side == SIDE_SHORT, entry - (atr * k_tp1), tp1)
+        tp2 = np.where(side == SIDE_SHORT, entry - (atr * k_tp2), tp2)
+        return tp1, tp2
+    
     # ===== SCORE FUNCTIONS =====
     
     def _calculate_price_score(self, features: pd.Series) -> float:
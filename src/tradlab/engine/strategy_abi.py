@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
-from typing import Optional, Dict, Any, List
-from .signal import Signal
+from typing import Optional, Dict, Any, List, Tuple
+from .signal import Signal, SignalBatch, SIDE_NONE
 
 
 class BaseStrategy(ABC):
@@ -11,11 +12,25 @@ class BaseStrategy(ABC):
     Все стратегии должны наследоваться от этого класса и реализовывать
     метод generate_signal().
     
+    Опционально стратегия может реализовать generate_signals_batch() —
+    расчёт сигналов сразу по всем барам — и size_position(). Тогда
+    бэктестер (mode="vectorized") и live-бот используют пакетный путь.
+    Пакетный путь можно разбить на compute_scores_batch() (зависит только от
+    фич и SCORE_PARAMS) и signals_from_scores() (пороги, SL/TP) — тогда
+    sweep переиспользует score-массивы между точками сетки.
+    
     Attributes:
         strategy_id: Уникальный идентификатор стратегии
         params: Словарь параметров стратегии
+        SCORE_PARAMS: Параметры, от которых зависит compute_scores_batch()
+        WARMUP_BARS: Сколько предыдущих баров нужно пакетным сигналам бара
+            (скользящие окна внутри стратегии); при потоковом прогоне
+            BacktesterV1.run_stream() столько строк переносится между чанками
     """
     
+    SCORE_PARAMS: Tuple[str, ...] = ()
+    WARMUP_BARS: int = 0
+    
     def __init__(self, strategy_id: str, params: Dict[str, Any]):
         """
         Инициализация стратегии
@@ -49,6 +64,94 @@ class BaseStrategy(ABC):
         """
         raise NotImplementedError("Subclass must implement generate_signal()")
     
+    def generate_signals_batch(self, features: pd.DataFrame) -> Optional[SignalBatch]:
+        """
+        Пакетная генерация сигналов по всем барам
+        
+        Считает всё, что не зависит от баланса: master score, направление,
+        SL, TP1, TP2. Размер позиции считается позже в signal_from_batch().
+        
+        Args:
+            features: DataFrame с фичами (строки из lab.features_v1)
+        
+        Returns:
+            SignalBatch или None, если стратегия не поддерживает пакетный режим
+        """
+        return None
+    
+    def compute_scores_batch(self, features: pd.DataFrame) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Часть generate_signals_batch(), не зависящая от порогов и SL/TP
+        
+        Переопределяется вместе с signals_from_scores() и SCORE_PARAMS:
+        результат зависит только от фич и параметров из SCORE_PARAMS, поэтому
+        sweep может посчитать его один раз на период и переиспользовать.
+        
+        Args:
+            features: DataFrame с фичами
+        
+        Returns:
+            Словарь массивов (формат определяет стратегия) или None
+        """
+        return None
+    
+    def signals_from_scores(self, scores: Dict[str, np.ndarray]) -> SignalBatch:
+        """
+        SignalBatch из предрасчитанных compute_scores_batch() массивов
+        
+        Raises:
+            NotImplementedError: Должен быть реализован вместе с compute_scores_batch()
+        """
+        raise NotImplementedError("Subclass must implement signals_from_scores() for cached scores")
+    
+    def score_key(self) -> tuple:
+        """Значения SCORE_PARAMS — ключ кэша compute_scores_batch()"""
+        return tuple((name, self.params[name]) for name in self.SCORE_PARAMS)
+    
+    def size_position(self, account_balance: float, entry_price: float, sl: float) -> float:
+        """
+        Расчёт размера позиции для пакетного пути
+        
+        Args:
+            account_balance: Текущий баланс счёта (USDT)
+            entry_price: Цена входа
+            sl: Цена Stop-Loss
+        
+        Returns:
+            Размер позиции (в базовой валюте)
+        
+        Raises:
+            NotImplementedError: Должен быть реализован вместе с generate_signals_batch()
+        """
+        raise NotImplementedError("Subclass must implement size_position() for batch signals")
+    
+    def signal_from_batch(
+        self,
+        batch: SignalBatch,
+        i: int,
+        ts,
+        account_balance: float,
+        symbol: Optional[str] = None
+    ) -> Optional[Signal]:
+        """
+        Сигнал для бара i из пакета с размером по текущему балансу
+        
+        Args:
+            batch: Результат generate_signals_batch()
+            i: Индекс бара
+            ts: Timestamp бара
+            account_balance: Текущий баланс счёта (USDT)
+            symbol: Торговая пара сигнала (None — batch.symbol)
+        
+        Returns:
+            Signal объект или None (если на баре нет сигнала)
+        """
+        if batch.side[i] == SIDE_NONE:
+            return None
+        
+        size = self.size_position(account_balance, float(batch.entry[i]), float(batch.sl[i]))
+        return batch.signal_at(i, ts, size, symbol)
+    
     def _validate_params(self):
         """
         Валидация параметров стратегии
@@ -0,0 +1,227 @@
+"""
+Walk-forward оптимизация для TradLab
+
+Одна длинная история фич загружается один раз; скользящие окна
+in-sample / out-of-sample задаются срезами строк этой истории (views поверх
+одного блока shared memory, без повторных запросов и копий). На каждом
+in-sample окне перебирается сетка параметров, победитель прогоняется на
+следующем out-of-sample окне, OOS equity curves склеиваются в одну.
+
+In-sample прогоны всех окон идут одним пулом процессов GridSweep. OOS-окна
+прогоняются последовательно: каждое стартует с initial_capital, равным
+капиталу на конец предыдущего OOS-окна, поэтому склеенная кривая верна при
+любом способе расчёта размера позиции (фиксированный объём, минимальный лот,
+комиссии), а не только при строго пропорциональном капиталу. Результат
+OOS-прогона победителя каждого окна пишется в lab.results (и трейды —
+в lab.trades) с meta.wf_group_id — идентификатором группы walk-forward.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .metrics import MetricsCalculator
+from .optimizer import GridSweep, rank_points
+
+
+class WalkForward(GridSweep):
+    """
+    Walk-forward оптимизация параметров стратегии
+
+    Пример:
+        wf = WalkForward(db_url, STR100ChainFlowETH, PARAM_GRID, FIXED_PARAMS,
+                         train_bars=540, test_bars=180)
+        summary = wf.run(start="2023-01-01", end="2024-12-31")
+        wf.oos_equity      # склеенная OOS equity curve (индекс — ts_4h)
+        wf.oos_metrics     # Sharpe / MaxDD / PnL склеенной кривой
+
+    Attributes:
+        train_bars: Длина in-sample окна (бары 4h)
+        test_bars: Длина out-of-sample окна (бары 4h)
+        step_bars: Сдвиг окон (по умолчанию test_bars — OOS окна стыкуются)
+        anchored: In-sample окно растёт от начала истории вместо скольжения
+        metric: Колонка sweep-таблицы для выбора победителя (больше — лучше)
+        group_id: Идентификатор группы walk-forward (meta.wf_group_id в lab.results)
+    """
+
+    def __init__(
+        self,
+        *args,
+        train_bars: int = 540,
+        test_bars: int = 180,
+        step_bars: Optional[int] = None,
+        anchored: bool = False,
+        metric: str = "sharpe",
+        group_id: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            *args, **kwargs: Параметры GridSweep
+            train_bars: Длина in-sample окна (по умолчанию 540 баров ≈ 90 дней)
+            test_bars: Длина out-of-sample окна (по умолчанию 180 баров ≈ 30 дней)
+            step_bars: Сдвиг окон (None — test_bars)
+            anchored: Расширяющееся in-sample окно (от начала истории)
+            metric: Метрика выбора победителя in-sample
+            group_id: Идентификатор группы (генерируется, если None)
+        """
+        super().__init__(*args, **kwargs)
+        if train_bars <= 0 or test_bars <= 0:
+            raise ValueError("train_bars и test_bars должны быть > 0")
+        self.train_bars = train_bars
+        self.test_bars = test_bars
+        self.step_bars = step_bars or test_bars
+        self.anchored = anchored
+        self.metric = metric
+        self.group_id = group_id or (
+            f"WF_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        )
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.oos_equity = pd.Series(dtype=np.float64)
+        self.oos_metrics: Dict[str, float] = {}
+
+    def windows(self, n_bars: int) -> List[Tuple[int, int, int, int]]:
+        """
+        Границы окон в барах истории
+
+        Returns:
+            [(is_start, is_stop, oos_start, oos_stop)], is_stop == oos_start
+        """
+        bounds = []
+        start = 0
+        while start + self.train_bars + self.test_bars <= n_bars:
+            is_stop = start + self.train_bars
+            bounds.append((0 if self.anchored else start, is_stop, is_stop, is_stop + self.test_bars))
+            start += self.step_bars
+        return bounds
+
+    def run(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        features: Optional[pd.DataFrame] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> pd.DataFrame:
+        """
+        Walk-forward по истории [start, end]
+
+        Args:
+            start: Начало истории (YYYY-MM-DD)
+            end: Конец истории (YYYY-MM-DD)
+            features: Предзагруженная история фич (иначе один запрос к БД)
+            progress: Колбэк progress(done, total) для прогонов каждой фазы
+
+        Returns:
+            DataFrame по окнам: границы, параметры победителя, in-sample метрика,
+            капитал на старте OOS-окна (oos_capital) и OOS-метрики победителя
+            (pnl_pct — от oos_capital)
+        """
+        if features is None:
+            features = self.load_features({"history": {"start": start, "end": end}})["history"]
+        history = {"history": features}
+        ts = features["ts_4h"]
+
+        bounds = self.windows(len(features))
+        if not bounds:
+            raise ValueError(
+                f"История из {len(features)} баров короче одного окна "
+                f"({self.train_bars} + {self.test_bars})"
+            )
+        print(f"[WalkForward] {self.group_id}: {len(bounds)} окон "
+              f"({self.train_bars} IS / {self.test_bars} OOS баров)")
+
+        # 1. Перебор сетки на всех in-sample окнах (одним пулом, без записи в БД)
+        is_views = {f"is_{i:03d}": ("history", a, b) for i, (a, b, _, _) in enumerate(bounds)}
+        persist = self.persist
+        self.persist = False
+        try:
+            self.tables = GridSweep.run(
+                self, {key: {} for key in is_views}, features=history,
+                progress=progress, windows=is_views
+            )
+        finally:
+            self.persist = persist
+
+        # 2. Победитель каждого окна
+        tasks, views, windows = [], {}, []
+        for i, (a, b, c, d) in enumerate(bounds):
+            table = self.tables[f"is_{i:03d}"]
+            if table.empty:
+                print(f"    ⚠️  Окно {i}: нет успешных in-sample прогонов, пропущено")
+                continue
+            best = rank_points(table, self.metric).head(1)
+            point = best[list(self.param_grid)].to_dict("records")[0]
+            key = f"oos_{i:03d}"
+            views[key] = ("history", c, d)
+            tasks.append((key, point))
+            windows.append({
+                "window": i,
+                "is_start": ts.iloc[a],
+                "is_end": ts.iloc[b - 1],
+                "oos_start": ts.iloc[c],
+                "oos_end": ts.iloc[d - 1],
+                f"is_{self.metric}": float(best[self.metric].iloc[0]),
+            })
+            self.run_meta[key] = {
+                "wf_group_id": self.group_id,
+                "wf_window": i,
+                "wf_params": point,
+                **{k: (v.isoformat() if hasattr(v, "isoformat") else v)
+                   for k, v in windows[-1].items() if k != "window"},
+            }
+
+        # 3. Победители на out-of-sample окнах (запись в lab.results) и склейка
+        #    OOS equity curves. Окна зависят друг от друга — каждое стартует
+        #    с капитала на конец предыдущего, поэтому идут по одному в текущем
+        #    процессе. Досрочная остановка только для in-sample — OOS-кривые
+        #    склеиваются целиком
+        rows, pieces = [], []
+        initial_capital, max_workers, prune_margin = (
+            self.initial_capital, self.max_workers, self.prune_margin
+        )
+        self.return_equity, self.max_workers, self.prune_margin = True, 1, None
+        capital = initial_capital
+        try:
+            for n, ((key, point), window) in enumerate(zip(tasks, windows), 1):
+                self.initial_capital = capital
+                outcome = self.execute_tasks(history, {key: views[key]}, [(key, point)])[0]
+                if progress:
+                    progress(n, len(tasks))
+                if outcome is None:
+                    continue
+                _, c, d = views[key]
+                # Последняя точка кривой — mark-to-market до закрытия позиции
+                # в конце окна (EOD); её заменяет капитал после закрытия
+                # с проскальзыванием и комиссией, с него стартует следующее окно
+                curve = outcome.pop("equity_curve").copy()
+                curve[-1] = outcome["final_capital"]
+                pieces.append(pd.Series(curve[1:], index=pd.DatetimeIndex(ts.iloc[c:d])))
+                rows.append({**window, "oos_capital": capital, **self.result_row(point, outcome)})
+                capital = float(outcome["final_capital"])
+        finally:
+            self.initial_capital, self.max_workers, self.prune_margin = (
+                initial_capital, max_workers, prune_margin
+            )
+            self.return_equity = False
+            self.run_meta = {}
+
+        self.oos_equity = pd.concat(pieces) if pieces else pd.Series(dtype=np.float64)
+        self.oos_metrics = self._equity_metrics(self.oos_equity)
+        print(f"[WalkForward] OOS: Sharpe={self.oos_metrics['sharpe']:.2f}, "
+              f"PnL={self.oos_metrics['pnl_total']:.2f}, MaxDD={self.oos_metrics['max_dd']:.2f}%")
+        return pd.DataFrame(rows)
+
+    def _equity_metrics(self, equity: pd.Series) -> Dict[str, float]:
+        """Метрики склеенной equity curve (как в BacktesterV1._calculate_metrics)"""
+        if equity.empty:
+            return {"sharpe": 0.0, "max_dd": 0.0, "pnl_total": 0.0}
+        curve = pd.concat([pd.Series([self.initial_capital]), equity.reset_index(drop=True)],
+                          ignore_index=True)
+        return {
+            "sharpe": MetricsCalculator.calculate_sharpe(curve.pct_change().dropna()),
+            "max_dd": MetricsCalculator.calculate_max_drawdown(curve),
+            "pnl_total": float(curve.iloc[-1] - self.initial_capital),
+        }
@@ -168,6 +168,29 @@ class BinanceConnector:
                     logger.error(f"❌ Ошибка размещения ордера: {e}")
                     raise
     
+    @staticmethod
+    def fill_price(order: Optional[Dict]) -> Optional[float]:
+        """
+        Средняя цена исполнения ордера из ответа create_order
+        
+        Args:
+            order: Ответ биржи (executedQty / cummulativeQuoteQty или fills)
+        
+        Returns:
+            Цена или None, если в ответе нет данных об исполнении
+        """
+        if not order:
+            return None
+        executed = float(order.get('executedQty') or 0)
+        quote = float(order.get('cummulativeQuoteQty') or 0)
+        if executed > 0 and quote > 0:
+            return quote / executed
+        fills = order.get('fills') or []
+        qty = sum(float(f['qty']) for f in fills)
+        if qty > 0:
+            return sum(float(f['price']) * float(f['qty']) for f in fills) / qty
+        return None
+    
     def place_limit_order(self, symbol: str, side: str, quantity: float, price: float) -> Optional[Dict]:
         """
         Разместить лимитный ордер
@@ -0,0 +1,129 @@
+"""
+Общие фикстуры тестов: синтетические фичи, офлайн-бэктестер и фейковая БД
+"""
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import psycopg2.extras
+import pytest
+
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.strategies import STR100ChainFlowETH
+
+
+def synthetic_features(bars: int = 600, seed: int = 42) -> pd.DataFrame:
+    """Синтетические 4h-фичи в формате lab.features_v1"""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range("2024-01-01", periods=bars, freq="4h", tz="UTC")
+    close = 2000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.015, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0.0, 0.008, bars)) * close
+    volume = rng.lognormal(10.0, 0.5, bars)
+    close_s = pd.Series(close)
+    return pd.DataFrame({
+        "symbol": "ETHUSDT",
+        "ts_4h": ts,
+        "open_4h": open_,
+        "high_4h": np.maximum(open_, close) + spread,
+        "low_4h": np.minimum(open_, close) - spread,
+        "close_4h": close,
+        "volume_4h": volume,
+        "close_1h": close,
+        "atr_14_1h": pd.Series(spread).rolling(14, min_periods=1).mean().to_numpy() / 2,
+        "sma_50_4h": close_s.rolling(50, min_periods=1).mean().to_numpy(),
+        "avg_volume_20": pd.Series(volume).rolling(20, min_periods=1).mean().to_numpy(),
+    })
+
+
+@pytest.fixture
+def make_features():
+    """Фабрика синтетических фич: make_features(bars=600, seed=42)"""
+    return synthetic_features
+
+
+@pytest.fixture
+def make_offline_backtester(monkeypatch):
+    """Фабрика BacktesterV1 без БД: фичи подставляются, сохранение отключено"""
+
+    def make(features: pd.DataFrame, **kwargs) -> BacktesterV1:
+        bt = BacktesterV1(db_url="postgresql://offline", strategy=STR100ChainFlowETH(), **kwargs)
+        monkeypatch.setattr(bt.feature_adapter, "fetch_features", lambda **_: features.copy())
+        monkeypatch.setattr(bt, "_save_to_db", lambda run_id, results, *args, **kwargs: None)
+        return bt
+
+    return make
+
+
+class DBLog(list):
+    """
+    Лог команд фейковой БД
+
+    Attributes:
+        inserted: rowcount следующего INSERT
+        fail: Исключение, которое бросит следующий COPY (None — без ошибки)
+    """
+    inserted = 0
+    fail = None
+
+
+class FakeCursor:
+    def __init__(self, log: DBLog):
+        self.log = log
+        self.rowcount = -1
+
+    def copy_expert(self, sql, buffer):
+        if self.log.fail is not None:
+            raise self.log.fail
+        self.log.append(("copy", sql, buffer.read()))
+
+    def execute(self, sql, params=None):
+        self.log.append(("execute", " ".join(sql.split()), params))
+        if sql.lstrip().startswith("INSERT"):
+            self.rowcount = self.log.inserted
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, log: DBLog):
+        self.log = log
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append(("commit",))
+
+    def rollback(self):
+        self.log.append(("rollback",))
+
+    def close(self):
+        self.log.append(("close",))
+
+
+@pytest.fixture
+def db_log(monkeypatch):
+    """
+    Фейковая БД вместо psycopg2: лог выполненных команд
+
+    Каждый connect() пишет ("connect",); execute_values — ("upsert", ...)
+    или ("upsert_state", ...) для lab.backtest_state.
+    """
+    log = DBLog()
+
+    def connect(db_url):
+        log.append(("connect",))
+        return FakeConnection(log)
+
+    def execute_values(cursor, sql, rows, page_size=100):
+        kind = "upsert_state" if "lab.backtest_state" in sql else "upsert"
+        log.append((kind, sql, list(rows)))
+
+    monkeypatch.setattr(psycopg2, "connect", connect)
+    monkeypatch.setattr(psycopg2.extras, "execute_values", execute_values)
+    return log
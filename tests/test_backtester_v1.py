@@ -8,7 +8,11 @@ Unit-тесты для MetricsCalculator и BacktesterV1
 import pytest
 import pandas as pd
 import numpy as np
-from tradlab.engine.metrics import MetricsCalculator
+from tradlab.engine.metrics import MetricsCalculator, OnlineMetrics
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.feature_adapter_v1 import carry_warmup
+from tradlab.engine.persistence import decode_state, state_record
+from tradlab.engine.strategies import STR100ChainFlowETH
 
 
 class TestMetricsCalculator:
@@ -216,6 +220,118 @@ class TestMetricsCalculator:
         assert profit_factor == 0.0, "Profit Factor должен быть 0 когда нет сделок"
 
 
+class TestBatchMetrics:
+    """Пакетный API MetricsCalculator совпадает с расчётом по одной серии"""
+    
+    @staticmethod
+    def make_curves(seed: int = 0):
+        """Кривые разной длины (в т.ч. > 128 точек, константная и короткие)"""
+        rng = np.random.default_rng(seed)
+        lengths = [1, 2, 3, 9, 129, 300, 300, 1000, 1000, 50]
+        curves = [10000.0 * np.cumprod(1 + rng.normal(0.0005, 0.01, n)) for n in lengths]
+        curves[-1] = np.full(50, 10000.0)
+        equity = np.full((len(curves), max(lengths)), np.nan)
+        for i, curve in enumerate(curves):
+            equity[i, :len(curve)] = curve
+        return curves, equity
+    
+    def test_batch_metrics_match_series(self):
+        """Sharpe / Sortino / MaxDD / Calmar — бит-в-бит с calculate_*()"""
+        curves, equity = self.make_curves()
+        batch = MetricsCalculator.batch_metrics(equity)
+        
+        for i, curve in enumerate(curves):
+            series = pd.Series(curve)
+            returns = series.pct_change().dropna()
+            total_return = (curve[-1] - curve[0]) / curve[0] * 100
+            max_dd = MetricsCalculator.calculate_max_drawdown(series)
+            assert batch["sharpe"][i] == MetricsCalculator.calculate_sharpe(returns)
+            assert batch["sortino"][i] == MetricsCalculator.calculate_sortino(returns)
+            assert batch["max_dd"][i] == max_dd
+            assert batch["calmar"][i] == MetricsCalculator.calculate_calmar(total_return, max_dd)
+    
+    def test_batch_metrics_match_backtests(self, make_features, make_offline_backtester):
+        """Метрики прогонов BacktesterV1 воспроизводятся по матрице их equity curves"""
+        runs = []
+        for seed in (1, 2, 3):
+            bt = make_offline_backtester(make_features(bars=400 + seed, seed=seed))
+            runs.append((bt, bt.run(start_date="2024-01-01", end_date="2024-12-31")))
+        
+        equity = np.full((len(runs), 404), np.nan)
+        for i, (bt, _) in enumerate(runs):
+            equity[i, :len(bt.equity_curve)] = bt.equity_curve
+        total_return = [(r["pnl_total"] / r["initial_capital"]) * 100 for _, r in runs]
+        batch = MetricsCalculator.batch_metrics(equity, total_return=total_return)
+        
+        run_index = np.concatenate([np.full(len(bt.trades), i) for i, (bt, _) in enumerate(runs)])
+        pnl = np.array([t["pnl"] for bt, _ in runs for t in bt.trades])
+        win_rate, profit_factor = MetricsCalculator.batch_trade_metrics(run_index, pnl, len(runs))
+        
+        for i, (_, results) in enumerate(runs):
+            for key in ("sharpe", "sortino", "max_dd", "calmar"):
+                assert batch[key][i] == results[key]
+            assert win_rate[i] == results["win_rate"]
+            assert profit_factor[i] == results["profit_factor"]
+    
+    def test_batch_trade_metrics_edge_cases(self):
+        """Открытые сделки, прогоны без сделок, без убытков и без прибыли"""
+        run_index = np.array([0, 0, 0, 1, 1, 3, 3])
+        pnl = np.array([10.0, -4.0, np.nan, 5.0, 2.5, -1.0, -2.0])
+        win_rate, profit_factor = MetricsCalculator.batch_trade_metrics(run_index, pnl, 4)
+        
+        trades = [[{"pnl": p if not np.isnan(p) else None} for r, p in zip(run_index, pnl) if r == i]
+                  for i in range(4)]
+        assert win_rate.tolist() == [MetricsCalculator.calculate_win_rate(t) for t in trades]
+        assert profit_factor.tolist() == [MetricsCalculator.calculate_profit_factor(t) for t in trades]
+
+
+class TestOnlineMetrics:
+    """OnlineMetrics совпадает с MetricsCalculator по всей истории"""
+    
+    def test_matches_full_recompute(self):
+        rng = np.random.default_rng(3)
+        curve = 10000.0 * np.cumprod(1 + rng.normal(0.0005, 0.01, 500))
+        pnls = rng.normal(5.0, 50.0, 40).tolist() + [None]
+        
+        online = OnlineMetrics(initial_equity=10000.0)
+        for value in curve:
+            online.update_equity(value)
+        for pnl in pnls:
+            online.update_trade(pnl)
+        
+        series = pd.Series(np.concatenate([[10000.0], curve]))
+        returns = series.pct_change().dropna()
+        trades = [{"pnl": pnl} for pnl in pnls]
+        assert online.sharpe == pytest.approx(MetricsCalculator.calculate_sharpe(returns), rel=1e-9)
+        assert online.sortino == pytest.approx(MetricsCalculator.calculate_sortino(returns), rel=1e-9)
+        assert online.max_dd == MetricsCalculator.calculate_max_drawdown(series)
+        assert online.win_rate == MetricsCalculator.calculate_win_rate(trades)
+        assert online.profit_factor == MetricsCalculator.calculate_profit_factor(trades)
+    
+    def test_empty_and_first_point(self):
+        online = OnlineMetrics()
+        assert online.snapshot()["sharpe"] == 0.0
+        online.update_equity(500.0)
+        online.update_equity(510.0)
+        assert online.initial_equity == 500.0
+        assert online.total_return == pytest.approx(2.0)
+        assert online.sharpe == 0.0 and online.max_dd == 0.0
+    
+    @pytest.mark.parametrize("mode", ["loop", "vectorized"])
+    def test_fed_by_backtester(self, mode, make_features, make_offline_backtester):
+        """Бэктестер обновляет накопитель на каждом баре и каждой сделке"""
+        online = OnlineMetrics(initial_equity=10000.0)
+        bt = make_offline_backtester(make_features(), mode=mode, online_metrics=online)
+        results = bt.run(start_date="2024-01-01", end_date="2024-12-31")
+        
+        assert online.n_returns == len(bt.equity_curve) - 1
+        assert online.closed_trades == results["total_trades"]
+        assert online.sharpe == pytest.approx(results["sharpe"], rel=1e-9)
+        assert online.max_dd == results["max_dd"]
+        assert online.win_rate == results["win_rate"]
+        assert online.profit_factor == results["profit_factor"]
+
+
 class TestBacktesterV1Integration:
     """
     Интеграционные тесты для BacktesterV1
@@ -237,6 +353,159 @@ class TestBacktesterV1Integration:
         pass
 
 
+class TestBacktesterV1Modes:
+    """Тесты режимов прогона BacktesterV1 на синтетических данных (без БД)"""
+    
+    def test_vectorized_matches_loop(self, make_features, make_offline_backtester):
+        """Режим vectorized даёт те же трейды, equity и метрики, что и loop"""
+        features = make_features()
+        
+        bt_loop = make_offline_backtester(features, mode="loop")
+        bt_vec = make_offline_backtester(features, mode="vectorized")
+        
+        res_loop = bt_loop.run(run_id="loop")
+        res_vec = bt_vec.run(run_id="vec")
+        
+        assert len(bt_loop.trades) > 0, "Синтетические данные должны давать сделки"
+        assert bt_vec.trades == bt_loop.trades
+        assert np.array_equal(np.asarray(bt_vec.equity_curve), np.asarray(bt_loop.equity_curve))
+        assert bt_vec.balance == bt_loop.balance
+        
+        for key in ("pnl_total", "sharpe", "sortino", "max_dd", "calmar",
+                    "win_rate", "profit_factor", "total_trades",
+                    "avg_hold_time_hours", "pass_risk_gate"):
+            assert res_vec[key] == res_loop[key], key
+    
+    def test_vectorized_equity_curve_preallocated(self, make_features, make_offline_backtester):
+        """Equity curve в режиме vectorized — float64-массив длины bars + 1"""
+        features = make_features(bars=120)
+        bt = make_offline_backtester(features, mode="vectorized")
+        bt.run(run_id="vec")
+        
+        assert isinstance(bt.equity_curve, np.ndarray)
+        assert bt.equity_curve.dtype == np.float64
+        assert len(bt.equity_curve) == len(features) + 1
+        assert bt.equity_curve[0] == bt.initial_capital
+    
+    @pytest.mark.parametrize("mode", ["loop", "vectorized"])
+    def test_prune_on_drawdown(self, mode, make_features, make_offline_backtester):
+        """Прогон останавливается на баре, где просадка превысила порог Risk Gate + запас"""
+        features = make_features()
+        bt = make_offline_backtester(features, mode=mode, prune_margin=-19.0)
+        results = bt.run(run_id="pruned")
+        
+        assert results["status"] == "pruned"
+        assert results["end_ts"] == bt.pruned_at
+        assert results["meta"]["status"] == "pruned"
+        assert results["max_dd"] > 1.0
+        assert len(bt.equity_curve) < len(features) + 1
+        assert bt.open_position is None
+        assert all(t["exit_ts"] <= bt.pruned_at for t in bt.trades)
+    
+    def test_prune_modes_match(self, make_features, make_offline_backtester):
+        """Досрочная остановка одинакова в loop и vectorized; без срабатывания — полный прогон"""
+        features = make_features()
+        runs = {}
+        for mode in ("loop", "vectorized"):
+            for margin in (-19.0, 1000.0, None):
+                bt = make_offline_backtester(features, mode=mode, prune_margin=margin)
+                runs[mode, margin] = (bt.run(run_id="r"), bt)
+        
+        for margin in (-19.0, 1000.0):
+            res_loop, bt_loop = runs["loop", margin]
+            res_vec, bt_vec = runs["vectorized", margin]
+            assert bt_vec.trades == bt_loop.trades
+            assert np.array_equal(np.asarray(bt_vec.equity_curve), np.asarray(bt_loop.equity_curve))
+            assert res_vec["sharpe"] == res_loop["sharpe"]
+        
+        full, _ = runs["vectorized", None]
+        relaxed, _ = runs["vectorized", 1000.0]
+        assert relaxed["status"] == full["status"] == "completed"
+        assert relaxed["pnl_total"] == full["pnl_total"]
+    
+    @pytest.mark.parametrize("mode", ["loop", "vectorized"])
+    def test_resume_matches_full_run(self, monkeypatch, mode, make_features, make_offline_backtester):
+        """Прогон до бара 400 + resume() по новым барам = полный прогон по 600 барам"""
+        features = make_features(bars=600)
+        saved = {}
+        
+        bt_head = make_offline_backtester(features.iloc[:400].copy(), mode=mode)
+        monkeypatch.setattr(bt_head, "_save_to_db",
+                            lambda run_id, results, state=None, resumed=False: saved.update(state=state))
+        bt_head.run(run_id="inc", save_state=True)
+        # Состояние проходит сериализацию lab.backtest_state
+        state = decode_state(state_record(saved["state"]))
+        assert state["last_ts"] == features["ts_4h"].iloc[399]
+        
+        bt_resume = make_offline_backtester(features, mode=mode)
+        monkeypatch.setattr("tradlab.engine.backtester_v1.load_state", lambda db_url, run_id: state)
+        results = bt_resume.resume("inc", persist=False)
+        
+        bt_full = make_offline_backtester(features, mode=mode)
+        expected = bt_full.run(run_id="inc", persist=False)
+        
+        assert np.array_equal(np.asarray(bt_resume.equity_curve), np.asarray(bt_full.equity_curve))
+        assert bt_resume.balance == bt_full.balance
+        for key in ("start_ts", "end_ts", "pnl_total", "sharpe", "sortino", "max_dd", "calmar",
+                    "win_rate", "profit_factor", "total_trades", "avg_hold_time_hours"):
+            assert results[key] == expected[key], key
+    
+    def test_resume_without_new_bars(self, monkeypatch, make_features, make_offline_backtester):
+        """Без новых баров resume() возвращает None"""
+        features = make_features(bars=200)
+        saved = {}
+        bt = make_offline_backtester(features, mode="vectorized")
+        monkeypatch.setattr(bt, "_save_to_db",
+                            lambda run_id, results, state=None, resumed=False: saved.update(state=state))
+        bt.run(run_id="inc", save_state=True)
+        
+        monkeypatch.setattr("tradlab.engine.backtester_v1.load_state",
+                            lambda db_url, run_id: decode_state(state_record(saved["state"])))
+        assert make_offline_backtester(features, mode="vectorized").resume("inc") is None
+    
+    def test_carry_warmup(self, make_features):
+        """Каждый чанк, кроме первого, начинается с хвоста предыдущих данных"""
+        features = make_features(bars=25)
+        slices = (features.iloc[i:i + 10] for i in range(0, 25, 10))
+        chunks = list(carry_warmup(slices, warmup=3))
+        
+        assert [(len(chunk), carried) for chunk, carried in chunks] == [(10, 0), (13, 3), (8, 3)]
+        assert chunks[1][0]["ts_4h"].iloc[0] == features["ts_4h"].iloc[7]
+        rebuilt = pd.concat([chunk.iloc[carried:] for chunk, carried in chunks], ignore_index=True)
+        pd.testing.assert_frame_equal(rebuilt, features)
+    
+    @pytest.mark.parametrize("mode", ["loop", "vectorized"])
+    @pytest.mark.parametrize("warmup", [0, 5])
+    def test_stream_matches_full_run(self, monkeypatch, mode, warmup, make_features, make_offline_backtester):
+        """Потоковый прогон чанками даёт те же трейды, equity и метрики, что и run()"""
+        features = make_features(bars=600)
+        
+        bt_full = make_offline_backtester(features, mode=mode)
+        expected = bt_full.run(run_id="full")
+        
+        bt = make_offline_backtester(features, mode=mode)
+        bt.strategy.WARMUP_BARS = warmup
+        monkeypatch.setattr(
+            bt.feature_adapter, "iter_feature_chunks",
+            lambda chunk_size, warmup, **_: carry_warmup(
+                (features.iloc[i:i + chunk_size].copy() for i in range(0, len(features), chunk_size)),
+                warmup
+            )
+        )
+        results = bt.run_stream(run_id="stream", chunk_size=97)
+        
+        assert bt.trades == bt_full.trades
+        assert np.array_equal(np.asarray(bt.equity_curve), np.asarray(bt_full.equity_curve))
+        for key in ("start_ts", "end_ts", "pnl_total", "sharpe", "sortino", "max_dd", "calmar",
+                    "win_rate", "profit_factor", "total_trades", "avg_hold_time_hours"):
+            assert results[key] == expected[key], key
+    
+    def test_invalid_mode(self):
+        """Неизвестный режим отклоняется при создании"""
+        with pytest.raises(ValueError):
+            BacktesterV1(db_url="postgresql://offline", strategy=STR100ChainFlowETH(), mode="turbo")
+
+
 if __name__ == "__main__":
     # Запуск тестов
     pytest.main([__file__, "-v"])
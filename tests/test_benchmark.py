@@ -0,0 +1,48 @@
+"""
+Тесты для генератора синтетических данных и бенчмарка бэктестера
+
+Прогоны идут на маленьких синтетических историях без БД.
+"""
+
+import numpy as np
+
+from benchmarks.bench_backtest import STAGES, build_report, compare, run_case
+from tradlab.demo_data import generate_demo_features, generate_demo_ohlcv_frame
+
+
+def test_ohlcv_frame_is_consistent_and_seeded():
+    """OHLC согласованы, seed воспроизводит ряд, max_move держит коридор"""
+    frame = generate_demo_ohlcv_frame(bars=5000, seed=1)
+
+    assert (frame["high"] >= frame[["open", "close"]].max(axis=1)).all()
+    assert (frame["low"] <= frame[["open", "close"]].min(axis=1)).all()
+    assert frame.equals(generate_demo_ohlcv_frame(bars=5000, seed=1))
+
+    bounded = generate_demo_ohlcv_frame(bars=200_000, start_price=100.0, seed=2, max_move=2.0)
+    assert bounded["close"].between(50.0 - 0.01, 200.0 + 0.01).all()
+
+
+def test_demo_features_format():
+    """Фичи в формате lab.features_v1 с шагом 4h"""
+    features = generate_demo_features(500, seed=3)
+
+    assert {"symbol", "ts_4h", "close_4h", "volume_4h", "atr_14_1h",
+            "sma_50_4h", "avg_volume_20"} <= set(features.columns)
+    assert (features["ts_4h"].diff().dropna() == np.timedelta64(4, "h")).all()
+    assert str(features["ts_4h"].dt.tz) == "UTC"
+    assert not features.isna().any().any()
+
+
+def test_run_case_reports_stages_without_db():
+    """Кейс бенчмарка: все стадии, bars/sec, peak RSS; запись в БД заглушена"""
+    case = run_case(3000, paths=2)
+
+    assert case["bars"] == 3000 and case["trades"] > 0
+    assert set(case["stages"]) == set(STAGES)
+    assert case["stages"]["persist"] > 0 and case["bars_per_sec"] > 0
+    assert case["peak_rss_mb"] > 0
+
+    report = build_report([case])
+    assert compare(report, report) == [
+        {"bars": 3000, "mode": "vectorized", "speedup": 1.0, "rss_delta_mb": 0.0}
+    ]
@@ -0,0 +1,373 @@
+"""
+Тесты для OHLCVCollector (инкрементальная и возобновляемая загрузка)
+и AsyncOHLCVCollector (параллельная загрузка пар)
+
+Биржа подменяется FakeExchange с заготовленными свечами, БД — словарями в памяти.
+"""
+
+import asyncio
+import csv
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from tradlab.collector import AsyncOHLCVCollector, OHLCVCollector
+from tradlab.collector import OHLCVBulkLoader
+
+
+HOUR_MS = 3_600_000
+
+
+class FakeExchange:
+    """Локальная биржа: часовые свечи до текущей (ещё не закрытой) включительно"""
+
+    def __init__(self, bars: int):
+        current = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+        self.candles = [
+            [current - (bars - 1 - i) * HOUR_MS, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 10.0]
+            for i in range(bars)
+        ]
+        self.requests = []
+
+    def fetch_ohlcv(self, symbol, timeframe="1h", since=None, limit=None):
+        self.requests.append(since)
+        rows = [c for c in self.candles if c[0] >= since]
+        return [list(c) for c in rows[:limit]]
+
+
+class MemoryCollector(OHLCVCollector):
+    """OHLCVCollector с market.ohlcv и lab.jobs в памяти"""
+
+    RATE_LIMIT_DELAY = 0.0
+    FETCH_LIMIT = 100
+    CHECKPOINT_PAGES = 2
+
+    def __init__(self, exchange, stored=None, jobs=None, fail_after=None):
+        super().__init__("postgresql://offline")
+        self.exchange = exchange
+        self.stored = stored if stored is not None else pd.DataFrame(columns=["ts"])
+        self.jobs = jobs if jobs is not None else {}
+        self.fail_after = fail_after
+
+    def last_stored_ts(self, symbol, timeframe):
+        return None if self.stored.empty else self.stored["ts"].max().to_pydatetime()
+
+    def save_to_db(self, df, symbol, timeframe, loader=None):
+        if self.fail_after is not None and len(self.stored) >= self.fail_after:
+            raise ConnectionError("db gone")
+        self.stored = pd.concat([self.stored, df], ignore_index=True)
+
+    def _start_job(self, symbol, timeframes, start_date):
+        for job_id, job in self.jobs.items():
+            if job["status"] in ("running", "error") and job["start_date"] == start_date:
+                job["status"] = "running"
+                return job_id, job["progress"]
+        job_id = len(self.jobs) + 1
+        self.jobs[job_id] = {"status": "running", "start_date": start_date, "progress": {}}
+        return job_id, {}
+
+    def _update_job(self, job_id, status=None, **meta):
+        self.jobs[job_id].update(meta)
+        if status is not None:
+            self.jobs[job_id]["status"] = status
+
+
+START = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def test_incremental_fetches_only_new_closed_candles():
+    """Загрузка начинается со свечи после max(ts); текущая свеча не сохраняется"""
+    exchange = FakeExchange(bars=1000)
+    stored = OHLCVCollector._to_frame(exchange.candles[:990])
+    collector = MemoryCollector(exchange, stored=stored)
+
+    collector.collect(symbol="ETH/USDT", timeframes=["1h"], start_date=START)
+
+    new = collector.stored.iloc[990:]
+    assert exchange.requests == [exchange.candles[990][0]]
+    assert new["ts"].tolist() == OHLCVCollector._to_frame(exchange.candles[990:999])["ts"].tolist()
+    assert not collector.stored["ts"].duplicated().any()
+
+    # Повторный запуск: только закрытые свечи уже есть — один запрос, ничего нового
+    collector.collect(symbol="ETH/USDT", timeframes=["1h"], start_date=START)
+    assert len(collector.stored) == 999 and len(exchange.requests) == 2
+
+
+def test_interrupted_backfill_resumes_from_checkpoint():
+    """Прерванная загрузка продолжается с checkpoint в lab.jobs.meta.progress"""
+    exchange = FakeExchange(bars=650)
+    since = datetime.fromtimestamp(exchange.candles[0][0] / 1000, tz=timezone.utc)
+    collector = MemoryCollector(exchange, fail_after=200)
+
+    collector.collect(symbol="ETH/USDT", timeframes=["1h"], start_date=since, incremental=False)
+
+    job = collector.jobs[1]
+    assert job["status"] == "error" and job["failed"] == ["1h"]
+    assert job["progress"]["1h"]["rows"] == 200
+    assert len(collector.stored) == 200
+
+    resumed = MemoryCollector(exchange, stored=collector.stored, jobs=collector.jobs)
+    exchange.requests.clear()
+    resumed.collect(symbol="ETH/USDT", timeframes=["1h"], start_date=since, incremental=False)
+
+    assert exchange.requests[0] == exchange.candles[200][0]
+    assert resumed.jobs[1]["status"] == "done"
+    assert resumed.jobs[1]["progress"]["1h"]["rows"] == 649
+    assert resumed.stored["ts"].tolist() == OHLCVCollector._to_frame(exchange.candles[:649])["ts"].tolist()
+
+
+def test_save_to_db_copies_page_into_staging_and_merges(db_log):
+    """Страница пишется одним COPY в staging-таблицу и одним merge в той же транзакции"""
+    log = db_log
+    log.inserted = 3
+    candles = FakeExchange(bars=4).candles
+    candles[0][4] = 0.1 + 0.2
+    df = OHLCVCollector._to_frame(candles)
+
+    result = OHLCVCollector("postgresql://offline").save_to_db(df, "ETH/USDT", "1h")
+
+    assert (result.rows, result.inserted, result.skipped) == (4, 3, 1)
+    kinds = [entry[0] for entry in log]
+    assert kinds == ["connect", "execute", "copy", "execute", "execute", "commit", "close"]
+    log = log[1:]
+    assert log[0][1].startswith("CREATE TEMP TABLE IF NOT EXISTS ohlcv_stage ON COMMIT DELETE ROWS")
+    assert log[2][1].startswith("INSERT INTO market.ohlcv") and "FROM ohlcv_stage" in log[2][1]
+    assert log[3][2] == ("ETHUSDT", df["ts"].min())
+
+    rows = list(csv.reader(log[1][2].splitlines()))
+    assert len(rows) == 4
+    assert rows[0][:2] == ["ETHUSDT", "1h"] and rows[0][-1] == "binance"
+    assert pd.Timestamp(rows[0][2]) == df["ts"].iloc[0]
+    assert float(rows[0][6]) == 0.1 + 0.2
+
+
+def test_bulk_loader_reuses_connection_and_staging_table(db_log):
+    """Открытый загрузчик: одно соединение, staging создаётся один раз, транзакция на страницу"""
+    frames = [OHLCVCollector._to_frame(FakeExchange(bars=6).candles[i:i + 3]) for i in (0, 3)]
+
+    with OHLCVBulkLoader("postgresql://offline", feature_timeframes=()) as loader:
+        db_log.inserted = 3
+        first = loader.load(frames[0], "ETHUSDT", "1h")
+        db_log.inserted = 1
+        second = loader.load(frames[1], "ETHUSDT", "1h")
+        assert loader.load(frames[1].iloc[:0], "ETHUSDT", "1h") == (0, 0)
+
+    assert (first.inserted, first.skipped) == (3, 0)
+    assert (second.inserted, second.skipped) == (1, 2)
+    assert [entry[0] for entry in db_log] == [
+        "connect", "execute", "copy", "execute", "commit", "copy", "execute", "commit", "close",
+    ]
+
+
+def test_bulk_loader_rolls_back_failed_page(db_log):
+    """Ошибка merge откатывает страницу; staging создаётся заново в следующей транзакции"""
+    df = OHLCVCollector._to_frame(FakeExchange(bars=3).candles)
+
+    loader = OHLCVBulkLoader("postgresql://offline")
+    db_log.fail = ConnectionError("db gone")
+    with pytest.raises(ConnectionError):
+        loader.load(df, "ETHUSDT", "1h")
+    db_log.fail = None
+    assert db_log[-1] == ("rollback",)
+
+    loader.load(df, "ETHUSDT", "1h")
+    loader.close()
+    creates = [e for e in db_log if e[0] == "execute" and e[1].startswith("CREATE")]
+    assert len(creates) == 2
+
+
+class BulkMemoryCollector(MemoryCollector):
+    """MemoryCollector с настоящей записью через OHLCVBulkLoader (фейковая БД db_log)"""
+
+    save_to_db = OHLCVCollector.save_to_db
+
+
+def test_collect_writes_all_pages_through_one_loader(db_log):
+    """collect() держит один загрузчик: одно соединение и staging-таблица на все страницы"""
+    exchange = FakeExchange(bars=650)
+    since = datetime.fromtimestamp(exchange.candles[0][0] / 1000, tz=timezone.utc)
+    collector = BulkMemoryCollector(exchange)
+    db_log.inserted = 200
+
+    collector.collect("ETH/USDT", timeframes=["1h", "4h"], start_date=since, incremental=False)
+
+    kinds = [entry[0] for entry in db_log]
+    creates = [e for e in db_log if e[0] == "execute" and e[1].startswith("CREATE")]
+    assert kinds.count("connect") == 1 and len(creates) == 1
+    assert kinds.count("copy") == kinds.count("commit") > 2
+    assert kinds[-1] == "close"
+    assert all(job["status"] == "done" for job in collector.jobs.values())
+
+
+def test_validate_data_rejects_invalid_pages():
+    """Векторная валидация: NaN, high < close и отрицательные значения отклоняются"""
+    collector = OHLCVCollector("postgresql://offline")
+    df = OHLCVCollector._to_frame(FakeExchange(bars=5).candles)
+    assert collector.validate_data(df)
+
+    bad_high = df.copy()
+    bad_high.loc[2, "close"] = bad_high.loc[2, "high"] + 1
+    nan = df.copy()
+    nan.loc[1, "volume"] = float("nan")
+    negative = df.copy()
+    negative.loc[3, "volume"] = -1.0
+    for bad in (bad_high, nan, negative, df.iloc[:0]):
+        assert not collector.validate_data(bad)
+
+
+def test_resume_point_takes_latest_bound():
+    """resume_point: максимум из start_date, checkpoint и (при incremental) max(ts)"""
+    exchange = FakeExchange(bars=10)
+    stored = OHLCVCollector._to_frame(exchange.candles[:5])
+    collector = MemoryCollector(exchange, stored=stored)
+    last = stored["ts"].max().to_pydatetime()
+
+    assert collector.resume_point("ETHUSDT", "1h", START) == last + pd.Timedelta(hours=1)
+    assert collector.resume_point("ETHUSDT", "1h", START, incremental=False) == START
+    checkpoint = {"last_ts": (last + pd.Timedelta(hours=3)).isoformat()}
+    assert collector.resume_point("ETHUSDT", "1h", START, checkpoint) == last + pd.Timedelta(hours=4)
+
+
+class AsyncFakeExchange(FakeExchange):
+    """FakeExchange с async fetch_ohlcv: считает одновременные запросы"""
+
+    def __init__(self, bars: int, fail_symbol=None):
+        super().__init__(bars)
+        self.fail_symbol = fail_symbol
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.times = []
+
+    async def fetch_ohlcv(self, symbol, timeframe="1h", since=None, limit=None):
+        self.times.append(time.monotonic())
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.002)
+            if symbol == self.fail_symbol:
+                raise ConnectionError("exchange gone")
+            return FakeExchange.fetch_ohlcv(self, symbol, timeframe, since, limit)
+        finally:
+            self.in_flight -= 1
+
+
+class AsyncMemoryCollector(AsyncOHLCVCollector):
+    """AsyncOHLCVCollector с market.ohlcv по парам и lab.jobs в памяти"""
+
+    FETCH_LIMIT = 100
+    CHECKPOINT_PAGES = 2
+
+    def __init__(self, exchange, **kwargs):
+        super().__init__("postgresql://offline", exchange=exchange, **kwargs)
+        self.stored = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def last_stored_ts(self, symbol, timeframe):
+        df = self.stored.get((symbol, timeframe))
+        return None if df is None else df["ts"].max().to_pydatetime()
+
+    def save_to_db(self, df, symbol, timeframe, loader=None):
+        with self.lock:
+            key = (symbol.replace('/', ''), timeframe)
+            self.stored[key] = pd.concat([self.stored.get(key), df], ignore_index=True)
+
+    def _start_job(self, symbol, timeframes, start_date):
+        job_id = len(self.jobs) + 1
+        self.jobs[job_id] = {"symbol": symbol, "status": "running", "progress": {}}
+        return job_id, {}
+
+    def _update_job(self, job_id, status=None, **meta):
+        with self.lock:
+            self.jobs[job_id].update(meta)
+            if status is not None:
+                self.jobs[job_id]["status"] = status
+
+
+SYMBOLS = ["ETH/USDT", "BTC/USDT", "SOL/USDT"]
+
+
+def test_async_collects_all_pairs_with_bounded_concurrency():
+    """Все пары загружены без дубликатов; одновременных запросов не больше concurrency"""
+    exchange = AsyncFakeExchange(bars=450)
+    since = datetime.fromtimestamp(exchange.candles[0][0] / 1000, tz=timezone.utc)
+    collector = AsyncMemoryCollector(exchange, concurrency=2, requests_per_second=10_000)
+
+    summary = collector.collect_many(SYMBOLS, ["1h", "4h"], start_date=since)
+
+    assert len(collector.stored) == 6
+    for (symbol, timeframe), df in collector.stored.items():
+        closed = [c for c in exchange.candles if c[0] <= collector.last_closed_ms(timeframe)]
+        assert df["ts"].tolist() == OHLCVCollector._to_frame(closed)["ts"].tolist()
+        assert summary[symbol][timeframe] == {"status": "done", "rows": len(closed)}
+    assert exchange.max_in_flight == 2
+    assert all(job["status"] == "done" and job["failed"] == [] for job in collector.jobs.values())
+    assert collector.jobs[1]["progress"]["1h"]["rows"] == 449
+
+
+def test_async_shared_rate_limit_spaces_requests():
+    """Общий бюджет: запросы всех пар идут не чаще requests_per_second"""
+    exchange = AsyncFakeExchange(bars=250)
+    since = datetime.fromtimestamp(exchange.candles[0][0] / 1000, tz=timezone.utc)
+    collector = AsyncMemoryCollector(exchange, concurrency=4, requests_per_second=100)
+
+    collector.collect_many(SYMBOLS[:2], ["1h", "4h"], start_date=since)
+
+    times = sorted(exchange.times)
+    assert len(times) == 12
+    # Слоты идут с шагом 1 / rate: 12 запросов занимают не меньше 11 интервалов
+    assert times[-1] - times[0] >= 11 * 0.01 * 0.95
+
+
+def test_async_pair_failure_does_not_stop_others():
+    """Ошибка одной пары помечает задачу символа error, остальные пары загружаются"""
+    exchange = AsyncFakeExchange(bars=150, fail_symbol="BTC/USDT")
+    since = datetime.fromtimestamp(exchange.candles[0][0] / 1000, tz=timezone.utc)
+    collector = AsyncMemoryCollector(exchange, concurrency=3, requests_per_second=10_000)
+
+    summary = collector.collect_many(SYMBOLS, ["1h"], start_date=since)
+
+    assert summary["BTCUSDT"]["1h"]["status"] == "error"
+    assert ("BTCUSDT", "1h") not in collector.stored
+    assert len(collector.stored[("ETHUSDT", "1h")]) == 149
+    statuses = {job["symbol"]: (job["status"], job["failed"]) for job in collector.jobs.values()}
+    assert statuses["BTCUSDT"] == ("error", ["1h"])
+    assert statuses["SOLUSDT"] == ("done", [])
+
+
+class SlowCheckpointCollector(AsyncMemoryCollector):
+    """Каждая вторая запись checkpoint в пуле потоков завершается с задержкой"""
+
+    def __init__(self, exchange, **kwargs):
+        super().__init__(exchange, **kwargs)
+        self.calls = 0
+        self.applied = []
+
+    def _update_job(self, job_id, status=None, **meta):
+        with self.lock:
+            self.calls += 1
+            delay = 0.02 if self.calls % 2 else 0.0
+        time.sleep(delay)
+        super()._update_job(job_id, status, **meta)
+        if status is None:
+            with self.lock:
+                self.applied.append(meta["progress"])
+
+
+def test_async_checkpoints_of_one_symbol_are_not_reordered():
+    """Снимки progress символа пишутся по порядку: старый не затирает новый"""
+    exchange = AsyncFakeExchange(bars=450)
+    since = datetime.fromtimestamp(exchange.candles[0][0] / 1000, tz=timezone.utc)
+    collector = SlowCheckpointCollector(exchange, concurrency=2, requests_per_second=10_000)
+
+    collector.collect_many(SYMBOLS[:1], ["1h", "4h"], start_date=since)
+
+    assert len(collector.applied) > 2
+    for older, newer in zip(collector.applied, collector.applied[1:]):
+        for timeframe, item in older.items():
+            assert newer[timeframe]["rows"] >= item["rows"]
+    rows = {tf: len(df) for (_, tf), df in collector.stored.items()}
+    assert {tf: item["rows"] for tf, item in collector.applied[-1].items()} == rows
@@ -0,0 +1,155 @@
+"""
+Тесты для FeatureStore (локальные снапшоты фич)
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.feature_adapter_v1 import FeatureAdapterV1
+from tradlab.engine.feature_store import FeatureStore
+from tradlab.engine.strategies import STR100ChainFlowETH
+
+
+def is_memory_mapped(values: np.ndarray) -> bool:
+    """Является ли массив view на np.memmap (по цепочке .base)"""
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+class TestFeatureStore:
+    """Выгрузка, memory-mapped загрузка и офлайн-бэктест"""
+
+    def test_export_load_roundtrip(self, tmp_path, make_features):
+        """Снапшот восстанавливает фичи бит-в-бит"""
+        features = make_features(bars=300)
+        store = FeatureStore(tmp_path)
+
+        manifest = store.export("ETHUSDT", "2024-01-01", "2024-03-01", features_df=features)
+        loaded = store.load("ETHUSDT", "2024-01-01", "2024-03-01")
+
+        assert manifest["bars"] == 300
+        assert manifest["source_max_ts"] == features["ts_4h"].max().isoformat()
+        assert list(loaded.columns) == list(features.columns)
+        assert is_memory_mapped(loaded["close_4h"].to_numpy())
+        pd.testing.assert_frame_equal(loaded, features, check_dtype=False)
+        assert (loaded["ts_4h"] == features["ts_4h"]).all()
+
+    def test_verify_detects_corruption(self, tmp_path, make_features):
+        """verify() сверяет хэш содержимого с manifest"""
+        store = FeatureStore(tmp_path)
+        store.export("ETHUSDT", features_df=make_features(bars=100))
+        assert store.verify("ETHUSDT")
+
+        path = store.snapshot_path("ETHUSDT") / "close_4h.npy"
+        values = np.load(path)
+        values[0] += 1.0
+        np.save(path, values)
+        assert not store.verify("ETHUSDT")
+
+    def test_offline_fetch_without_snapshot_raises(self, tmp_path):
+        """Без db_url и снапшота — FileNotFoundError, а не запрос к БД"""
+        store = FeatureStore(tmp_path)
+        with pytest.raises(FileNotFoundError):
+            store.fetch_features("ETHUSDT", "2024-01-01", "2024-02-01")
+
+    def test_backtest_from_store_without_db(self, tmp_path, make_features):
+        """BacktesterV1 с FeatureStore работает без БД и совпадает с прогоном по DataFrame"""
+        features = make_features(bars=600)
+        store = FeatureStore(tmp_path)
+        store.export("ETHUSDT", "2024-01-01", "2024-06-01", features_df=features)
+
+        offline = BacktesterV1(
+            db_url=None, strategy=STR100ChainFlowETH(), mode="vectorized", feature_store=store
+        ).run("ETHUSDT", "2024-01-01", "2024-06-01", run_id="store", persist=False)
+        reference = BacktesterV1(
+            db_url=None, strategy=STR100ChainFlowETH(), mode="vectorized"
+        ).run(run_id="ref", features_df=features, persist=False)
+
+        for key in ("pnl_total", "sharpe", "max_dd", "total_trades", "win_rate"):
+            assert offline[key] == reference[key]
+
+    def test_stream_from_store(self, tmp_path, make_features):
+        """run_stream() читает снапшот срезами и совпадает с обычным прогоном"""
+        features = make_features(bars=300)
+        store = FeatureStore(tmp_path)
+        store.export("ETHUSDT", "2024-01-01", "2024-03-01", features_df=features)
+
+        chunks = list(store.iter_feature_chunks("ETHUSDT", "2024-01-01", "2024-03-01",
+                                                chunk_size=64, warmup=2))
+        assert [carried for _, carried in chunks] == [0, 2, 2, 2, 2]
+        assert is_memory_mapped(chunks[0][0]["close_4h"].to_numpy())
+
+        runs = []
+        for stream in (False, True):
+            bt = BacktesterV1(db_url=None, strategy=STR100ChainFlowETH(),
+                              mode="vectorized", feature_store=store)
+            run = bt.run_stream if stream else bt.run
+            runs.append(run(symbol="ETHUSDT", start_date="2024-01-01", end_date="2024-03-01",
+                            persist=False))
+        assert runs[0]["pnl_total"] == runs[1]["pnl_total"]
+        assert runs[0]["sharpe"] == runs[1]["sharpe"]
+
+    def test_manifest_on_disk(self, tmp_path, make_features):
+        """manifest.json содержит источник и хэш"""
+        store = FeatureStore(tmp_path)
+        store.export("ETHUSDT", "2024-01-01", None, features_df=make_features(bars=50))
+
+        with open(store.snapshot_path("ETHUSDT", "2024-01-01") / FeatureStore.MANIFEST) as f:
+            manifest = json.load(f)
+
+        assert manifest["source_table"] == "lab.features_v1_mat"
+        assert len(manifest["content_hash"]) == 64
+
+    def test_offline_open_ended_snapshot_refused(self, tmp_path, make_features):
+        """Без db_url открытый срез не отдаётся (свежесть не проверить), load() — можно"""
+        store = FeatureStore(tmp_path)
+        store.export("ETHUSDT", "2024-01-01", None, features_df=make_features(bars=50))
+
+        with pytest.raises(ValueError):
+            store.fetch_features("ETHUSDT", "2024-01-01")
+        with pytest.raises(ValueError):
+            next(store.iter_feature_chunks("ETHUSDT", "2024-01-01"))
+        assert len(store.load("ETHUSDT", "2024-01-01")) == 50
+
+    def test_stale_snapshot_is_reexported(self, tmp_path, monkeypatch, make_features):
+        """С db_url снапшот сверяется с БД и при новых барах выгружается заново"""
+        features = make_features(bars=120)
+        source = {"df": features.iloc[:100]}
+        exports = []
+
+        def fetch_source(adapter, symbol, start_date=None, end_date=None):
+            exports.append((symbol, start_date, end_date))
+            return source["df"].copy()
+
+        def source_state(store, symbol, start_date=None, end_date=None):
+            df = source["df"]
+            return df["ts_4h"].max(), len(df)
+
+        monkeypatch.setattr(FeatureAdapterV1, "fetch_features", fetch_source)
+        monkeypatch.setattr(FeatureStore, "_source_state", source_state)
+        store = FeatureStore(tmp_path, db_url="postgresql://offline")
+
+        assert len(store.fetch_features("ETHUSDT", "2024-01-01")) == 100
+        assert len(store.fetch_features("ETHUSDT", "2024-01-01")) == 100
+        assert len(exports) == 1
+
+        # Новые свечи и пересчёт lab.features_v1_mat
+        source["df"] = features
+        assert store.is_stale("ETHUSDT", "2024-01-01")
+        assert len(store.fetch_features("ETHUSDT", "2024-01-01")) == 120
+        assert len(exports) == 2
+        assert store.manifest("ETHUSDT", "2024-01-01")["bars"] == 120
+
+        # Догрузка пропуска внутри среза: max(ts) тот же, баров больше
+        store.export("ETHUSDT", "2024-01-01", features_df=features.drop(index=[10]))
+        assert store.is_stale("ETHUSDT", "2024-01-01")
+        chunks = list(store.iter_feature_chunks("ETHUSDT", "2024-01-01", chunk_size=64))
+        assert sum(len(df) for df, _ in chunks) == 120
+        assert len(exports) == 3
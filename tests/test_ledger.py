@@ -0,0 +1,96 @@
+"""
+Тесты для колоночного журнала сделок (tradlab.engine.ledger)
+
+Прогоны идут на синтетических фичах без БД.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.engine.ledger import EXIT_REASONS, TradeLedger
+from tradlab.engine.metrics import MetricsCalculator
+from tradlab.engine.persistence import trade_records
+
+
+TS = pd.date_range("2024-01-01", periods=10, freq="4h", tz="UTC")
+
+
+def make_ledger(n: int = 5, keep_meta: bool = True) -> TradeLedger:
+    ledger = TradeLedger("STR-TEST", keep_meta=keep_meta, capacity=2)
+    for i in range(n):
+        ledger.add(
+            side="LONG" if i % 2 == 0 else "SHORT",
+            qty=1.5, entry_ts=TS[i], entry_price=100.0 + i,
+            exit_ts=TS[i + 1], exit_price=101.0 + i,
+            pnl=10.0 - 4 * i, pnl_pct=0.5 * i,
+            symbol="ETHUSDT" if i < 3 else "BTCUSDT",
+            exit_reason=EXIT_REASONS[i % len(EXIT_REASONS)],
+            commission_entry=0.1, commission_exit=0.2,
+            entry_bar=i + 1, exit_bar=i + 2,
+            meta={"score": i}
+        )
+    return ledger
+
+
+def test_ledger_grows_and_reads_as_dicts():
+    """Массивы растут удвоением; сделки читаются в прежнем формате dict"""
+    ledger = make_ledger(5)
+
+    assert len(ledger) == 5 and len(ledger.column("pnl")) == 5
+    assert ledger.symbols == ["ETHUSDT", "BTCUSDT"]
+    np.testing.assert_array_equal(ledger.column("exit_bar"), [2, 3, 4, 5, 6])
+    assert ledger[-1] == ledger[4] == list(ledger)[4]
+    assert ledger[1] == {
+        "strategy_id": "STR-TEST", "mode": "backtest", "symbol": "ETHUSDT", "side": "SHORT",
+        "qty": 1.5, "entry_ts": TS[1], "entry_price": 101.0, "exit_ts": TS[2],
+        "exit_price": 102.0, "pnl": 6.0, "pnl_pct": 0.5,
+        "meta": {"score": 1, "exit_reason": "TP1", "commission_entry": 0.1, "commission_exit": 0.2},
+    }
+    assert ledger == list(ledger) and ledger == make_ledger(5)
+    with pytest.raises(IndexError):
+        ledger[5]
+
+    # Без keep_meta в meta остаются только поля журнала
+    assert make_ledger(5, keep_meta=False)[0]["meta"] == {
+        "exit_reason": "SL", "commission_entry": 0.1, "commission_exit": 0.2
+    }
+
+
+def test_ledger_exports_match_dict_path():
+    """to_records() / to_dataframe() / hold_hours() совпадают с расчётом по dict"""
+    ledger = make_ledger(5)
+    trades = list(ledger)
+
+    assert trade_records("run-1", ledger) == trade_records("run-1", trades)
+
+    frame = ledger.to_dataframe()
+    assert frame["exit_reason"].tolist() == [t["meta"]["exit_reason"] for t in trades]
+    assert frame["entry_ts"].tolist() == [t["entry_ts"] for t in trades]
+    assert frame["symbol"].tolist() == [t["symbol"] for t in trades]
+
+    hours = [(t["exit_ts"] - t["entry_ts"]).total_seconds() / 3600.0 for t in trades]
+    assert ledger.hold_hours().tolist() == hours
+
+
+def test_backtester_trades_and_metrics_from_ledger(make_features, make_offline_backtester):
+    """Метрики прогона по колонкам журнала равны расчёту по списку сделок"""
+    features = make_features()
+    bt = make_offline_backtester(features, mode="vectorized", trade_meta=False)
+    results = bt.run(run_id="ledger", persist=False)
+    trades = list(bt.trades)
+
+    assert isinstance(bt.trades, TradeLedger) and len(trades) > 0
+    assert results["win_rate"] == MetricsCalculator.calculate_win_rate(trades)
+    assert results["profit_factor"] == MetricsCalculator.calculate_profit_factor(trades)
+
+    # Индексы баров указывают на точки equity curve со временем входа/выхода
+    ts = features["ts_4h"]
+    entry_bar, exit_bar = bt.trades.column("entry_bar"), bt.trades.column("exit_bar")
+    assert ts.iloc[entry_bar - 1].tolist() == [t["entry_ts"] for t in trades]
+    assert ts.iloc[exit_bar - 1].tolist() == [t["exit_ts"] for t in trades]
+
+    bt_loop = make_offline_backtester(features, mode="loop")
+    bt_loop.run(run_id="ledger-loop", persist=False)
+    np.testing.assert_array_equal(bt_loop.trades.column("entry_bar"), entry_bar)
+    np.testing.assert_array_equal(bt_loop.trades.column("exit_bar"), exit_bar)
@@ -0,0 +1,287 @@
+"""
+Тесты для оптимизатора параметров (tradlab.engine.optimizer)
+
+Прогоны идут на синтетических фичах без БД (persist=False).
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.optimizer import (
+    GridSweep, HaltonSampler, RandomSampler, SharedFeatures, SuccessiveHalving,
+    TrackedParams, expand_grid, rank_points,
+)
+from tradlab.engine.result_cache import ResultCache
+from tradlab.engine.strategies import STR100ChainFlowETH
+
+
+PARAM_GRID = {
+    "master_long_threshold": [10, 20],
+    "master_short_threshold": [-20, -10],
+}
+
+
+def make_sweep(**kwargs) -> GridSweep:
+    return GridSweep(
+        db_url="postgresql://offline",
+        strategy_cls=STR100ChainFlowETH,
+        param_grid=PARAM_GRID,
+        fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+        persist=False,
+        **kwargs
+    )
+
+
+def test_expand_grid_order():
+    """Комбинации идут в порядке itertools.product"""
+    points = expand_grid({"a": [1, 2], "b": ["x", "y"]})
+    assert points == [
+        {"a": 1, "b": "x"}, {"a": 1, "b": "y"},
+        {"a": 2, "b": "x"}, {"a": 2, "b": "y"},
+    ]
+
+
+def test_shared_features_roundtrip(make_features):
+    """DataFrame из shared memory совпадает с исходным"""
+    features = make_features(bars=50)
+    shared = SharedFeatures.create(features)
+    try:
+        attached, frame = SharedFeatures.attach(shared.spec)
+        pd.testing.assert_frame_equal(frame, features, check_dtype=False)
+        attached.close()
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sweep_matches_sequential_backtests(max_workers, make_features):
+    """Sweep в пуле процессов даёт те же метрики, что и последовательные прогоны"""
+    features = make_features(bars=300)
+    sweep = make_sweep(max_workers=max_workers)
+    
+    tables = sweep.run({"p": {"start": None, "end": None}}, features={"p": features})
+    table = tables["p"]
+    
+    assert len(table) == len(expand_grid(PARAM_GRID))
+    for point, (_, row) in zip(expand_grid(PARAM_GRID), table.iterrows()):
+        params = {**STR100ChainFlowETH.PARAMS, **point}
+        bt = BacktesterV1("postgresql://offline", STR100ChainFlowETH(params=params))
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = bt.run(features_df=features.copy(), persist=False)
+        
+        assert row["master_long_threshold"] == point["master_long_threshold"]
+        assert row["sharpe"] == expected["sharpe"]
+        assert row["pnl_total"] == expected["pnl_total"]
+        assert row["total_trades"] == expected["total_trades"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sweep_persists_in_batches(monkeypatch, max_workers, make_features):
+    """При persist=True воркеры не пишут в БД, главный процесс сбрасывает буфер пачками"""
+    flushed = []
+
+    def fake_flush(writer):
+        flushed.append(len(writer))
+        writer._trades, writer._results = [], []
+        return flushed[-1]
+
+    monkeypatch.setattr("tradlab.engine.persistence.ResultWriter.flush", fake_flush)
+
+    sweep = make_sweep(max_workers=max_workers)
+    sweep.persist = True
+    sweep.flush_every = 3
+    sweep.run({"p": {"start": None, "end": None}}, features={"p": make_features(bars=300)})
+
+    assert flushed == [3, 1]
+
+
+def test_tracked_params_records_reads():
+    """TrackedParams отмечает прочитанные ключи; copy() — все ключи"""
+    params = TrackedParams({"a": 1, "b": 2, "c": 3})
+    assert params["a"] == 1
+    assert params.get("b") == 2
+    assert params.accessed == {"a", "b"}
+    assert isinstance(params, dict)
+
+    params.copy()
+    assert params.accessed == {"a", "b", "c"}
+
+
+def test_sweep_collapses_dead_axis(make_features):
+    """Ось, которую стратегия не читает, схлопывается; строки раздаются всем точкам"""
+    sweep = GridSweep(
+        db_url="postgresql://offline",
+        strategy_cls=STR100ChainFlowETH,
+        param_grid={**PARAM_GRID, "lookback_z": [6, 12, 18]},
+        fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+        persist=False,
+        max_workers=1,
+    )
+    tables = sweep.run({"p": {"start": None, "end": None}}, features={"p": make_features(bars=300)})
+    table = tables["p"]
+
+    assert sweep.dead_axes == ["lookback_z"]
+    assert len(table) == 12
+    assert table["run_id"].nunique() == 4
+    for _, group in table.groupby(["master_long_threshold", "master_short_threshold"]):
+        assert group["lookback_z"].tolist() == [6, 12, 18]
+        assert group["sharpe"].nunique() == 1
+
+
+def test_sweep_reused_scores_match_full_runs(make_features):
+    """Сигналы из кэша скоров дают те же результаты, что и полный пересчёт"""
+    features = make_features(bars=400)
+    grid = {**PARAM_GRID, "k_sl_min": [1.5, 2.0]}
+
+    tables = {}
+    for reuse in (True, False):
+        sweep = GridSweep(
+            db_url="postgresql://offline",
+            strategy_cls=STR100ChainFlowETH,
+            param_grid=grid,
+            fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+            persist=False,
+            max_workers=1,
+            reuse_scores=reuse,
+        )
+        tables[reuse] = sweep.run({"p": {"start": None, "end": None}}, features={"p": features})["p"]
+
+    metrics = ["sharpe", "pnl_total", "max_dd", "win_rate", "total_trades", "profit_factor"]
+    pd.testing.assert_frame_equal(tables[True][metrics], tables[False][metrics])
+
+
+@pytest.mark.parametrize("sampler_cls", [RandomSampler, HaltonSampler])
+def test_sampler_unique_and_deterministic(sampler_cls):
+    """Точки уникальны, лежат в сетке и воспроизводимы по seed"""
+    space = {"a": [1, 2, 3, 4], "b": [0.1, 0.2, 0.3], "c": ["x", "y"]}
+    points = sampler_cls(space, seed=7).sample(10)
+
+    assert len(points) == 10
+    assert len({tuple(p.values()) for p in points}) == 10
+    assert all(p in expand_grid(space) for p in points)
+    assert points == sampler_cls(space, seed=7).sample(10)
+    assert len(RandomSampler(space, seed=1).sample(100)) == 24
+
+
+def test_successive_halving_rungs(make_features):
+    """Число точек падает в eta раз на ступень, последняя ступень — полный период"""
+    grid = {
+        "master_long_threshold": [5, 10, 15, 20, 25, 30],
+        "master_short_threshold": [-30, -20, -10],
+    }
+    features = make_features(bars=900)
+    search = SuccessiveHalving(
+        db_url="postgresql://offline",
+        strategy_cls=STR100ChainFlowETH,
+        param_grid=grid,
+        fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+        persist=False,
+        max_workers=1,
+        n_configs=18,
+        eta=3,
+        seed=0,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        table = search.run({"p": {"start": None, "end": None}}, features={"p": features})["p"]
+
+    history = search.history["p"]
+    assert search.rung_fractions() == pytest.approx([1 / 9, 1 / 3, 1.0])
+    assert history.groupby("rung").size().tolist() == [18, 6, 2]
+    assert history.groupby("rung")["window_bars"].first().tolist() == [100, 300, 900]
+    assert len(table) == 2
+
+    # Метрики финальной ступени совпадают с полным прогоном тех же точек
+    full = GridSweep(
+        db_url="postgresql://offline",
+        strategy_cls=STR100ChainFlowETH,
+        param_grid=grid,
+        fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+        persist=False,
+        max_workers=1,
+    ).run({"p": {"start": None, "end": None}}, features={"p": features})["p"]
+    merged = table.merge(full, on=list(grid), suffixes=("", "_full"))
+    assert len(merged) == 2
+    assert (merged["sharpe"] == merged["sharpe_full"]).all()
+
+
+def test_successive_halving_persists_only_full_window(monkeypatch, make_features):
+    """При persist в ResultWriter попадают только прогоны последней (полной) ступени"""
+    written = []
+
+    def fake_flush(writer):
+        written.append(len(writer))
+        writer._trades, writer._results = [], []
+        return written[-1]
+
+    monkeypatch.setattr("tradlab.engine.persistence.ResultWriter.flush", fake_flush)
+    search = SuccessiveHalving(
+        db_url="postgresql://offline",
+        strategy_cls=STR100ChainFlowETH,
+        param_grid={"master_long_threshold": [5, 10, 15, 20, 25, 30]},
+        fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+        persist=True,
+        max_workers=1,
+        n_configs=6,
+        eta=3,
+        min_fraction=1 / 3,
+        seed=0,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        search.run({"p": {"start": None, "end": None}}, features={"p": make_features(bars=300)})
+
+    assert search.history["p"].groupby("rung").size().tolist() == [6, 2]
+    assert sum(written) == 2
+    assert search.persist is True
+
+
+def test_sweep_prunes_doomed_points(make_features):
+    """prune_margin помечает строки status="pruned"; ранжирование ставит их в конец"""
+    features = make_features(bars=400)
+    with contextlib.redirect_stdout(io.StringIO()):
+        table = make_sweep(max_workers=1, prune_margin=-19.0).run(
+            {"p": {"start": None, "end": None}}, features={"p": features}
+        )["p"]
+
+    assert set(table["status"]) <= {"pruned", "completed"}
+    assert (table["status"] == "pruned").any()
+    ranked = rank_points(table, "sharpe")
+    statuses = ranked["status"].tolist()
+    assert statuses == sorted(statuses, key=lambda status: status == "pruned")
+
+
+def test_sweep_cache_entries_carry_period_bounds(monkeypatch, make_features):
+    """Записи lab.result_cache от sweep несут границы периода (или среза), а ключ
+    совпадает с отдельным прогоном того же периода"""
+    puts = []
+
+    def fake_put(cache, cache_key, strategy, symbol, start_date, end_date, fingerprint, results):
+        puts.append((cache_key, start_date, end_date))
+
+    monkeypatch.setattr("tradlab.engine.result_cache.ResultCache.get", lambda cache, key: None)
+    monkeypatch.setattr("tradlab.engine.result_cache.ResultCache.put", fake_put)
+    features = make_features(bars=300)
+    sweep = make_sweep(max_workers=1, use_cache=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sweep.run({"p": {"start": "2024-01-01", "end": "2024-02-19"}}, features={"p": features})
+        sweep.run({"w": {}}, features={"h": features}, windows={"w": ("h", 100, 200)})
+
+    assert {(start, end) for _, start, end in puts[:4]} == {("2024-01-01", "2024-02-19")}
+    ts = features["ts_4h"]
+    assert {(start, end) for _, start, end in puts[4:]} == {
+        (ts.iloc[100].isoformat(), ts.iloc[199].isoformat())
+    }
+
+    point = expand_grid(PARAM_GRID)[0]
+    bt = BacktesterV1("postgresql://offline",
+                      STR100ChainFlowETH(params={**STR100ChainFlowETH.PARAMS, **point}),
+                      result_cache=ResultCache("postgresql://offline"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        bt.run(start_date="2024-01-01", end_date="2024-02-19",
+               features_df=features.copy(), persist=False)
+    assert puts[-1][0] == puts[0][0]
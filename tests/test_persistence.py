@@ -0,0 +1,115 @@
+"""
+Тесты для ResultWriter (COPY в lab.trades + upsert lab.results)
+
+Соединение с БД подменяется фейком (фикстура db_log), который записывает выполненные команды.
+"""
+
+import csv
+import json
+
+import pandas as pd
+
+from tradlab.engine import persistence
+from tradlab.engine.persistence import (
+    ResultWriter, TRADE_COLUMNS, decode_state, state_record, trade_records,
+)
+
+
+def make_trade(i: int, exit_price=2010.0):
+    ts = pd.Timestamp("2024-01-01", tz="UTC") + pd.Timedelta(hours=4 * i)
+    return {
+        "strategy_id": "STR-100", "mode": "backtest", "symbol": "ETHUSDT",
+        "side": "LONG", "qty": 0.5, "entry_ts": ts, "entry_price": 2000.0,
+        "exit_ts": ts + pd.Timedelta(hours=4), "exit_price": exit_price,
+        "pnl": 5.0, "pnl_pct": 0.5, "meta": {"exit_reason": "TP1"},
+    }
+
+
+def make_results(run_id: str):
+    return {
+        "run_id": run_id, "strategy_id": "STR-100",
+        "start_ts": pd.Timestamp("2024-01-01", tz="UTC"),
+        "end_ts": pd.Timestamp("2024-02-01", tz="UTC"),
+        "pnl_total": 5.0, "sharpe": 1.0, "sortino": 1.2, "max_dd": 3.0,
+        "calmar": 0.5, "win_rate": 100.0, "profit_factor": 2.0,
+        "pass_risk_gate": True, "total_trades": 1,
+    }
+
+
+class TestResultWriter:
+    """Одна транзакция на flush, COPY для трейдов"""
+
+    def test_write_single_transaction(self, db_log):
+        """Трейды и результат пишутся на одном соединении одной транзакцией"""
+        ResultWriter("postgresql://fake").write("run-1", [make_trade(0), make_trade(1)], make_results("run-1"))
+
+        kinds = [entry[0] for entry in db_log]
+        assert kinds == ["connect", "copy", "upsert", "commit", "close"]
+
+        rows = list(csv.reader(db_log[1][2].splitlines()))
+        assert len(rows) == 2
+        assert rows[0][:5] == ["run-1", "STR-100", "backtest", "ETHUSDT", "LONG"]
+        assert pd.Timestamp(rows[0][TRADE_COLUMNS.index("entry_ts")]) == make_trade(0)["entry_ts"]
+        assert json.loads(rows[0][-1]) == {"exit_reason": "TP1", "run_id": "run-1"}
+
+    def test_buffered_flush(self, db_log):
+        """Буфер сбрасывается одной транзакцией при заполнении и при выходе из with"""
+        with ResultWriter("postgresql://fake", buffer_runs=3) as writer:
+            for i in range(4):
+                writer.add(f"run-{i}", [make_trade(i)], make_results(f"run-{i}"))
+
+        upserts = [entry for entry in db_log if entry[0] == "upsert"]
+        assert [len(entry[2]) for entry in upserts] == [3, 1]
+        assert db_log.count(("connect",)) == 2
+        assert len(writer) == 0
+
+    def test_null_fields_in_copy(self):
+        """None в CSV — пустое поле без кавычек (NULL для COPY FORMAT csv)"""
+        trade = make_trade(0, exit_price=None)
+        trade["exit_ts"] = None
+        buffer = persistence.trades_to_csv(trade_records("run-1", [trade]))
+        fields = buffer.read().rstrip("\n").split(",")
+        assert fields[TRADE_COLUMNS.index("exit_ts")] == ""
+        assert fields[TRADE_COLUMNS.index("exit_price")] == ""
+
+    def test_empty_flush_no_connection(self, db_log):
+        """Пустой буфер не открывает соединение"""
+        assert ResultWriter("postgresql://fake").flush() == 0
+        assert db_log == []
+
+    def test_resumed_run_replaces_eod_trade(self, db_log):
+        """Продолженный прогон: удаление EOD-сделки, COPY, upsert результата и состояния"""
+        state = make_state("run-1")
+        ResultWriter("postgresql://fake").write(
+            "run-1", [make_trade(5)], make_results("run-1"), state=state, resumed=True
+        )
+
+        kinds = [entry[0] for entry in db_log]
+        assert kinds == ["connect", "execute", "copy", "upsert", "upsert_state", "commit", "close"]
+        assert "exit_reason' = 'EOD'" in db_log[1][1]
+        assert db_log[1][2] == (["run-1"],)
+
+
+def make_state(run_id: str):
+    return {
+        "run_id": run_id, "strategy_id": "STR-100",
+        "strategy_class": "tradlab.engine.strategies.str_100_chainflow_eth.STR100ChainFlowETH",
+        "symbol": "ETHUSDT", "params": {"k_sl_min": 1.5},
+        "start_ts": pd.Timestamp("2024-01-01", tz="UTC"),
+        "last_ts": pd.Timestamp("2024-02-01", tz="UTC"),
+        "balance": 10012.5,
+        "open_position": {"side": "LONG", "entry_ts": pd.Timestamp("2024-01-31 20:00", tz="UTC"),
+                          "entry_price": 2000.1, "qty": 0.5, "meta": {}},
+        "equity": [10000.0, 10005.25, 10012.5],
+        "trade_stats": {"trades": 3, "closed": 3, "wins": 2},
+        "config": {"initial_capital": 10000.0, "mode": "vectorized"},
+    }
+
+
+def test_state_roundtrip():
+    """state_record() → decode_state() восстанавливает типы и значения"""
+    state = decode_state(state_record(make_state("run-1")))
+    assert state["equity"].tolist() == [10000.0, 10005.25, 10012.5]
+    assert state["open_position"]["entry_ts"] == pd.Timestamp("2024-01-31 20:00", tz="UTC")
+    assert state["last_ts"] == pd.Timestamp("2024-02-01", tz="UTC")
+    assert state["params"] == {"k_sl_min": 1.5}
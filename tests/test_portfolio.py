@@ -0,0 +1,131 @@
+"""
+Тесты для портфельного бэктестера (tradlab.engine.portfolio)
+
+Прогоны идут на синтетических фичах без БД.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.portfolio import PortfolioBacktester, align_features
+from tradlab.engine.strategies import STR100ChainFlowETH
+
+
+@pytest.fixture
+def make_basket(make_features):
+    """Фабрика корзины ETH + BTC (у BTC пропущены бары 100-109) в длинном формате"""
+
+    def make(bars: int = 400) -> pd.DataFrame:
+        eth = make_features(bars=bars, seed=42)
+        btc = make_features(bars=bars, seed=7).assign(symbol="BTCUSDT")
+        btc = btc.drop(index=range(100, 110))
+        return pd.concat([eth, btc], ignore_index=True)
+
+    return make
+
+
+def run_portfolio(features: pd.DataFrame, symbols, **kwargs) -> PortfolioBacktester:
+    bt = PortfolioBacktester("postgresql://offline", STR100ChainFlowETH(), symbols=symbols, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        bt.results = bt.run(features_df=features, persist=False)
+    return bt
+
+
+def test_align_features_fills_missing_bars_with_nan(make_basket):
+    """Матрица бары × символы по объединению ts_4h; пропуски — NaN"""
+    features = make_basket(bars=200)
+    ts, rows, cols, matrices = align_features(features, ["ETHUSDT", "BTCUSDT"], ["close_4h"])
+
+    close = matrices["close_4h"]
+    assert close.shape == (200, 2)
+    assert ts.equals(pd.DatetimeIndex(features["ts_4h"].iloc[:200]))
+    np.testing.assert_array_equal(close[:, 0], features["close_4h"].iloc[:200].to_numpy())
+    assert np.isnan(close[100:110, 1]).all()
+    assert np.isnan(close[:, 1]).sum() == 10
+    assert (cols >= 0).all() and rows.max() == 199
+
+
+def test_single_symbol_matches_vectorized_backtester(make_features):
+    """С одним символом портфель совпадает с BacktesterV1 бит-в-бит"""
+    features = make_features(bars=600)
+    bt = run_portfolio(features, ["ETHUSDT"])
+
+    single = BacktesterV1("postgresql://offline", STR100ChainFlowETH(), mode="vectorized")
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = single.run(features_df=features.copy(), persist=False)
+
+    assert bt.trades == single.trades
+    np.testing.assert_array_equal(bt.equity_curve, single.equity_curve)
+    for key in ("pnl_total", "sharpe", "sortino", "max_dd", "win_rate", "profit_factor"):
+        assert bt.results[key] == expected[key]
+
+
+def test_shared_capital_and_per_symbol_positions(make_basket):
+    """Позиции по символам независимы, баланс общий"""
+    features = make_basket()
+    bt = run_portfolio(features, ["ETHUSDT", "BTCUSDT"])
+    results = bt.results
+
+    symbols = {trade["symbol"] for trade in bt.trades}
+    assert symbols == {"ETHUSDT", "BTCUSDT"}
+    # Баланс общий: все сделки корзины (комиссия входа списывается и при открытии)
+    assert results["final_capital"] == pytest.approx(
+        bt.initial_capital
+        + sum(trade["pnl"] for trade in bt.trades)
+        - sum(trade["meta"]["commission_entry"] for trade in bt.trades)
+    )
+    per_symbol = results["per_symbol"]
+    assert sum(s["total_trades"] for s in per_symbol.values()) == results["total_trades"]
+    assert results["meta"]["symbols"] == ["ETHUSDT", "BTCUSDT"]
+    assert len(bt.equity_curve) == len(features["ts_4h"].unique()) + 1
+
+    # Внутри символа позиции не пересекаются
+    for symbol in symbols:
+        trades = [t for t in bt.trades if t["symbol"] == symbol]
+        for prev, nxt in zip(trades, trades[1:]):
+            assert nxt["entry_ts"] >= prev["exit_ts"]
+
+
+def test_max_positions_limits_concurrent_positions(make_basket):
+    """max_positions=1: в каждый момент открыта не больше одной позиции"""
+    bt = run_portfolio(make_basket(), ["ETHUSDT", "BTCUSDT"], max_positions=1)
+    trades = sorted(bt.trades, key=lambda t: t["entry_ts"])
+    for prev, nxt in zip(trades, trades[1:]):
+        assert nxt["entry_ts"] >= prev["exit_ts"]
+
+
+def test_signal_uses_row_symbol(make_features):
+    """STR-100 берёт символ сигнала из строки фич"""
+    row = make_features(bars=60).assign(symbol="SOLUSDT").iloc[-1]
+    strategy = STR100ChainFlowETH(params={**STR100ChainFlowETH.PARAMS,
+                                          "master_long_threshold": -100.0,
+                                          "atr_expansion_multiplier": 100.0,
+                                          "volume_collapse_multiplier": 0.0})
+    signal = strategy.generate_signal(row, 10000.0)
+    assert signal is not None and signal.symbol == "SOLUSDT"
+
+
+def test_run_keeps_backtester_interface_and_rejects_unsupported(make_basket):
+    """run() принимает именованные параметры BacktesterV1.run(); неподдерживаемое — ошибка"""
+    features = make_basket(bars=200)
+    bt = PortfolioBacktester("postgresql://offline", STR100ChainFlowETH(),
+                             symbols=["ETHUSDT", "BTCUSDT"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = bt.run(symbol="ETHUSDT", features_df=features, persist=False, force=True)
+    assert results["symbols"] == ["ETHUSDT", "BTCUSDT"]
+
+    with pytest.raises(ValueError):
+        bt.run(symbol="SOLUSDT", features_df=features, persist=False)
+    with pytest.raises(ValueError):
+        bt.run(features_df=features, persist=False, scores={})
+    with pytest.raises(ValueError):
+        bt.run(features_df=features, persist=False, save_state=True)
+    for option in ({"prune_margin": 5.0}, {"result_cache": object()}):
+        with pytest.raises(TypeError):
+            PortfolioBacktester("postgresql://offline", STR100ChainFlowETH(),
+                                symbols=["ETHUSDT"], **option)
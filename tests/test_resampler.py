@@ -0,0 +1,196 @@
+"""
+Тесты для ресемплинга старших таймфреймов из 1h (resample_ohlcv, OHLCVResampler)
+
+БД подменяется словарём свечей в памяти.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.collector import LoadResult, OHLCVCollector, OHLCVResampler, resample_ohlcv
+from tradlab.demo_data import generate_demo_ohlcv_frame
+
+
+def hourly(bars: int, start: str = "2024-01-01 00:00", seed: int = 7) -> pd.DataFrame:
+    df = generate_demo_ohlcv_frame("ETHUSDT", bars, 2000.0, 0.01, freq="1h",
+                                   start=pd.Timestamp(start, tz="UTC"), seed=seed)
+    df = df.rename(columns={"timestamp": "ts"})
+    return df[["ts", "open", "high", "low", "close", "volume"]].reset_index(drop=True)
+
+
+def pandas_resample(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    agg = df.set_index("ts").resample(rule, origin="epoch", label="left", closed="left").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    )
+    return agg.dropna().reset_index()
+
+
+@pytest.mark.parametrize("timeframe,rule", [("4h", "4h"), ("1d", "24h"), ("2h", "2h")])
+def test_resample_matches_pandas_on_complete_buckets(timeframe, rule):
+    """OHLCV корзин совпадает с pandas resample, корзины выровнены по UTC"""
+    df = hourly(24 * 10)
+
+    out = resample_ohlcv(df, timeframe)
+    expected = pandas_resample(df, rule)
+
+    pd.testing.assert_frame_equal(out[["ts", "open", "high", "low", "close"]],
+                                  expected[["ts", "open", "high", "low", "close"]],
+                                  check_dtype=False)
+    np.testing.assert_allclose(out["volume"], expected["volume"], rtol=1e-12)
+    hours = 4 if timeframe == "4h" else 24 if timeframe == "1d" else 2
+    assert (out["ts"].dt.hour % hours == 0).all()
+
+
+def test_resample_writes_only_completed_buckets():
+    """Незакрытая последняя корзина не пишется; начало истории с середины корзины — пишется"""
+    df = hourly(4 * 6 + 3, start="2024-01-01 02:00")
+
+    out = resample_ohlcv(df, "4h")
+
+    # Листинг в 02:00: первая корзина 00:00 из 02:00..04:00, как у Binance;
+    # последние 3 часа — незакрытая корзина
+    assert out["ts"].iloc[0] == pd.Timestamp("2024-01-01 00:00", tz="UTC")
+    assert out["open"].iloc[0] == df["open"].iloc[0]
+    assert out["volume"].iloc[0] == pytest.approx(df["volume"].iloc[:2].sum())
+    assert out["ts"].iloc[-1] == pd.Timestamp("2024-01-02 00:00", tz="UTC")
+    assert len(out) == 7
+
+
+def test_resample_drops_bucket_cut_by_since():
+    """Корзина, начало которой отрезано since, не пишется"""
+    df = hourly(4 * 6)
+    since = datetime(2024, 1, 1, 2, tzinfo=timezone.utc)
+
+    out = resample_ohlcv(df[df["ts"] >= since], "4h", since=since)
+
+    assert out["ts"].iloc[0] == pd.Timestamp("2024-01-01 04:00", tz="UTC")
+    assert len(out) == 5
+
+
+def test_resample_keeps_bucket_with_internal_gap():
+    """Пропуск внутри корзины (простой биржи) не делает её неполной"""
+    df = hourly(8).drop(index=[5]).reset_index(drop=True)
+
+    out = resample_ohlcv(df, "4h")
+
+    assert len(out) == 2
+    assert out["volume"].iloc[1] == pytest.approx(df["volume"].iloc[4:].sum())
+
+
+def test_weekly_buckets_start_on_monday():
+    """1w выровнены на понедельник 00:00 UTC, как у Binance"""
+    df = hourly(24 * 21, start="2024-01-01 00:00")  # 2024-01-01 — понедельник
+
+    out = resample_ohlcv(df, "1w")
+
+    assert out["ts"].tolist() == [pd.Timestamp(d, tz="UTC") for d in
+                                  ("2024-01-01", "2024-01-08", "2024-01-15")]
+    assert (out["ts"].dt.dayofweek == 0).all()
+
+
+def test_resample_rejects_non_multiple_timeframe():
+    with pytest.raises(ValueError):
+        resample_ohlcv(hourly(10), "30m")
+
+
+class MemoryResampler(OHLCVResampler):
+    """OHLCVResampler с market.ohlcv в памяти: {(symbol, tf): DataFrame}"""
+
+    def __init__(self, stored):
+        super().__init__("postgresql://offline")
+        self.stored = stored
+        self.loaded_since = []
+
+    def load_base(self, symbol, since=None):
+        self.loaded_since.append(since)
+        df = self.stored[(symbol, self.base_timeframe)]
+        return df if since is None else df[df["ts"] >= since]
+
+    def last_stored_ts(self, symbol, timeframe):
+        df = self.stored.get((symbol, timeframe))
+        return None if df is None else df["ts"].max().to_pydatetime()
+
+    def save(self, df, symbol, timeframe):
+        old = self.stored.get((symbol, timeframe))
+        new = df if old is None else df[~df["ts"].isin(old["ts"])]
+        self.stored[(symbol, timeframe)] = pd.concat([old, new], ignore_index=True)
+        return LoadResult(len(df), len(new))
+
+
+def test_resampler_is_incremental():
+    """Повторный запуск строит только корзины после последней сохранённой"""
+    full = hourly(4 * 7)
+    stored = {("ETHUSDT", "1h"): full.iloc[:4 * 5 + 2]}
+    resampler = MemoryResampler(stored)
+
+    first = resampler.resample("ETHUSDT", ["4h"])
+    assert first["4h"] == (5, 5)
+    assert resampler.loaded_since == [None]
+
+    stored[("ETHUSDT", "1h")] = full
+    second = resampler.resample("ETHUSDT", ["4h"])
+
+    assert second["4h"] == (2, 2)
+    assert resampler.loaded_since[-1] == pd.Timestamp("2024-01-01 20:00", tz="UTC")
+    assert stored[("ETHUSDT", "4h")]["ts"].is_unique
+    pd.testing.assert_frame_equal(stored[("ETHUSDT", "4h")], resample_ohlcv(full, "4h"),
+                                  check_dtype=False)
+
+
+def test_resampler_keeps_partial_first_bucket_of_history():
+    """История с середины корзины: первая корзина пишется при первом построении
+    и не теряется при инкрементальных запусках"""
+    full = hourly(4 * 4, start="2024-01-01 02:00")
+    stored = {("ETHUSDT", "1h"): full.iloc[:4 * 2]}
+    resampler = MemoryResampler(stored)
+
+    resampler.resample("ETHUSDT", ["4h"])
+    stored[("ETHUSDT", "1h")] = full
+    resampler.resample("ETHUSDT", ["4h"])
+
+    assert stored[("ETHUSDT", "4h")]["ts"].iloc[0] == pd.Timestamp("2024-01-01 00:00", tz="UTC")
+    pd.testing.assert_frame_equal(stored[("ETHUSDT", "4h")], resample_ohlcv(full, "4h"),
+                                  check_dtype=False)
+
+
+def test_resampler_since_skips_partial_bucket():
+    """since внутри корзины: построение начинается со следующей целой корзины"""
+    stored = {("ETHUSDT", "1h"): hourly(24 * 3)}
+    resampler = MemoryResampler(stored)
+    since = datetime(2024, 1, 1, 5, tzinfo=timezone.utc)
+
+    resampler.resample("ETHUSDT", ["4h", "1d"], since=since, incremental=False)
+
+    assert stored[("ETHUSDT", "4h")]["ts"].iloc[0] == pd.Timestamp("2024-01-01 08:00", tz="UTC")
+    assert stored[("ETHUSDT", "1d")]["ts"].tolist() == [
+        pd.Timestamp("2024-01-02", tz="UTC"), pd.Timestamp("2024-01-03", tz="UTC"),
+    ]
+
+
+def test_collect_fetches_base_and_resamples(monkeypatch):
+    """collect(timeframes=["1h"], resample=[...]) строит старшие таймфреймы из 1h"""
+    calls = []
+    collector = OHLCVCollector("postgresql://offline")
+    monkeypatch.setattr(collector, "_start_job", lambda *args: (1, {}))
+    monkeypatch.setattr(collector, "_update_job", lambda job_id, **meta: calls.append(meta))
+    monkeypatch.setattr(collector, "resume_point", lambda *args: datetime.now(timezone.utc))
+    monkeypatch.setattr(collector, "fetch_ohlcv_chunks", lambda *args: iter(()))
+
+    stored = {("ETHUSDT", "1h"): hourly(24)}
+    resampler = MemoryResampler(stored)
+    monkeypatch.setattr(collector, "resampler", lambda: resampler)
+
+    collector.collect("ETH/USDT", timeframes=["1h"], resample=["4h", "1d"])
+
+    assert len(stored[("ETHUSDT", "4h")]) == 6 and len(stored[("ETHUSDT", "1d")]) == 1
+    assert calls[-1]["status"] == "done" and calls[-1]["failed"] == []
+
+    # База не загрузилась — ресемплинг пропускается и помечается ошибкой
+    def fail(*args):
+        raise ConnectionError("exchange gone")
+    monkeypatch.setattr(collector, "fetch_ohlcv_chunks", fail)
+    collector.collect("ETH/USDT", timeframes=["1h"], resample=["4h"])
+    assert calls[-1]["status"] == "error" and calls[-1]["failed"] == ["1h", "4h"]
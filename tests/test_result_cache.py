@@ -0,0 +1,80 @@
+"""
+Тесты для кэша результатов бэктестов (tradlab.engine.result_cache)
+
+lab.result_cache подменяется словарём в памяти.
+"""
+
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.result_cache import ResultCache, features_fingerprint
+from tradlab.engine.strategies import STR100ChainFlowETH
+
+
+class MemoryResultCache(ResultCache):
+    """ResultCache с хранилищем в памяти вместо lab.result_cache"""
+
+    def __init__(self):
+        super().__init__(db_url=None)
+        self.store = {}
+        self.puts = 0
+
+    def get(self, cache_key):
+        cached = self.store.get(cache_key)
+        return dict(cached) if cached is not None else None
+
+    def put(self, cache_key, strategy, symbol, start_date, end_date, fingerprint, results):
+        self.puts += 1
+        self.store[cache_key] = dict(results)
+
+
+def run(cache, features, params=None, **kwargs):
+    strategy = STR100ChainFlowETH(params=params) if params else STR100ChainFlowETH()
+    bt = BacktesterV1(db_url=None, strategy=strategy, mode="vectorized", result_cache=cache)
+    return bt.run(features_df=features, persist=False, **kwargs)
+
+
+class TestResultCache:
+    """Попадания, обход через force и инвалидация по данным/параметрам"""
+
+    def test_hit_returns_stored_metrics(self, make_features):
+        cache = MemoryResultCache()
+        features = make_features(bars=400)
+
+        first = run(cache, features)
+        second = run(cache, features.copy())
+
+        assert not first["cache_hit"]
+        assert second["cache_hit"]
+        assert second["run_id"] == first["run_id"]
+        for key in ("pnl_total", "sharpe", "max_dd", "total_trades"):
+            assert second[key] == first[key]
+        assert cache.puts == 1
+
+    def test_force_bypasses_cache(self, make_features):
+        cache = MemoryResultCache()
+        features = make_features(bars=400)
+
+        run(cache, features)
+        forced = run(cache, features, force=True)
+
+        assert not forced["cache_hit"]
+        assert cache.puts == 2
+
+    def test_changed_data_or_params_miss(self, make_features):
+        cache = MemoryResultCache()
+        features = make_features(bars=400)
+        run(cache, features)
+
+        changed = features.copy()
+        changed.loc[changed.index[-1], "close_4h"] += 1.0
+        assert not run(cache, changed)["cache_hit"]
+
+        params = {**STR100ChainFlowETH.PARAMS, "master_long_threshold": 99}
+        assert not run(cache, features, params=params)["cache_hit"]
+
+    def test_fingerprint_stable_and_sensitive(self, make_features):
+        features = make_features(bars=100)
+        fp = features_fingerprint(features)
+
+        assert fp == features_fingerprint(features.copy())
+        assert fp.startswith("100:")
+        assert fp != features_fingerprint(features.iloc[:-1])
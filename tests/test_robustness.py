@@ -0,0 +1,106 @@
+"""
+Тесты для bootstrap-анализа устойчивости (tradlab.engine.robustness)
+
+Расчёты идут на синтетических PnL без БД.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.engine import persistence
+from tradlab.engine import robustness as rb
+from tradlab.engine.metrics import MetricsCalculator
+
+
+PNL = np.random.default_rng(11).normal(4.0, 60.0, 120)
+
+
+def test_resample_shapes_and_methods():
+    """bootstrap берёт сделки с возвращением, shuffle — переставляет"""
+    boot = rb.resample_pnl(PNL, n_samples=50, method="bootstrap", seed=1)
+    shuffled = rb.resample_pnl(PNL, n_samples=50, method="shuffle", seed=1)
+
+    assert boot.shape == shuffled.shape == (50, len(PNL))
+    assert np.isin(boot, PNL).all()
+    np.testing.assert_array_equal(np.sort(shuffled, axis=1), np.tile(np.sort(PNL), (50, 1)))
+    np.testing.assert_array_equal(boot, rb.resample_pnl(PNL, n_samples=50, seed=1))
+
+    with pytest.raises(ValueError):
+        rb.resample_pnl(PNL, method="jackknife")
+
+
+def test_path_metrics_match_per_series():
+    """Метрики строк матрицы совпадают с MetricsCalculator по каждой кривой"""
+    samples = rb.resample_pnl(PNL, n_samples=5, seed=2)
+    metrics = rb.path_metrics(samples, 10000.0)
+
+    for i, row in enumerate(samples):
+        equity = pd.Series(np.concatenate([[10000.0], 10000.0 + np.cumsum(row)]))
+        returns = equity.pct_change().dropna()
+        trades = [{"pnl": pnl} for pnl in row]
+        assert metrics["sharpe"][i] == MetricsCalculator.calculate_sharpe(returns)
+        assert metrics["max_dd"][i] == MetricsCalculator.calculate_max_drawdown(equity)
+        assert metrics["win_rate"][i] == MetricsCalculator.calculate_win_rate(trades)
+        assert metrics["profit_factor"][i] == MetricsCalculator.calculate_profit_factor(trades)
+
+
+def test_robustness_percentiles():
+    """Перцентили упорядочены; shuffle не меняет win rate; открытые сделки пропускаются"""
+    summary = rb.robustness(list(PNL) + [None], n_samples=2000, method="shuffle", seed=3)
+
+    assert summary["n_trades"] == len(PNL)
+    assert set(summary["percentiles"]) == set(rb.METRICS)
+    max_dd = summary["percentiles"]["max_dd"]
+    assert max_dd["p5"] <= max_dd["p25"] <= max_dd["p50"] <= max_dd["p75"] <= max_dd["p95"]
+    assert summary["percentiles"]["win_rate"]["p5"] == summary["observed"]["win_rate"]
+    assert summary["percentiles"]["win_rate"]["p95"] == summary["observed"]["win_rate"]
+
+    with pytest.raises(ValueError):
+        rb.robustness([None])
+
+
+def test_analyze_run_merges_into_result_meta(monkeypatch):
+    """analyze_run читает сделки прогона и дописывает meta.robustness"""
+    merged = {}
+    monkeypatch.setattr(rb, "load_result", lambda db_url, run_id: {"meta": {"initial_capital": 5000.0}})
+    monkeypatch.setattr(rb, "load_trades", lambda db_url, run_id: pd.DataFrame({"pnl": PNL}))
+    monkeypatch.setattr(rb, "merge_result_meta", lambda db_url, run_id, meta: merged.update({run_id: meta}))
+
+    summary = rb.analyze_run("postgresql://offline", "RUN_1", n_samples=500, seed=4)
+
+    assert merged["RUN_1"] == {"robustness": summary}
+    assert summary["run_id"] == "RUN_1" and summary["n_samples"] == 500
+    expected = rb.robustness(PNL, 5000.0, n_samples=500, seed=4)
+    assert summary["percentiles"] == expected["percentiles"]
+
+
+@pytest.mark.parametrize("pnl", [[10.0, 20.0, 5.0], [-10.0, -20.0, -5.0]])
+def test_one_sided_trades_are_stored_as_valid_jsonb(monkeypatch, pnl):
+    """Все сделки в плюс (PF = inf) или в минус: перцентили определены, meta — валидный JSON"""
+    summary = rb.robustness(pnl, n_samples=100, seed=1)
+
+    pf = summary["percentiles"]["profit_factor"]
+    expected = rb.PROFIT_FACTOR_CAP if pnl[0] > 0 else 0.0
+    assert all(value == expected for value in pf.values())
+    assert summary["dropped"].get("profit_factor", 0) == 0
+
+    stored = {}
+    monkeypatch.setattr(rb, "load_result", lambda db_url, run_id: {"meta": {"initial_capital": 1000.0}})
+    monkeypatch.setattr(rb, "load_trades", lambda db_url, run_id: pd.DataFrame({"pnl": pnl}))
+    monkeypatch.setattr(rb, "merge_result_meta",
+                        lambda db_url, run_id, meta: stored.update(json=persistence._json(meta)))
+    rb.analyze_run("postgresql://offline", "RUN_1", n_samples=100, seed=1)
+
+    meta = json.loads(stored["json"])["robustness"]
+    if pnl[0] > 0:
+        assert meta["observed"]["profit_factor"] == "inf"
+
+
+def test_json_rejects_non_finite():
+    """_json не пишет NaN/Infinity (JSONB их не принимает)"""
+    with pytest.raises(ValueError):
+        persistence._json({"profit_factor": float("inf")})
+    assert persistence._json(persistence.jsonb_safe({"pf": [float("nan"), 1.0]})) == '{"pf": ["nan", 1.0]}'
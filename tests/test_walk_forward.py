@@ -0,0 +1,136 @@
+"""
+Тесты для walk-forward оптимизации (tradlab.engine.walk_forward)
+
+Прогоны идут на синтетических фичах без БД.
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tradlab.engine.backtester_v1 import BacktesterV1
+from tradlab.engine.strategies import STR100ChainFlowETH
+from tradlab.engine.walk_forward import WalkForward
+
+
+PARAM_GRID = {
+    "master_long_threshold": [10, 20],
+    "master_short_threshold": [-20, -10],
+}
+
+
+def make_walk_forward(**kwargs) -> WalkForward:
+    return WalkForward(
+        db_url="postgresql://offline",
+        strategy_cls=STR100ChainFlowETH,
+        param_grid=PARAM_GRID,
+        fixed_params=STR100ChainFlowETH.PARAMS.copy(),
+        train_bars=300,
+        test_bars=100,
+        group_id="WF_test",
+        **kwargs
+    )
+
+
+def test_windows_rolling_and_anchored():
+    """Скользящие окна сдвигаются на test_bars, anchored — растут от начала"""
+    wf = make_walk_forward(persist=False)
+    assert wf.windows(650) == [(0, 300, 300, 400), (100, 400, 400, 500), (200, 500, 500, 600)]
+
+    wf.anchored = True
+    assert [w[0] for w in wf.windows(650)] == [0, 0, 0]
+    assert wf.windows(399) == []
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_oos_runs_match_standalone_backtests(max_workers, make_features):
+    """OOS-строки совпадают с отдельными прогонами победителя с капиталом на конец
+    предыдущего окна; кривые склеены без масштабирования"""
+    features = make_features(bars=700)
+    wf = make_walk_forward(persist=False, max_workers=max_workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = wf.run(features=features)
+
+    assert summary["window"].tolist() == [0, 1, 2, 3]
+    assert len(wf.oos_equity) == 400
+    assert wf.oos_equity.index.equals(pd.DatetimeIndex(features["ts_4h"].iloc[300:700]))
+
+    capital = wf.initial_capital
+    for _, row in summary.iterrows():
+        i = row["window"]
+        table = wf.tables[f"is_{i:03d}"]
+        assert row["is_sharpe"] == table["sharpe"].max()
+        assert row["oos_capital"] == capital
+
+        params = {**STR100ChainFlowETH.PARAMS,
+                  **{k: row[k] for k in PARAM_GRID}}
+        bt = BacktesterV1("postgresql://offline", STR100ChainFlowETH(params=params),
+                          initial_capital=capital)
+        oos = features.iloc[300 + 100 * i:400 + 100 * i].copy()
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = bt.run(features_df=oos, persist=False)
+        assert row["sharpe"] == expected["sharpe"]
+        assert row["pnl_total"] == expected["pnl_total"]
+        piece = wf.oos_equity.iloc[100 * i:100 * (i + 1)].to_numpy()
+        np.testing.assert_array_equal(piece[:-1], bt.equity_curve[1:-1])
+        assert piece[-1] == bt.balance == expected["final_capital"]
+        capital = bt.balance
+
+    assert wf.initial_capital == 10000.0 and wf.max_workers == max_workers
+    assert wf.oos_equity.iloc[-1] == capital
+    assert wf.oos_metrics["pnl_total"] == pytest.approx(capital - wf.initial_capital)
+
+
+def test_persists_only_oos_winners(monkeypatch, make_features):
+    """В lab.results пишутся только OOS-прогоны победителей с meta.wf_group_id"""
+    written = []
+
+    def fake_flush(writer):
+        written.extend(writer._results)
+        writer._trades, writer._results = [], []
+        return len(written)
+
+    monkeypatch.setattr("tradlab.engine.persistence.ResultWriter.flush", fake_flush)
+
+    wf = make_walk_forward(persist=True, max_workers=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = wf.run(features=make_features(bars=600))
+
+    assert len(written) == len(summary) == 3
+    metas = [record[-1].adapted for record in written]
+    assert {meta["wf_group_id"] for meta in metas} == {"WF_test"}
+    assert sorted(meta["wf_window"] for meta in metas) == [0, 1, 2]
+    assert set(metas[0]["wf_params"]) == set(PARAM_GRID)
+
+
+def test_oos_chain_includes_eod_close_costs(make_features):
+    """Позиция, открытая на границе OOS-окна: EOD-закрытие (slippage + комиссия)
+    попадает в склеенную кривую, следующее окно стартует с реализованного капитала"""
+    features = make_features(bars=700)
+    wf = make_walk_forward(persist=False, max_workers=1, commission_rate=0.001, slippage_bps=20.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = wf.run(features=features)
+
+    eod_windows = 0
+    for n, (_, row) in enumerate(summary.iterrows()):
+        i = row["window"]
+        params = {**STR100ChainFlowETH.PARAMS, **{k: row[k] for k in PARAM_GRID}}
+        bt = BacktesterV1("postgresql://offline", STR100ChainFlowETH(params=params),
+                          initial_capital=row["oos_capital"],
+                          commission_rate=0.001, slippage_bps=20.0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            bt.run(features_df=features.iloc[300 + 100 * i:400 + 100 * i].copy(), persist=False)
+
+        end = wf.oos_equity.iloc[100 * (i + 1) - 1]
+        assert end == bt.balance
+        if any(t["meta"]["exit_reason"] == "EOD" for t in bt.trades):
+            eod_windows += 1
+            assert end != bt.equity_curve[-1]
+        if n + 1 < len(summary):
+            assert summary["oos_capital"].iloc[n + 1] == bt.balance
+
+    assert eod_windows > 0
+    assert wf.oos_metrics["pnl_total"] == pytest.approx(bt.balance - wf.initial_capital)
@@ -321,3 +321,22 @@ class TestBinanceConnectorTimeout:
         assert 'requests_params' in call_kwargs
         assert call_kwargs['requests_params']['timeout'] == 10
         assert call_kwargs['requests_params']['verify'] == True
+
+
+class TestBinanceConnectorFillPrice:
+    """Test average fill price from order responses"""
+    
+    def test_fill_price_from_quote_quantity(self):
+        """cummulativeQuoteQty / executedQty"""
+        order = {'executedQty': '2.0', 'cummulativeQuoteQty': '4010.0', 'fills': []}
+        assert BinanceConnector.fill_price(order) == 2005.0
+    
+    def test_fill_price_from_fills(self):
+        """Quantity-weighted average of fills when totals are missing"""
+        order = {'fills': [{'price': '2000.0', 'qty': '1.0'}, {'price': '2010.0', 'qty': '3.0'}]}
+        assert BinanceConnector.fill_price(order) == 2007.5
+    
+    def test_fill_price_missing(self):
+        """No execution data -> None"""
+        assert BinanceConnector.fill_price({'orderId': 1, 'status': 'NEW'}) is None
+        assert BinanceConnector.fill_price(None) is None
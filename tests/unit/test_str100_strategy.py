@@ -292,3 +292,65 @@ def test_exchange_constraints_defined(strategy):
     assert constraints['max_lot_size'] == 9000.0
     assert constraints['lot_precision'] == 3
     assert constraints['min_notional'] == 10.0
+
+
+def test_batch_signals_match_generate_signal(strategy):
+    """Batch path yields the same signal as generate_signal() on every bar"""
+    rng = np.random.default_rng(7)
+    bars = 300
+    close = 2000.0 + np.cumsum(rng.normal(0.0, 20.0, bars))
+    df = pd.DataFrame({
+        'symbol': 'ETHUSDT',
+        'ts_4h': pd.date_range('2024-01-01', periods=bars, freq='4h', tz='UTC'),
+        'close_4h': close,
+        'volume_4h': rng.lognormal(13.0, 0.6, bars),
+        'atr_14_1h': rng.uniform(10.0, 60.0, bars),
+        'sma_50_4h': pd.Series(close).rolling(50, min_periods=1).mean().to_numpy(),
+        'avg_volume_20': np.full(bars, np.exp(13.0)),
+    })
+    balance = 10000.0
+    
+    batch = strategy.generate_signals_batch(df)
+    assert len(batch) == bars
+    
+    signals = 0
+    for i, (_, row) in enumerate(df.iterrows()):
+        expected = strategy.generate_signal(row, balance)
+        actual = strategy.signal_from_batch(batch, i, row['ts_4h'], balance)
+        if expected is None:
+            assert actual is None
+            continue
+        signals += 1
+        assert actual == expected
+    
+    assert signals > 0
+
+
+def test_batch_veto_blocks_signal(strategy, sample_features):
+    """ATR expansion veto applies in the batch path"""
+    df = sample_features.to_frame().T.astype({'close_4h': float, 'volume_4h': float,
+                                               'atr_14_1h': float, 'sma_50_4h': float,
+                                               'avg_volume_20': float})
+    df['atr_ma_50_1h'] = 10.0  # ATR is 5x its average
+    
+    batch = strategy.generate_signals_batch(df)
+    
+    assert batch.side[0] == 0
+    assert strategy.signal_from_batch(batch, 0, df['ts_4h'].iloc[0], 10000.0) is None
+
+
+def test_signals_from_scores_matches_batch(make_features):
+    """signals_from_scores() на общих скорах == generate_signals_batch() для любых порогов"""
+    features = make_features(bars=300)
+    scores = STR100ChainFlowETH().compute_scores_batch(features)
+
+    for long_t, short_t, k_sl_min in [(5, -25, 1.5), (20, -10, 2.5)]:
+        params = {**STR100ChainFlowETH.PARAMS, "master_long_threshold": long_t,
+                  "master_short_threshold": short_t, "k_sl_min": k_sl_min}
+        strategy = STR100ChainFlowETH(params=params)
+        expected = strategy.generate_signals_batch(features)
+        actual = strategy.signals_from_scores(scores)
+
+        np.testing.assert_array_equal(actual.side, expected.side)
+        np.testing.assert_array_equal(actual.sl, expected.sl)
+        np.testing.assert_array_equal(actual.tp2, expected.tp2)